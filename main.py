@@ -6,32 +6,39 @@ Minecraft 伺服器 IP 地址自動通知系統
 支援排程自動執行和手動觸發模式
 
 使用方式:
-    python main.py --daemon    # 啟動排程守護程式
-    python main.py --manual    # 手動執行
-    python main.py --test      # 測試模式
-    python main.py --status    # 顯示狀態
-    python main.py --check     # 檢查設定
+    python main.py daemon      # 啟動排程守護程式
+    python main.py manual      # 手動執行
+    python main.py test        # 測試模式
+    python main.py status      # 顯示狀態
+    python main.py check       # 檢查設定
+
+舊版旗標寫法（python main.py --daemon 等）仍然支援
 """
 
 import sys
+import asyncio
 import argparse
-from pathlib import Path
-
-# 確保 src 目錄在 Python 路徑中
-sys.path.insert(0, str(Path(__file__).parent / "src"))
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
+# src 為套件（含 __init__.py），以 from src.xxx 導入即可，不需修改 sys.path
+# 排程、IP 檢測與 Discord 模組會載入 requests/schedule/psutil，
+# 延遲到實際使用的方法內才導入，讓 --check/--version 等路徑啟動更快
 try:
     from src.config import ConfigManager, ConfigError
     from src.logger import LoggerManager
-    from src.scheduler import SchedulerManager
-    from src.ip_detector import IPDetector, NetworkError
-    from src.discord_client import DiscordClient, WebhookError
 except ImportError as e:
     print(f"❌ 模組導入失敗: {e}")
     print("💡 請確保所有必要的模組都已正確安裝")
     sys.exit(1)
 
 
+class ComponentCheckError(Exception):
+    """組件檢查失敗"""
+
+    pass
+
+
 class IPBotApplication:
     """Discord IP Bot 主應用程式"""
 
@@ -41,6 +48,7 @@ class IPBotApplication:
         self.log_manager = None
         self.logger = None
         self.scheduler = None
+        self._http = None
 
         try:
             # 初始化核心組件
@@ -58,13 +66,25 @@ class IPBotApplication:
             print(f"❌ 初始化失敗: {e}")
             sys.exit(1)
 
-    def run_daemon_mode(self):
-        """運行守護程式模式"""
+    def run_daemon_mode(self, legacy_scheduler: bool = False):
+        """
+        運行守護程式模式
+
+        Args:
+            legacy_scheduler: 是否使用舊版 schedule 輪詢迴圈
+        """
         self.logger.info("啟動守護程式模式")
 
         try:
-            self.scheduler = SchedulerManager(self.config)
-            self.scheduler.start_daemon()
+            from src.scheduler import SchedulerManager
+
+            self.scheduler = SchedulerManager(
+                self.config, session=self._get_http_session()
+            )
+            if legacy_scheduler:
+                self.scheduler.start_daemon()
+            else:
+                asyncio.run(self._daemon_async())
         except KeyboardInterrupt:
             self.logger.info("使用者中斷守護程式")
         except Exception as e:
@@ -72,6 +92,36 @@ class IPBotApplication:
             print(f"❌ 守護程式運行失敗: {e}")
             sys.exit(1)
 
+    def _get_http_session(self):
+        """
+        取得共用的 HTTP Session（首次使用時建立）
+
+        IP檢測與Discord發送共用同一個連線池，避免重複 TCP/TLS 握手；
+        守護程式模式下會跨日重複使用同一條連線
+        """
+        if self._http is None:
+            import requests
+            from src.dns_cache import CachedDNSAdapter
+
+            session = requests.Session()
+            session.headers["User-Agent"] = "Discord-IP-Bot/1.0"
+            session.mount(
+                "https://", CachedDNSAdapter(pool_connections=4, pool_maxsize=4)
+            )
+            self._http = session
+
+        return self._http
+
+    def close(self):
+        """釋放共用的 HTTP 連線"""
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+    async def _daemon_async(self):
+        """asyncio 守護程式主協程"""
+        await self.scheduler.start_daemon_async()
+
     def run_manual_mode(self):
         """運行手動模式"""
         self.logger.info("執行手動模式")
@@ -81,7 +131,11 @@ class IPBotApplication:
 
         try:
             # 使用排程管理器執行手動任務
-            self.scheduler = SchedulerManager(self.config)
+            from src.scheduler import SchedulerManager
+
+            self.scheduler = SchedulerManager(
+                self.config, session=self._get_http_session()
+            )
             success = self.scheduler.manual_task()
 
             if success:
@@ -108,16 +162,18 @@ class IPBotApplication:
 
         try:
             # 測試各個組件
-            self._test_config()
-            self._test_ip_detection()
-            self._test_discord_connection()
+            self._run_component_checks()
 
             if verbose:
                 self._show_detailed_info()
 
             # 執行測試任務
             print("📋 執行完整測試流程...")
-            self.scheduler = SchedulerManager(self.config)
+            from src.scheduler import SchedulerManager
+
+            self.scheduler = SchedulerManager(
+                self.config, session=self._get_http_session()
+            )
             success = self.scheduler.test_task()
 
             if success:
@@ -139,13 +195,15 @@ class IPBotApplication:
 
         try:
             # 檢查各組件狀態
-            self._test_config()
-            self._test_ip_detection()
-            self._test_discord_connection()
+            self._run_component_checks()
 
             # 如果有排程系統在運行，顯示其狀態
             try:
-                self.scheduler = SchedulerManager(self.config)
+                from src.scheduler import SchedulerManager
+
+                self.scheduler = SchedulerManager(
+                    self.config, session=self._get_http_session()
+                )
                 status = self.scheduler.get_status_info()
 
                 print()
@@ -197,66 +255,109 @@ class IPBotApplication:
             print(f"❌ 設定檢查失敗: {e}")
             sys.exit(1)
 
-    def _test_config(self):
+    def _run_component_checks(self):
+        """
+        並行執行設定、IP檢測與Discord連線檢查，完成後依序顯示結果
+
+        Raises:
+            ComponentCheckError: 任一檢查失敗
+        """
+        # 先建立共用 Session，避免多個執行緒同時建立
+        self._get_http_session()
+
+        checks = [
+            self._test_config,
+            self._test_ip_detection,
+            self._test_discord_connection,
+        ]
+
+        # 各檢查互相獨立且以網路等待為主，並行執行可將總時間縮短為最慢的一項
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            results = list(executor.map(lambda check: check(), checks))
+
+        failed = []
+        for name, ok, message in results:
+            print(name)
+            print(message)
+            if not ok:
+                failed.append(name)
+
+        if failed:
+            raise ComponentCheckError(f"{len(failed)} 項檢查失敗")
+
+    def _test_config(self) -> Tuple[str, bool, str]:
         """測試設定"""
-        print("🔧 測試設定...")
-        try:
-            discord_config = self.config.get_discord_config()
-            webhook_url = discord_config.get("webhook_url")
+        name = "🔧 測試設定..."
+        discord_config = self.config.get_discord_config()
+        webhook_url = discord_config.get("webhook_url")
 
-            if webhook_url:
-                print("  ✅ Discord Webhook URL: 已設定")
-            else:
-                print("  ❌ Discord Webhook URL: 未設定")
-                raise ConfigError("Discord Webhook URL 未設定")
+        if webhook_url:
+            return name, True, "  ✅ Discord Webhook URL: 已設定"
 
-        except Exception as e:
-            print(f"  ❌ 設定測試失敗: {e}")
-            raise
+        return (
+            name,
+            False,
+            "  ❌ Discord Webhook URL: 未設定\n"
+            "  ❌ 設定測試失敗: Discord Webhook URL 未設定",
+        )
 
-    def _test_ip_detection(self):
+    def _test_ip_detection(self) -> Tuple[str, bool, str]:
         """測試IP檢測"""
-        print("🌐 測試IP檢測...")
+        name = "🌐 測試IP檢測..."
+        lines = []
         try:
-            ip_detector = IPDetector()
+            from src.ip_detector import IPDetector
+
+            # 使用與排程器相同的設定，避免在預設路徑建立歷史檔案
+            ip_detector_config = dict(self.config.get_ip_config())
+            ip_detector_config["ip_history_file"] = self.config.get_history_file_path()
+            ip_detector = IPDetector(
+                ip_detector_config, session=self._get_http_session()
+            )
 
             # 測試本地IP
             local_ip = ip_detector.get_local_ip()
-            print(f"  🏠 本地IP: {local_ip}")
+            lines.append(f"  🏠 本地IP: {local_ip}")
 
             # 測試公共IP
             public_ip = ip_detector.get_public_ip()
-            print(f"  🌍 公共IP: {public_ip}")
+            lines.append(f"  🌍 公共IP: {public_ip}")
 
             if public_ip and public_ip != "無法獲取":
-                print("  ✅ IP檢測: 正常")
-            else:
-                print("  ❌ IP檢測: 失敗")
-                raise NetworkError("無法獲取公共IP")
+                lines.append("  ✅ IP檢測: 正常")
+                return name, True, "\n".join(lines)
+
+            lines.append("  ❌ IP檢測: 失敗")
+            lines.append("  ❌ IP檢測失敗: 無法獲取公共IP")
 
         except Exception as e:
-            print(f"  ❌ IP檢測失敗: {e}")
-            raise
+            lines.append(f"  ❌ IP檢測失敗: {e}")
 
-    def _test_discord_connection(self):
+        return name, False, "\n".join(lines)
+
+    def _test_discord_connection(self) -> Tuple[str, bool, str]:
         """測試Discord連線"""
-        print("📱 測試Discord連線...")
+        name = "📱 測試Discord連線..."
         try:
+            from src.discord_client import DiscordClient
+
             webhook_url = self.config.get("discord", "webhook_url")
-            discord_client = DiscordClient(webhook_url)
+            discord_client = DiscordClient(
+                webhook_url, session=self._get_http_session()
+            )
 
             # 測試連線
-            test_result = discord_client.test_connection()
+            if discord_client.test_connection():
+                return name, True, "  ✅ Discord連線: 正常"
 
-            if test_result:
-                print("  ✅ Discord連線: 正常")
-            else:
-                print("  ❌ Discord連線: 失敗")
-                raise WebhookError("Discord連線測試失敗")
+            return (
+                name,
+                False,
+                "  ❌ Discord連線: 失敗\n  ❌ Discord測試失敗: Discord連線測試失敗",
+            )
 
         except Exception as e:
-            print(f"  ❌ Discord測試失敗: {e}")
-            raise
+            return name, False, f"  ❌ Discord測試失敗: {e}"
 
     def _show_detailed_info(self):
         """顯示詳細資訊"""
@@ -284,58 +385,119 @@ class IPBotApplication:
                 print(f"    {log_line.strip()}")
 
 
-def main():
-    """主函數"""
-    parser = argparse.ArgumentParser(
-        description="Discord IP Bot - Minecraft 伺服器 IP 自動通知系統",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+# 子命令分派表：子命令名稱 -> 處理函數(app, args)
+_DISPATCH = {
+    "daemon": lambda app, args: app.run_daemon_mode(
+        legacy_scheduler=args.legacy_scheduler
+    ),
+    "manual": lambda app, args: app.run_manual_mode(),
+    "test": lambda app, args: app.run_test_mode(verbose=args.verbose),
+    "status": lambda app, args: app.show_status(),
+    "check": lambda app, args: app.check_configuration(),
+}
+
+# 舊版旗標寫法（例如 --daemon）對應的子命令，維持既有腳本相容性
+_LEGACY_FLAGS = {f"--{cmd}": cmd for cmd in _DISPATCH}
+
+
+def _normalize_argv(argv: List[str]) -> List[str]:
+    """
+    將舊版旗標寫法轉換為子命令寫法
+
+    例如 ["--test", "--verbose"] 轉換為 ["test", "--verbose"]
+
+    Args:
+        argv: 命令列參數（不含程式名稱）
+
+    Returns:
+        轉換後的命令列參數
+    """
+    if any(arg in _DISPATCH for arg in argv):
+        return argv
+
+    for index, arg in enumerate(argv):
+        if arg in _LEGACY_FLAGS:
+            return [_LEGACY_FLAGS[arg]] + argv[:index] + argv[index + 1 :]
+
+    return argv
+
+
+# 說明文字的使用範例，僅在顯示 --help 時使用
+_EPILOG = """
 使用範例:
-  python main.py --daemon          啟動排程守護程式（每天自動執行）
-  python main.py --manual          手動執行一次（立即發送當前IP）
-  python main.py --test            測試模式（不發送Discord訊息）
-  python main.py --status          顯示系統狀態
-  python main.py --check           檢查設定
-  python main.py --test --verbose  詳細測試模式
+  python main.py daemon            啟動排程守護程式（每天自動執行）
+  python main.py manual            手動執行一次（立即發送當前IP）
+  python main.py test              測試模式（不發送Discord訊息）
+  python main.py status            顯示系統狀態
+  python main.py check             檢查設定
+  python main.py test --verbose    詳細測試模式
+  python main.py daemon --legacy-scheduler  使用舊版排程迴圈
 
 注意:
   - 守護程式模式會持續運行，按 Ctrl+C 停止
   - 手動模式可在守護程式運行時使用（開啟新終端）
   - 測試模式用於驗證功能但不發送Discord訊息
-        """,
+  - 舊版寫法（例如 --daemon、--test --verbose）仍可使用
+"""
+
+
+def _build_parser(with_epilog: bool = True) -> argparse.ArgumentParser:
+    """
+    建立命令列解析器
+
+    Args:
+        with_epilog: 是否附上使用範例（只有顯示說明時才需要）
+    """
+    parser = argparse.ArgumentParser(
+        description="Discord IP Bot - Minecraft 伺服器 IP 自動通知系統",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=_EPILOG if with_epilog else None,
     )
+    parser.add_argument("--version", action="version", version="Discord IP Bot v1.0")
+
+    # 主要模式（子命令）
+    sub = parser.add_subparsers(dest="cmd", required=True, metavar="command")
 
-    # 主要模式選項（互斥）
-    mode_group = parser.add_mutually_exclusive_group(required=True)
-    mode_group.add_argument("--daemon", action="store_true", help="啟動排程守護程式")
-    mode_group.add_argument("--manual", action="store_true", help="手動執行一次")
-    mode_group.add_argument(
-        "--test", action="store_true", help="測試模式（不發送Discord）"
+    daemon_parser = sub.add_parser("daemon", help="啟動排程守護程式")
+    daemon_parser.add_argument(
+        "--legacy-scheduler",
+        action="store_true",
+        help="守護程式使用舊版 schedule 輪詢迴圈",
     )
-    mode_group.add_argument("--status", action="store_true", help="顯示系統狀態")
-    mode_group.add_argument("--check", action="store_true", help="檢查設定")
 
-    # 附加選項
-    parser.add_argument("--verbose", "-v", action="store_true", help="顯示詳細資訊")
-    parser.add_argument("--version", action="version", version="Discord IP Bot v1.0")
+    sub.add_parser("manual", help="手動執行一次")
+
+    test_parser = sub.add_parser("test", help="測試模式（不發送Discord）")
+    test_parser.add_argument(
+        "--verbose", "-v", action="store_true", help="顯示詳細資訊"
+    )
+
+    sub.add_parser("status", help="顯示系統狀態")
+    sub.add_parser("check", help="檢查設定")
+
+    return parser
 
-    args = parser.parse_args()
+
+def main(argv: Optional[List[str]] = None):
+    """
+    主函數
+
+    Args:
+        argv: 命令列參數，預設為 sys.argv[1:]
+    """
+    argv = _normalize_argv(sys.argv[1:] if argv is None else list(argv))
+    parser = _build_parser(with_epilog="-h" in argv or "--help" in argv)
+    args = parser.parse_args(argv)
 
     try:
         # 建立應用程式實例
         app = IPBotApplication()
 
-        # 根據參數執行相應功能
-        if args.daemon:
-            app.run_daemon_mode()
-        elif args.manual:
-            app.run_manual_mode()
-        elif args.test:
-            app.run_test_mode(verbose=args.verbose)
-        elif args.status:
-            app.show_status()
-        elif args.check:
-            app.check_configuration()
+        # 根據子命令執行相應功能
+        try:
+            _DISPATCH[args.cmd](app, args)
+        finally:
+            app.close()
 
     except KeyboardInterrupt:
         print("\n👋 使用者中斷，程式結束")
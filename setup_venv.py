@@ -10,7 +10,20 @@ import os
 import sys
 import subprocess
 import platform
+import sysconfig
 from pathlib import Path
+from venv import EnvBuilder
+
+VENV_DIR = "venv"
+
+# 作業系統名稱（執行期間不會改變，只查詢一次）
+_SYSTEM = platform.system()
+
+# 安裝完成後在虛擬環境中執行的模組載入測試
+TEST_CODE = (
+    "import sys; sys.path.append('src'); "
+    "from ip_detector import IPDetector; print('✅ IP檢測器模組載入成功')"
+)
 
 
 def check_python_version():
@@ -33,9 +46,24 @@ def check_python_version():
     return True
 
 
+def get_venv_python() -> Path:
+    """取得虛擬環境中的 Python 執行檔路徑（依 sysconfig 的安裝配置決定 bin/Scripts）"""
+    schemes = sysconfig.get_scheme_names()
+    if "venv" in schemes:
+        scheme = "venv"
+    else:
+        scheme = "nt" if os.name == "nt" else "posix_prefix"
+
+    scripts_dir = sysconfig.get_paths(
+        scheme, vars={"base": VENV_DIR, "platbase": VENV_DIR}
+    )["scripts"]
+    executable = "python.exe" if os.name == "nt" else "python"
+    return Path(scripts_dir) / executable
+
+
 def create_venv():
     """建立虛擬環境"""
-    venv_path = Path("venv")
+    venv_path = Path(VENV_DIR)
 
     if venv_path.exists():
         print("📁 虛擬環境目錄已存在")
@@ -43,17 +71,20 @@ def create_venv():
 
     try:
         print("🔧 建立虛擬環境...")
-        subprocess.run([sys.executable, "-m", "venv", "venv"], check=True)
+        # 在目前的直譯器中建立，不需另外啟動 python -m venv
+        EnvBuilder(with_pip=True, clear=False, symlinks=os.name != "nt").create(
+            VENV_DIR
+        )
         print("✅ 虛擬環境建立成功")
         return True
-    except subprocess.CalledProcessError as e:
+    except (OSError, subprocess.CalledProcessError) as e:
         print(f"❌ 建立虛擬環境失敗: {e}")
         return False
 
 
 def get_activation_command():
     """獲取虛擬環境啟動命令"""
-    system = platform.system()
+    system = _SYSTEM
 
     if system == "Windows":
         return "venv\\Scripts\\activate"
@@ -63,20 +94,26 @@ def get_activation_command():
 
 def install_dependencies():
     """安裝依賴套件"""
-    system = platform.system()
-
-    if system == "Windows":
-        pip_path = Path("venv/Scripts/pip")
-    else:
-        pip_path = Path("venv/bin/pip")
+    python_path = get_venv_python()
 
-    if not pip_path.exists():
-        print("❌ 找不到虛擬環境中的pip")
+    if not python_path.exists():
+        print("❌ 找不到虛擬環境中的Python")
         return False
 
     try:
         print("📦 安裝依賴套件...")
-        subprocess.run([str(pip_path), "install", "-r", "requirements.txt"], check=True)
+        subprocess.run(
+            [
+                str(python_path),
+                "-m",
+                "pip",
+                "install",
+                "--disable-pip-version-check",
+                "-r",
+                "requirements.txt",
+            ],
+            check=True,
+        )
         print("✅ 依賴套件安裝成功")
         return True
     except subprocess.CalledProcessError as e:
@@ -201,12 +238,7 @@ tests/__pycache__/
 
 def test_installation():
     """測試安裝是否成功"""
-    system = platform.system()
-
-    if system == "Windows":
-        python_path = Path("venv/Scripts/python")
-    else:
-        python_path = Path("venv/bin/python")
+    python_path = get_venv_python()
 
     if not python_path.exists():
         print("❌ 找不到虛擬環境中的Python")
@@ -215,11 +247,7 @@ def test_installation():
     try:
         print("🧪 測試IP檢測器模組...")
         result = subprocess.run(
-            [
-                str(python_path),
-                "-c",
-                "import sys; sys.path.append('src'); from ip_detector import IPDetector; print('✅ IP檢測器模組載入成功')",
-            ],
+            [str(python_path), "-c", TEST_CODE],
             capture_output=True,
             text=True,
             check=True,
@@ -235,7 +263,7 @@ def test_installation():
 
 def print_next_steps():
     """列印後續步驟說明"""
-    system = platform.system()
+    system = _SYSTEM
     activation_cmd = get_activation_command()
 
     print("\n" + "=" * 60)
@@ -273,7 +301,7 @@ def print_next_steps():
 def main():
     """主函數"""
     print("🚀 Discord IP Bot - 虛擬環境設定")
-    print(f"💻 作業系統: {platform.system()} {platform.release()}")
+    print(f"💻 作業系統: {_SYSTEM} {platform.release()}")
     print("=" * 50)
 
     # 檢查Python版本
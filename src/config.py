@@ -6,11 +6,137 @@
 """
 
 import os
+import re
+import json
+import hashlib
 import logging
+from collections import defaultdict
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, ClassVar, FrozenSet, List, Mapping, Optional, Tuple
 from dotenv import load_dotenv
 
+try:
+    from .discord_client import is_valid_webhook_url
+except ImportError:
+    from discord_client import is_valid_webhook_url
+
+# TOML 設定檔支援（Python 3.11+ 內建 tomllib，舊版可安裝 tomli）
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# JSON 序列化：優先使用 orjson（較快），未安裝時使用標準庫 json
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+
+    def json_dumps(obj: Any, indent: bool = False) -> str:
+        """序列化為 JSON 字串（非 ASCII 字元不跳脫）"""
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(obj, option=option).decode("utf-8")
+
+    def json_dumpb(obj: Any, indent: bool = False) -> bytes:
+        """序列化為 UTF-8 編碼的 JSON 位元組，可直接寫入二進位檔案"""
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(obj, option=option)
+
+    json_loads = orjson.loads
+
+except ImportError:
+    JSON_BACKEND = "json"
+
+    def json_dumps(obj: Any, indent: bool = False) -> str:
+        """序列化為 JSON 字串（非 ASCII 字元不跳脫）"""
+        return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+
+    def json_dumpb(obj: Any, indent: bool = False) -> bytes:
+        """序列化為 UTF-8 編碼的 JSON 位元組，可直接寫入二進位檔案"""
+        return json_dumps(obj, indent).encode("utf-8")
+
+    json_loads = json.loads
+
+_LOG = logging.getLogger(__name__)
+
+# 設定快取檔案名稱（與 .env 位於同一目錄）
+CACHE_FILE_NAME = ".env.cache.json"
+
+# 選用的 TOML 設定檔名稱（與 .env 位於同一目錄，存在時優先使用）
+TOML_FILE_NAME = "config.toml"
+
+# 使用 TOML 設定檔時仍可由環境變數覆寫的項目
+_TOML_ENV_OVERRIDES = frozenset({"DISCORD_WEBHOOK_URL", "LOG_LEVEL"})
+
+# 設定結構定義：(區塊, 設定鍵, 環境變數, 型別, 預設值)
+SCHEMA = (
+    # Discord 設定
+    ("discord", "webhook_url", "DISCORD_WEBHOOK_URL", str, None),
+    (
+        "discord",
+        "message_template",
+        "DISCORD_MESSAGE_TEMPLATE",
+        str,
+        "Minecraft Server IP Updated: {ip}:25565",
+    ),
+    ("discord", "retry_attempts", "DISCORD_RETRY_ATTEMPTS", int, 3),
+    ("discord", "timeout", "DISCORD_TIMEOUT", int, 10),
+    # 應用程式設定
+    ("app", "name", "APP_NAME", str, "Discord IP Bot"),
+    ("app", "log_level", "LOG_LEVEL", str, "INFO"),
+    ("app", "schedule_time", "SCHEDULE_TIME", str, "09:00"),
+    ("app", "timezone", "TIMEZONE", str, "Asia/Taipei"),
+    # IP 檢測設定
+    ("ip_detection", "check_public_ip", "CHECK_PUBLIC_IP", bool, True),
+    ("ip_detection", "check_local_ip", "CHECK_LOCAL_IP", bool, True),
+    ("ip_detection", "timeout", "IP_CHECK_TIMEOUT", int, 10),
+    ("ip_detection", "retry_attempts", "IP_RETRY_ATTEMPTS", int, 3),
+    ("ip_detection", "save_history", "SAVE_IP_HISTORY", bool, True),
+    # 系統設定
+    ("system", "logs_dir", "LOGS_DIR", str, "logs"),
+    ("system", "data_dir", "DATA_DIR", str, "data"),
+    ("system", "max_log_files", "MAX_LOG_FILES", int, 7),
+    ("system", "max_log_size_mb", "MAX_LOG_SIZE_MB", int, 10),
+    # 排程設定
+    ("scheduler", "daily_time", "SCHEDULE_TIME", str, "09:00"),
+    ("scheduler", "status_update_interval", "STATUS_UPDATE_INTERVAL", int, 60),
+    ("scheduler", "max_execution_history", "MAX_EXECUTION_HISTORY", int, 50),
+    # IP 歷史記錄設定
+    ("ip_history", "file_path", "IP_HISTORY_FILE", str, "config/ip_history.json"),
+    ("ip_history", "keep_days", "IP_HISTORY_KEEP_DAYS", int, 30),
+    ("ip_history", "max_records", "IP_HISTORY_MAX_RECORDS", int, 1000),
+    ("ip_history", "auto_cleanup", "IP_HISTORY_AUTO_CLEANUP", bool, True),
+    (
+        "ip_history",
+        "backup_on_corruption",
+        "IP_HISTORY_BACKUP_ON_CORRUPTION",
+        bool,
+        True,
+    ),
+    ("ip_history", "compression", "IP_HISTORY_COMPRESSION", bool, False),
+    ("ip_history", "encoding", "IP_HISTORY_ENCODING", str, "utf-8"),
+)
+
+# 會影響設定結果的所有環境變數（用於計算快取鍵）
+_ENV_KEYS = tuple(dict.fromkeys(entry[2] for entry in SCHEMA))
+
+# 必要設定：(區塊, 設定鍵, 環境變數)
+_REQUIRED_KEYS = frozenset({("discord", "webhook_url", "DISCORD_WEBHOOK_URL")})
+
+# 排程時間格式 HH:MM（24 小時制）
+_TIME_RE = re.compile(r"^([01]?\d|2[0-3]):[0-5]\d$")
+
+# 由行程環境提供時即可略過 .env 解析的環境變數（例如 systemd EnvironmentFile=）
+_PRELOADED_ENV_KEYS = ("DISCORD_WEBHOOK_URL", "APP_NAME")
+
+# 本行程中由 load_dotenv 注入的環境變數（計算快取鍵時視為不存在）
+_DOTENV_INJECTED: Dict[str, str] = {}
+
 
 class ConfigError(Exception):
     """設定相關的異常"""
@@ -21,16 +147,46 @@ class ConfigError(Exception):
 class ConfigManager:
     """設定管理器"""
 
-    def __init__(self, env_file: str = ".env"):
+    # 視為 True 的布林環境變數值（小寫）
+    _TRUTHY: ClassVar[FrozenSet[str]] = frozenset(("true", "1", "yes", "on", "enabled"))
+
+    # 需要遮蔽的設定鍵，以及供未來新增設定使用的子字串比對
+    _SENSITIVE: ClassVar[FrozenSet[str]] = frozenset(
+        ("webhook_url", "token", "api_key", "secret", "password", "auth")
+    )
+    _SENSITIVE_SUBSTRINGS: ClassVar[Tuple[str, ...]] = (
+        "webhook",
+        "token",
+        "secret",
+        "password",
+    )
+
+    def __init__(self, env_file: str = ".env", use_cache: bool = True):
         """
         初始化設定管理器
 
         Args:
             env_file: 環境變數檔案路徑
+            use_cache: 是否使用磁碟設定快取（以 .env 的 mtime/大小為鍵）
+
+        同目錄下若有 config.toml（且可使用 tomllib/tomli），設定改由 TOML 檔提供，
+        環境變數只覆寫 DISCORD_WEBHOOK_URL 與 LOG_LEVEL
         """
-        self.logger = logging.getLogger(__name__)
+        # 日誌系統尚未設定前的訊息，待 LoggerManager 建立後輸出
+        self._pending_logs: List[Tuple[int, str]] = []
         self.env_file = env_file
+        self.use_cache = use_cache
         self.config = {}
+        self._views: Dict[str, Mapping[str, Any]] = {}
+        self._env_snapshot: Dict[str, str] = {}
+        self._cache_path = Path(env_file).with_name(CACHE_FILE_NAME)
+        self._toml_path = Path(env_file).with_name(TOML_FILE_NAME)
+
+        # 快取命中時跳過 .env 解析、設定載入與驗證
+        cache_key = self._get_cache_key() if use_cache else None
+        if cache_key is not None and self._load_cached_config(cache_key):
+            self._log(logging.INFO, "設定管理器初始化完成（使用快取）")
+            return
 
         # 載入環境變數
         self._load_environment()
@@ -41,120 +197,270 @@ class ConfigManager:
         # 驗證必要設定
         self._validate_config()
 
-        self.logger.info("設定管理器初始化完成")
+        if cache_key is not None:
+            self._save_cached_config(cache_key)
+
+        self._log(logging.INFO, "設定管理器初始化完成")
+
+    def _log(self, level: int, message: str):
+        """記錄日誌；日誌系統尚未設定時先暫存"""
+        if _LOG.hasHandlers():
+            _LOG.log(level, message)
+        else:
+            self._pending_logs.append((level, message))
+
+    def flush_pending_logs(self, log_manager):
+        """
+        將暫存的日誌訊息輸出到已設定的日誌系統
+
+        Args:
+            log_manager: 已完成設定的 LoggerManager
+        """
+        if not self._pending_logs:
+            return
+
+        logger = log_manager.get_logger("config")
+        for level, message in self._pending_logs:
+            logger.log(level, message)
+        self._pending_logs.clear()
+
+    def _get_cache_key(self) -> Optional[Tuple[int, int, str]]:
+        """
+        計算設定快取鍵
+
+        由 .env 檔案的 mtime/大小、config.toml 的狀態，以及載入 .env 之前
+        已存在的相關環境變數組成（load_dotenv 不會覆寫既有變數，因此共同決定設定結果）
+
+        Returns:
+            快取鍵，.env 不存在時返回 None
+        """
+        try:
+            stat = os.stat(self.env_file)
+        except OSError:
+            return None
+
+        env_digest = hashlib.sha256()
+        try:
+            toml_stat = os.stat(self._toml_path)
+            env_digest.update(
+                f"toml={toml_stat.st_mtime_ns}:{toml_stat.st_size}\n".encode("utf-8")
+            )
+        except OSError:
+            env_digest.update(b"toml=None\n")
+        for key in _ENV_KEYS:
+            value = os.environ.get(key)
+            if value is not None and _DOTENV_INJECTED.get(key) == value:
+                value = None
+            env_digest.update(f"{key}={value!r}\n".encode("utf-8"))
+
+        return (stat.st_mtime_ns, stat.st_size, env_digest.hexdigest())
+
+    def _load_cached_config(self, cache_key: Tuple[int, int, str]) -> bool:
+        """
+        從磁碟快取載入設定
+
+        Args:
+            cache_key: 目前的快取鍵
+
+        Returns:
+            是否成功使用快取
+        """
+        try:
+            with open(self._cache_path, "rb") as f:
+                cached = json_loads(f.read())
+        except (OSError, ValueError):
+            return False
+
+        if not isinstance(cached, dict) or cached.get("key") != list(cache_key):
+            return False
+
+        config = cached.get("config")
+        if not isinstance(config, dict):
+            return False
+
+        self._set_config(config)
+        self._log(logging.DEBUG, f"使用設定快取: {self._cache_path}")
+        return True
+
+    def _save_cached_config(self, cache_key: Tuple[int, int, str]):
+        """
+        將設定原子性寫入磁碟快取（寫入失敗不影響正常運作）
+
+        Args:
+            cache_key: 目前的快取鍵
+        """
+        temp_file = self._cache_path.with_name(CACHE_FILE_NAME + ".tmp")
+        try:
+            # 快取含有 Webhook URL，僅允許擁有者讀寫
+            fd = os.open(
+                temp_file,
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+                0o600,
+            )
+            with open(fd, "wb") as f:
+                f.write(json_dumpb({"key": list(cache_key), "config": self.config}))
+            os.replace(temp_file, self._cache_path)
+        except OSError as e:
+            self._log(logging.DEBUG, f"寫入設定快取失敗: {e}")
+
+    def _environment_preloaded(self) -> bool:
+        """檢查必要環境變數是否已由行程環境提供（不計入 load_dotenv 注入的值）"""
+        for key in _PRELOADED_ENV_KEYS:
+            value = os.environ.get(key)
+            if not value or _DOTENV_INJECTED.get(key) == value:
+                return False
+        return True
 
     def _load_environment(self):
         """載入環境變數"""
+        if self._environment_preloaded():
+            self._log(logging.DEBUG, "環境變數已由行程環境提供，略過 .env 檔案")
+            return
+
         env_path = Path(self.env_file)
 
         if env_path.exists():
-            load_dotenv(env_path)
-            self.logger.info(f"環境變數檔案已載入: {env_path}")
+            before = {key: os.environ.get(key) for key in _ENV_KEYS}
+            load_dotenv(env_path, override=False)
+            for key, value in before.items():
+                if value is None and key in os.environ:
+                    _DOTENV_INJECTED[key] = os.environ[key]
+            self._log(logging.INFO, f"環境變數檔案已載入: {env_path}")
         else:
-            self.logger.warning(f"環境變數檔案不存在: {env_path}")
+            self._log(logging.WARNING, f"環境變數檔案不存在: {env_path}")
 
     def _load_config(self):
-        """載入所有設定"""
-        self.config = {
-            # Discord 設定
-            "discord": {
-                "webhook_url": self._get_env("DISCORD_WEBHOOK_URL"),
-                "message_template": self._get_env(
-                    "DISCORD_MESSAGE_TEMPLATE", "Minecraft Server IP Updated: {ip}:25565"
-                ),
-                "retry_attempts": self._get_env_int("DISCORD_RETRY_ATTEMPTS", 3),
-                "timeout": self._get_env_int("DISCORD_TIMEOUT", 10),
-            },
-            # 應用程式設定
-            "app": {
-                "name": self._get_env("APP_NAME", "Discord IP Bot"),
-                "log_level": self._get_env("LOG_LEVEL", "INFO"),
-                "schedule_time": self._get_env("SCHEDULE_TIME", "09:00"),
-                "timezone": self._get_env("TIMEZONE", "Asia/Taipei"),
-            },
-            # IP 檢測設定
-            "ip_detection": {
-                "check_public_ip": self._get_env_bool("CHECK_PUBLIC_IP", True),
-                "check_local_ip": self._get_env_bool("CHECK_LOCAL_IP", True),
-                "timeout": self._get_env_int("IP_CHECK_TIMEOUT", 10),
-                "retry_attempts": self._get_env_int("IP_RETRY_ATTEMPTS", 3),
-                "save_history": self._get_env_bool("SAVE_IP_HISTORY", True),
-            },
-            # 系統設定
-            "system": {
-                "logs_dir": self._get_env("LOGS_DIR", "logs"),
-                "data_dir": self._get_env("DATA_DIR", "data"),
-                "max_log_files": self._get_env_int("MAX_LOG_FILES", 7),
-                "max_log_size_mb": self._get_env_int("MAX_LOG_SIZE_MB", 10),
-            },
-            # 排程設定
-            "scheduler": {
-                "daily_time": self._get_env("SCHEDULE_TIME", "09:00"),
-                "status_update_interval": self._get_env_int(
-                    "STATUS_UPDATE_INTERVAL", 60
-                ),
-                "max_execution_history": self._get_env_int("MAX_EXECUTION_HISTORY", 50),
-            },
-            # IP 歷史記錄設定
-            "ip_history": {
-                "file_path": self._get_env("IP_HISTORY_FILE", "config/ip_history.json"),
-                "keep_days": self._get_env_int("IP_HISTORY_KEEP_DAYS", 30),
-                "max_records": self._get_env_int("IP_HISTORY_MAX_RECORDS", 1000),
-                "auto_cleanup": self._get_env_bool("IP_HISTORY_AUTO_CLEANUP", True),
-                "backup_on_corruption": self._get_env_bool(
-                    "IP_HISTORY_BACKUP_ON_CORRUPTION", True
-                ),
-                "compression": self._get_env_bool("IP_HISTORY_COMPRESSION", False),
-                "encoding": self._get_env("IP_HISTORY_ENCODING", "utf-8"),
-            },
+        """依 SCHEMA 一次載入所有設定"""
+        # 取一次環境變數快照，之後只做一般 dict 查詢
+        env = os.environ.copy()
+        self._env_snapshot = env
+        coercers = {
+            str: self._coerce_str,
+            int: self._coerce_int,
+            bool: self._coerce_bool,
         }
 
-    def _get_env(self, key: str, default: Optional[str] = None) -> Optional[str]:
-        """取得環境變數字串值"""
-        value = os.getenv(key, default)
-        if value == "":
+        toml_config = self._load_toml_config()
+
+        config = defaultdict(dict)
+        for section, key, env_key, value_type, default in SCHEMA:
+            if toml_config is None or (
+                env_key in _TOML_ENV_OVERRIDES and env.get(env_key)
+            ):
+                value = coercers[value_type](env_key, env.get(env_key), default)
+            else:
+                value = self._get_toml_value(
+                    toml_config, section, key, value_type, default
+                )
+            config[section][key] = value
+        self._set_config(dict(config))
+
+    def _load_toml_config(self) -> Optional[Dict[str, Any]]:
+        """
+        載入選用的 TOML 設定檔
+
+        Returns:
+            TOML 內容，檔案不存在或無可用的 TOML 解析器時返回 None
+
+        Raises:
+            ConfigError: TOML 檔案讀取或解析失敗
+        """
+        if not self._toml_path.exists():
+            return None
+
+        if tomllib is None:
+            self._log(
+                logging.WARNING,
+                f"找到 {self._toml_path} 但無法使用 tomllib/tomli，改用環境變數設定",
+            )
+            return None
+
+        try:
+            with open(self._toml_path, "rb") as f:
+                data = tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError) as e:
+            raise ConfigError(f"TOML 設定檔載入失敗: {self._toml_path}: {e}")
+
+        self._log(logging.INFO, f"TOML 設定檔已載入: {self._toml_path}")
+        return data
+
+    def _get_toml_value(
+        self,
+        toml_config: Dict[str, Any],
+        section: str,
+        key: str,
+        value_type: type,
+        default: Any,
+    ) -> Any:
+        """取得 TOML 設定值，缺少或型別不符時使用預設值"""
+        section_values = toml_config.get(section)
+        if not isinstance(section_values, dict) or key not in section_values:
+            return default
+
+        value = section_values[key]
+        # bool 是 int 的子類別，需另外排除
+        if not isinstance(value, value_type) or (
+            value_type is int and isinstance(value, bool)
+        ):
+            self._log(
+                logging.WARNING,
+                f"TOML 設定 {section}.{key} 型別應為 {value_type.__name__}，"
+                f"使用預設值: {default}",
+            )
             return default
+
         return value
 
-    def _get_env_int(self, key: str, default: int) -> int:
-        """取得環境變數整數值"""
-        try:
-            value = os.getenv(key)
-            if value:
-                return int(value)
+    def _set_config(self, config: Dict[str, Dict[str, Any]]):
+        """設定內容並建立各區塊的唯讀檢視"""
+        self.config = config
+        self._views = {
+            section: MappingProxyType(settings) for section, settings in config.items()
+        }
+
+    def _coerce_str(
+        self, key: str, value: Optional[str], default: Optional[str]
+    ) -> Optional[str]:
+        """轉換環境變數字串值（空字串視為未設定）"""
+        return value if value else default
+
+    def _coerce_int(self, key: str, value: Optional[str], default: int) -> int:
+        """轉換環境變數整數值"""
+        if not value:
             return default
+        try:
+            return int(value)
         except ValueError:
-            self.logger.warning(f"環境變數 {key} 不是有效整數，使用預設值: {default}")
+            self._log(
+                logging.WARNING, f"環境變數 {key} 不是有效整數，使用預設值: {default}"
+            )
             return default
 
-    def _get_env_bool(self, key: str, default: bool) -> bool:
-        """取得環境變數布林值"""
-        value = os.getenv(key)
+    def _coerce_bool(self, key: str, value: Optional[str], default: bool) -> bool:
+        """轉換環境變數布林值"""
         if value is None:
             return default
 
-        return value.lower() in ("true", "1", "yes", "on", "enabled")
+        return value.strip().lower() in self._TRUTHY
 
     def _validate_config(self):
         """驗證必要設定"""
         errors = []
 
-        # 檢查必要的 Discord Webhook URL
+        # 檢查必要設定
+        for section, key, env_key in _REQUIRED_KEYS:
+            if not self.config[section][key]:
+                errors.append(f"{env_key} 環境變數未設定")
+
+        # 檢查 Discord Webhook URL 格式
         webhook_url = self.config["discord"]["webhook_url"]
-        if not webhook_url:
-            errors.append("DISCORD_WEBHOOK_URL 環境變數未設定")
-        elif not webhook_url.startswith("https://discord.com/api/webhooks/"):
+        if webhook_url and not is_valid_webhook_url(webhook_url):
             errors.append("DISCORD_WEBHOOK_URL 格式不正確")
 
         # 檢查排程時間格式
         schedule_time = self.config["scheduler"]["daily_time"]
-        if schedule_time:
-            try:
-                hours, minutes = schedule_time.split(":")
-                if not (0 <= int(hours) <= 23) or not (0 <= int(minutes) <= 59):
-                    errors.append(f"SCHEDULE_TIME 格式不正確: {schedule_time}")
-            except ValueError:
-                errors.append(f"SCHEDULE_TIME 格式不正確: {schedule_time}")
+        if schedule_time and not _TIME_RE.match(schedule_time):
+            errors.append(f"SCHEDULE_TIME 格式不正確: {schedule_time}")
 
         # 檢查日誌級別
         log_level = self.config["app"]["log_level"]
@@ -185,29 +491,29 @@ class ConfigManager:
                 return default
             raise ConfigError(f"設定項目不存在: {section}.{key}")
 
-    def get_discord_config(self) -> Dict[str, Any]:
+    def get_discord_config(self) -> Mapping[str, Any]:
         """取得 Discord 相關設定"""
-        return self.config["discord"].copy()
+        return self._views["discord"]
 
-    def get_app_config(self) -> Dict[str, Any]:
+    def get_app_config(self) -> Mapping[str, Any]:
         """取得應用程式設定"""
-        return self.config["app"].copy()
+        return self._views["app"]
 
-    def get_ip_config(self) -> Dict[str, Any]:
+    def get_ip_config(self) -> Mapping[str, Any]:
         """取得 IP 檢測設定"""
-        return self.config["ip_detection"].copy()
+        return self._views["ip_detection"]
 
-    def get_system_config(self) -> Dict[str, Any]:
+    def get_system_config(self) -> Mapping[str, Any]:
         """取得系統設定"""
-        return self.config["system"].copy()
+        return self._views["system"]
 
-    def get_scheduler_config(self) -> Dict[str, Any]:
+    def get_scheduler_config(self) -> Mapping[str, Any]:
         """取得排程設定"""
-        return self.config["scheduler"].copy()
+        return self._views["scheduler"]
 
-    def get_ip_history_config(self) -> Dict[str, Any]:
+    def get_ip_history_config(self) -> Mapping[str, Any]:
         """取得IP歷史記錄相關設定"""
-        return self.config["ip_history"].copy()
+        return self._views["ip_history"]
 
     def get_history_file_path(self) -> str:
         """取得IP歷史記錄檔案路徑"""
@@ -225,20 +531,45 @@ class ConfigManager:
         if history_file_path.parent != Path("."):  # 不是當前目錄
             directories.append(str(history_file_path.parent))
 
+        # 依上層目錄分組，每個上層目錄只掃描一次
+        by_parent = defaultdict(set)
         for directory in directories:
             path = Path(directory)
-            if not path.exists():
+            by_parent[path.parent].add(path.name)
+
+        for parent, names in by_parent.items():
+            try:
+                with os.scandir(parent) as entries:
+                    existing = {entry.name for entry in entries}
+            except OSError:
+                existing = set()
+
+            for name in sorted(names - existing):
+                path = parent / name
                 path.mkdir(parents=True, exist_ok=True)
-                self.logger.info(f"建立目錄: {path}")
+                self._log(logging.INFO, f"建立目錄: {path}")
 
     def get_all_config(self) -> Dict[str, Any]:
         """取得所有設定（用於除錯）"""
+        return self._masked_config
+
+    @classmethod
+    def _is_sensitive_key(cls, key: str) -> bool:
+        """判斷設定鍵是否為敏感資訊（先查集合，未命中再比對子字串）"""
+        if key in cls._SENSITIVE:
+            return True
+        lowered = key.lower()
+        return any(part in lowered for part in cls._SENSITIVE_SUBSTRINGS)
+
+    @cached_property
+    def _masked_config(self) -> Dict[str, Any]:
+        """遮蔽敏感資訊後的設定（設定載入後不再變動，只計算一次）"""
         # 遮蔽敏感資訊
         safe_config = {}
         for section, settings in self.config.items():
             safe_config[section] = {}
             for key, value in settings.items():
-                if "webhook" in key.lower() or "token" in key.lower():
+                if self._is_sensitive_key(key):
                     # 遮蔽敏感資訊
                     if isinstance(value, str) and len(value) > 10:
                         safe_config[section][key] = value[:10] + "..." + value[-5:]
@@ -6,15 +6,41 @@ Discord 通信模組 - Discord IP Bot
 """
 
 import logging
+import random
+import re
+import string
 import time
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 import requests
 from urllib3.exceptions import InsecureRequestWarning
 import urllib3
 
+try:
+    from .dns_cache import CachedDNSAdapter
+except ImportError:
+    from dns_cache import CachedDNSAdapter
+
 # 禁用 SSL 警告以避免在某些環境下的問題
 urllib3.disable_warnings(InsecureRequestWarning)
 
+# Discord Webhook URL 格式（含 ptb/canary 子網域，可附帶 ?thread_id= 等查詢參數）
+WEBHOOK_URL_RE = re.compile(
+    r"^https://(?:ptb\.|canary\.)?discord\.com/api/webhooks/\d+/[\w-]+(?:\?[^#\s]*)?$"
+)
+
+
+def is_valid_webhook_url(webhook_url: str) -> bool:
+    """
+    檢查 Discord Webhook URL 格式（設定驗證與客戶端共用）
+
+    Args:
+        webhook_url: Webhook URL
+
+    Returns:
+        bool: 格式是否正確
+    """
+    return bool(WEBHOOK_URL_RE.match(webhook_url))
+
 
 class DiscordClientError(Exception):
     """Discord 通信相關錯誤的基礎例外類別"""
@@ -45,13 +71,19 @@ class DiscordClient:
     - 支援重試機制確保訊息送達
     """
 
-    def __init__(self, webhook_url: str, config: Optional[Dict[str, Any]] = None):
+    def __init__(
+        self,
+        webhook_url: str,
+        config: Optional[Dict[str, Any]] = None,
+        session: Optional[requests.Session] = None,
+    ):
         """
         初始化 Discord 客戶端
 
         Args:
             webhook_url: Discord Webhook URL
             config: 設定字典，包含逾時設定、重試次數等
+            session: 共用的 requests.Session，不提供時自行建立並於 close() 時關閉
         """
         self.logger = logging.getLogger(__name__)
 
@@ -59,16 +91,23 @@ class DiscordClient:
         if not webhook_url or not webhook_url.strip():
             raise ValueError("Webhook URL 不能為空")
 
-        if not webhook_url.startswith("https://discord.com/api/webhooks/"):
+        if not is_valid_webhook_url(webhook_url.strip()):
             raise ValueError("無效的 Discord Webhook URL 格式")
 
         self.webhook_url = webhook_url.strip()
 
+        # 持久化 Session：重試與後續發送共用 keep-alive 連線，省去 TCP/TLS 握手
+        # （於 URL 驗證之後建立，無效設定不會留下未關閉的連線池）
+        self._owns_session = session is None
+        self._session = session if session is not None else self._create_session()
+
         # 預設設定
         self.config = {
             "timeout": 10,
             "retry_attempts": 3,
-            "retry_delay": 2,
+            "retry_delay": 2,  # 指數退避的基礎等待秒數
+            "retry_jitter": 0.5,  # 隨機抖動比例，避免多個實例同步重試
+            "retry_max_delay": 30.0,  # 單次等待上限（含 Retry-After）
             "message_template": "Minecraft Server IP Updated: {ip}:25565",
             "max_message_length": 2000,
         }
@@ -77,8 +116,34 @@ class DiscordClient:
         if config:
             self.config.update(config)
 
+        # 預先解析的訊息模板（初始化時建立，模板變更時重新解析）
+        self._compiled_template: Optional[str] = None
+        self._template_literals: Optional[List[str]] = None
+        self._literals_length = 0
+        self._get_template_literals()
+
         self.logger.info("Discord 客戶端初始化完成")
 
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """建立帶有連線池的 HTTP Session"""
+        session = requests.Session()
+        adapter = CachedDNSAdapter(pool_connections=2, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": "Discord-IP-Bot/1.0"})
+        return session
+
+    def close(self):
+        """關閉自行建立的 HTTP Session（共用的 Session 由建立者負責關閉）"""
+        if self._owns_session:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def send_ip_notification(self, ip_address: str) -> bool:
         """
         發送 IP 地址通知到 Discord 頻道
@@ -102,6 +167,45 @@ class DiscordClient:
         # 發送訊息
         return self._send_message(message)
 
+    def _get_template_literals(self) -> Optional[List[str]]:
+        """
+        取得預先解析的訊息模板片段（模板變更時重新解析）
+
+        模板只包含 {ip} 欄位時，返回以 {ip} 分隔的文字片段，
+        格式化即為 ip.join(片段)；含其他欄位、格式規格或語法錯誤時返回 None，
+        交由 str.format 處理（並產生原本的錯誤訊息）
+
+        Returns:
+            Optional[List[str]]: 模板文字片段
+        """
+        template = self.config["message_template"]
+        if self._compiled_template != template:
+            self._compiled_template = template
+            self._template_literals = self._compile_template(template)
+            if self._template_literals is not None:
+                self._literals_length = sum(map(len, self._template_literals))
+
+        return self._template_literals
+
+    @staticmethod
+    def _compile_template(template: str) -> Optional[List[str]]:
+        """將只含 {ip} 欄位的模板拆成文字片段"""
+        literals = [""]
+        try:
+            for literal, field, format_spec, conversion in string.Formatter().parse(
+                template
+            ):
+                literals[-1] += literal
+                if field is None:
+                    continue
+                if field != "ip" or format_spec or conversion:
+                    return None
+                literals.append("")
+        except ValueError:
+            return None
+
+        return literals
+
     def _format_message(self, ip_address: str) -> str:
         """
         格式化 IP 地址為 Discord 訊息
@@ -120,15 +224,28 @@ class DiscordClient:
             raise MessageFormatError("IP 地址不能為空")
 
         try:
-            message = self.config["message_template"].format(ip=ip_address)
+            literals = self._get_template_literals()
+            if literals is None:
+                message = self.config["message_template"].format(ip=ip_address)
+                message_length = len(message)
+            else:
+                # 先計算長度，超過限制時不必組出完整訊息
+                message_length = self._literals_length + len(ip_address) * (
+                    len(literals) - 1
+                )
+                message = None
 
             # 檢查訊息長度
-            if len(message) > self.config["max_message_length"]:
+            max_length = self.config["max_message_length"]
+            if message_length > max_length:
                 raise MessageFormatError(
-                    f"訊息長度超過限制 ({len(message)} > {self.config['max_message_length']})"
+                    f"訊息長度超過限制 ({message_length} > {max_length})"
                 )
 
-            self.logger.debug(f"訊息格式化完成: {message}")
+            if message is None:
+                message = ip_address.join(literals)
+
+            self.logger.debug("訊息格式化完成: %s", message)
             return message
 
         except KeyError as e:
@@ -161,10 +278,10 @@ class DiscordClient:
         for attempt in range(self.config["retry_attempts"]):
             try:
                 self.logger.debug(
-                    f"嘗試發送訊息到 Discord (第{attempt + 1}次): {message}"
+                    "嘗試發送訊息到 Discord (第%d次): %s", attempt + 1, message
                 )
 
-                response = requests.post(
+                response = self._session.post(
                     self.webhook_url,
                     json=payload,
                     timeout=self.config["timeout"],
@@ -176,14 +293,19 @@ class DiscordClient:
                     self.logger.info("Discord 訊息發送成功")
                     return True
                 elif response.status_code == 429:
-                    # 處理速率限制
-                    retry_after = response.headers.get("Retry-After", "1")
+                    # 處理速率限制：優先遵守 Retry-After，並計入重試次數
+                    last_error = "Discord 速率限制 (HTTP 429)"
+                    if attempt >= self.config["retry_attempts"] - 1:
+                        break
+
+                    retry_after = response.headers.get("Retry-After")
                     try:
                         wait_time = float(retry_after)
-                    except ValueError:
-                        wait_time = 1
+                    except (TypeError, ValueError):
+                        wait_time = self._backoff_delay(attempt)
 
-                    self.logger.warning(f"遇到速率限制，等待 {wait_time} 秒後重試")
+                    wait_time = min(max(wait_time, 0), self.config["retry_max_delay"])
+                    self.logger.warning("遇到速率限制，等待 %s 秒後重試", wait_time)
                     time.sleep(wait_time)
                     continue
                 else:
@@ -194,16 +316,33 @@ class DiscordClient:
 
             except requests.RequestException as e:
                 last_error = e
-                self.logger.warning(f"發送訊息失敗 (第{attempt + 1}次): {e}")
+                self.logger.warning("發送訊息失敗 (第%d次): %s", attempt + 1, e)
 
                 if attempt < self.config["retry_attempts"] - 1:
-                    time.sleep(self.config["retry_delay"])
+                    time.sleep(self._backoff_delay(attempt))
 
         # 所有重試都失敗
         error_msg = f"所有發送嘗試都失敗，最後錯誤: {last_error}"
         self.logger.error(error_msg)
         raise WebhookError(error_msg)
 
+    def _backoff_delay(self, attempt: int) -> float:
+        """
+        計算第 attempt 次失敗後的指數退避等待時間（含隨機抖動）
+
+        Args:
+            attempt: 已失敗的嘗試索引（從 0 開始）
+
+        Returns:
+            float: 等待秒數，不超過 retry_max_delay
+        """
+        delay = (
+            self.config["retry_delay"]
+            * (2**attempt)
+            * (1 + random.random() * self.config["retry_jitter"])
+        )
+        return min(delay, self.config["retry_max_delay"])
+
     def test_connection(self) -> bool:
         """
         測試 Discord Webhook 連線狀態
@@ -304,8 +443,6 @@ def main():
     """
     測試函數 - 獨立測試 Discord 客戶端
     """
-    import logging
-
     # 設定日誌
     logging.basicConfig(
         level=logging.INFO,
@@ -316,7 +453,7 @@ def main():
     print()
 
     # 注意：實際使用時需要真實的 Webhook URL
-    test_webhook_url = "https://discord.com/api/webhooks/test/example"
+    test_webhook_url = "https://discord.com/api/webhooks/123456789/example"
 
     try:
         print("📝 建立 Discord 客戶端...")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DNS 解析快取模組
+
+為 HTTP 連線池提供行程內的 DNS 解析快取（預設 TTL 15 分鐘），
+排程檢查時重複連線公共IP服務與 Discord 不必每次都查詢系統解析器。
+快取只影響 TCP 連線的目標位址；TLS 的 SNI 與憑證驗證仍使用原始主機名稱。
+
+同時讓所有 HTTPS 連線共用預先建立的 SSLContext，
+新連線不必每次重新建立 context 並載入 CA 憑證。
+
+作者: Discord IP Bot Team
+版本: 1.0.0
+"""
+
+import socket
+import ssl
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import connection
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.ssl_ import create_urllib3_context
+
+# DNS 快取存活時間（秒）
+DNS_CACHE_TTL = 900
+
+
+class DNSCache:
+    """執行緒安全的 DNS 解析 TTL 快取"""
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL):
+        """
+        初始化 DNS 快取
+
+        Args:
+            ttl: 快取存活時間（秒）
+        """
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        """
+        解析主機名稱，在 TTL 內直接返回快取結果
+
+        Args:
+            host: 主機名稱
+            port: 連接埠
+
+        Returns:
+            List[str]: 解析出的IP位址（依解析器順序）
+
+        Raises:
+            socket.gaierror: 解析失敗
+        """
+        key = (host, port)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                return entry[1]
+
+        infos = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+
+        with self._lock:
+            self._entries[key] = (now, addresses)
+
+        return addresses
+
+    def invalidate(self, host: str, port: int) -> None:
+        """移除指定主機的快取（連線失敗時呼叫）"""
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self) -> None:
+        """清空所有快取"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 行程內共用的 DNS 快取
+dns_cache = DNSCache()
+
+
+class _CachedDNSMixin:
+    """以 DNS 快取建立 TCP 連線的 urllib3 連線混入類別"""
+
+    def _new_conn(self) -> socket.socket:
+        try:
+            addresses = dns_cache.resolve(self._dns_host, self.port)
+        except OSError:
+            # 解析失敗時交由 urllib3 原本的流程處理，以取得一致的例外類型
+            return super()._new_conn()
+
+        try:
+            return connection.create_connection(
+                (addresses[0], self.port),
+                self.timeout,
+                source_address=self.source_address,
+                socket_options=self.socket_options,
+            )
+        except OSError:
+            # 快取的位址可能已失效，清除後重新解析
+            dns_cache.invalidate(self._dns_host, self.port)
+            return super()._new_conn()
+
+
+class CachedHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class CachedHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+
+class CachedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CachedHTTPConnection
+
+
+class CachedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CachedHTTPSConnection
+
+
+@lru_cache(maxsize=8)
+def get_ssl_context(ca_certs: Optional[str]) -> ssl.SSLContext:
+    """
+    取得行程內共用的 SSLContext（每個 CA 檔案首次使用時建立）
+
+    驗證與不驗證憑證分別使用不同的 context，urllib3 每次連線設定的
+    verify_mode 因此永遠與 context 原本的設定一致
+
+    Args:
+        ca_certs: CA 憑證檔案路徑，None 表示不驗證伺服器憑證
+
+    Returns:
+        ssl.SSLContext: 共用的 SSLContext
+    """
+    if ca_certs is None:
+        return create_urllib3_context(cert_reqs=ssl.CERT_NONE)
+
+    context = create_urllib3_context(cert_reqs=ssl.CERT_REQUIRED)
+    context.load_verify_locations(cafile=ca_certs)
+    return context
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """使用行程內 DNS 快取與共用 SSLContext 的 requests HTTPAdapter"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CachedHTTPConnectionPool,
+            "https": CachedHTTPSConnectionPool,
+        }
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+
+        # CA 目錄與用戶端憑證維持 requests 原本的流程
+        if not url.lower().startswith("https") or cert or conn.ca_cert_dir:
+            return
+
+        if conn.cert_reqs == "CERT_NONE":
+            conn.conn_kw["ssl_context"] = get_ssl_context(None)
+        elif conn.ca_certs:
+            conn.conn_kw["ssl_context"] = get_ssl_context(conn.ca_certs)
+            # CA 已載入共用 context，避免 urllib3 每次連線重新載入
+            conn.ca_certs = None
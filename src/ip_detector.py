@@ -5,35 +5,58 @@ IP檢測模組 - Discord IP Bot
 設計為完全跨平台相容 (MacOS, Windows 10/11, Linux)。
 """
 
+import os
 import socket
-import json
 import logging
 import platform
-import subprocess
-from typing import Dict, List, Optional, Union, Any
+import threading
+from typing import Dict, List, Optional, Tuple, Union, Any
 from pathlib import Path
 import requests
 from urllib3.exceptions import InsecureRequestWarning
 import urllib3
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timezone
 
 # 嘗試導入 IPHistoryManager，如果失敗則使用舊的歷史記錄方法
 try:
-    from .ip_history import IPHistoryManager
+    from .ip_history import DEFAULT_HISTORY_CONFIG, IPHistoryManager
 
     HISTORY_MANAGER_AVAILABLE = True
 except ImportError:
     try:
-        from ip_history import IPHistoryManager
+        from ip_history import DEFAULT_HISTORY_CONFIG, IPHistoryManager
 
         HISTORY_MANAGER_AVAILABLE = True
     except ImportError:
         HISTORY_MANAGER_AVAILABLE = False
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from .config import json_dumpb, json_loads
+    from .dns_cache import CachedDNSAdapter
+except ImportError:
+    from config import json_dumpb, json_loads
+    from dns_cache import CachedDNSAdapter
+
 # 禁用 SSL 警告以避免在某些環境下的問題
 urllib3.disable_warnings(InsecureRequestWarning)
 
+_inet_pton = socket.inet_pton
+
+# 舊版歷史記錄（JSON Lines）保留筆數、壓縮門檻與尾端讀取區塊大小
+HISTORY_MAX_RECORDS = 100
+HISTORY_COMPACT_BYTES = 64 * 1024
+HISTORY_TAIL_BLOCK_SIZE = 4096
+
+# 公共IP服務回應的最大讀取位元組數（IPv4 位址加換行遠小於此值）
+PUBLIC_IP_MAX_BYTES = 64
+
 
 class IPDetectorError(Exception):
     """IP檢測相關錯誤的基礎例外類別"""
@@ -58,13 +81,23 @@ class IPDetector:
     - 儲存IP歷史記錄
     """
 
-    def __init__(self, config: Optional[Dict[str, Any]] = None, history_manager=None):
+    # 同一行程內共用的歷史管理器：歷史檔案的絕對路徑 → [管理器, 使用中的檢測器數]
+    _shared_history_managers: Dict[str, List[Any]] = {}
+    _shared_history_lock = threading.Lock()
+
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        history_manager=None,
+        session: Optional[requests.Session] = None,
+    ):
         """
         初始化IP檢測器
 
         Args:
             config: 設定字典，包含逾時設定、重試次數等
             history_manager: IP歷史管理器實例，如果不提供則自動創建
+            session: 共用的 requests.Session，不提供時自行建立並於 close() 時關閉
         """
         self.logger = logging.getLogger(__name__)
 
@@ -73,39 +106,113 @@ class IPDetector:
             "timeout": 10,
             "retry_attempts": 3,
             "retry_delay": 2,
+            "race_stagger": 0.3,  # 競速查詢時啟動下一個服務前的等待秒數
+            "local_ip_ttl": 60,  # 本地IP快取秒數（DHCP 租約通常以小時計）
             "public_ip_services": [
                 "https://api.ipify.org",
                 "https://icanhazip.com",
                 "https://ident.me",
                 "https://checkip.amazonaws.com",
             ],
-            "history_file": "logs/ip_history.json",  # 舊版相容性
+            "history_file": "logs/ip_history.jsonl",  # 舊版相容性
         }
 
         # 更新使用者提供的設定
         if config:
             self.config.update(config)
 
-        # 初始化歷史管理器
+        # 持久化 Session：重試與後續檢測共用 keep-alive 連線，省去 TCP/TLS 握手
+        self._owns_session = session is None
+        self._session = session if session is not None else self._create_session()
+
+        # 本地IP快取：(取得時間, IP)
+        self._local_ip_cache = (0.0, None)
+
+        # 舊版歷史檔案格式只需在首次寫入時檢查一次
+        self._legacy_history_checked = False
+
+        # 最後一筆舊版歷史記錄的記憶體快取，避免每次比較都讀取檔案
+        self._last_record: Optional[Dict[str, str]] = None
+
+        # 初始化歷史管理器（取自共用快取時記錄其鍵，close() 時歸還）
         self.history_manager = history_manager
+        self._shared_history_key: Optional[str] = None
+        self._history_released = False
         if self.history_manager is None and HISTORY_MANAGER_AVAILABLE:
             try:
-                # 如果有新的歷史管理器，使用它
-                history_file = self.config.get(
-                    "ip_history_file", "config/ip_history.json"
+                # 如果有新的歷史管理器，使用它（同一行程內依檔案路徑共用）
+                self._shared_history_key, self.history_manager = (
+                    self._acquire_shared_history(self.config)
                 )
-                self.history_manager = IPHistoryManager(history_file, self.config)
                 self.logger.info("使用新的IP歷史管理系統")
             except Exception as e:
-                self.logger.warning(f"初始化IP歷史管理器失敗: {e}，使用舊版歷史記錄")
+                self.logger.warning("初始化IP歷史管理器失敗: %s，使用舊版歷史記錄", e)
                 self.history_manager = None
         elif not HISTORY_MANAGER_AVAILABLE:
             self.logger.warning("IP歷史管理器不可用，使用舊版歷史記錄")
 
-        # 確保日誌目錄存在（舊版相容性）
-        Path(self.config["history_file"]).parent.mkdir(parents=True, exist_ok=True)
+        self.logger.info("IP檢測器初始化完成 - 平台: %s", platform.system())
+
+    @classmethod
+    def _acquire_shared_history(
+        cls, config: Dict[str, Any]
+    ) -> Tuple[str, "IPHistoryManager"]:
+        """
+        取得依歷史檔案路徑共用的 IPHistoryManager，避免每次建立檢測器都重新載入檔案
+
+        沒有檢測器使用中（或檔案被外部刪除）時依目前設定重新建立；
+        仍有檢測器使用中而設定不同時沿用既有的管理器並記錄警告，
+        同一檔案只由一個管理器寫入
+
+        Args:
+            config: 檢測器設定
+
+        Returns:
+            Tuple[str, IPHistoryManager]: 共用快取的鍵與歷史管理器實例
+        """
+        history_file = config.get("ip_history_file", "config/ip_history.json")
+        key = str(Path(history_file).resolve())
+        wanted = {k: config.get(k, v) for k, v in DEFAULT_HISTORY_CONFIG.items()}
+
+        with cls._shared_history_lock:
+            entry = cls._shared_history_managers.get(key)
+            if entry is not None and entry[0].history_file.exists():
+                manager, users = entry
+                current = {k: manager.config.get(k) for k in DEFAULT_HISTORY_CONFIG}
+                if current == wanted:
+                    entry[1] += 1
+                    return key, manager
+                if users:
+                    logging.getLogger(__name__).warning(
+                        "歷史檔案 %s 已由其他檢測器以不同設定使用中，沿用既有設定",
+                        history_file,
+                    )
+                    entry[1] += 1
+                    return key, manager
 
-        self.logger.info(f"IP檢測器初始化完成 - 平台: {platform.system()}")
+            manager = IPHistoryManager(history_file, config)
+            cls._shared_history_managers[key] = [manager, 1]
+            return key, manager
+
+    def _release_history(self) -> None:
+        """歸還歷史管理器；共用的管理器在最後一個使用者歸還時才寫入並關閉"""
+        manager = self.history_manager
+        key = self._shared_history_key
+
+        if key is not None:
+            # 重複呼叫 close() 不可多次歸還，以免關閉其他檢測器仍在使用的管理器
+            if self._history_released:
+                return
+            self._history_released = True
+
+            with self._shared_history_lock:
+                entry = self._shared_history_managers.get(key)
+                if entry is not None and entry[0] is manager:
+                    entry[1] -= 1
+                    if entry[1] > 0:
+                        return
+
+        manager.close()
 
     def get_local_ip(self) -> str:
         """
@@ -117,17 +224,75 @@ class IPDetector:
         Raises:
             NetworkError: 無法獲取本地IP時拋出
         """
+        cached_at, cached_ip = self._local_ip_cache
+        if (
+            cached_ip is not None
+            and time.monotonic() - cached_at < self.config["local_ip_ttl"]
+        ):
+            return cached_ip
+
+        local_ip = self._get_local_ip_from_interfaces()
+        if local_ip is None:
+            local_ip = self._detect_local_ip()
+
+        self._local_ip_cache = (time.monotonic(), local_ip)
+        return local_ip
+
+    def _get_local_ip_from_interfaces(self) -> Optional[str]:
+        """
+        從網路介面列表取得本地IP（不需建立 socket 或查詢路由表）
+
+        只有在恰好一個啟用中的介面擁有內網IPv4時才採用；
+        多個候選（例如 Docker 橋接網路）時無法判斷預設路由，交給 socket 方法
+
+        Returns:
+            Optional[str]: 本地IP地址，無法確定時返回 None
+        """
+        if psutil is None:
+            return None
+
+        try:
+            stats = psutil.net_if_stats()
+            candidates = {
+                addr.address
+                for name, addrs in psutil.net_if_addrs().items()
+                if name in stats and stats[name].isup
+                for addr in addrs
+                if addr.family == socket.AF_INET
+                and self._is_valid_local_ip(addr.address)
+            }
+        except Exception as e:
+            self.logger.debug("讀取網路介面失敗: %s", e)
+            return None
+
+        if len(candidates) != 1:
+            return None
+
+        local_ip = candidates.pop()
+        self.logger.debug("透過網路介面獲取本地IP: %s", local_ip)
+        return local_ip
+
+    def _detect_local_ip(self) -> str:
+        """
+        以 socket 方法偵測本地IP，失敗時改用 hostname 方法
+
+        Returns:
+            str: 本地IP地址
+
+        Raises:
+            NetworkError: 所有方法都失敗
+        """
         try:
             # 方法1: 使用socket連接外部地址來獲取本地IP（最可靠的跨平台方法）
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
                 # 連接到 Google DNS，但不實際發送資料
                 s.connect(("8.8.8.8", 80))
                 local_ip = s.getsockname()[0]
-                self.logger.debug(f"透過socket方法獲取本地IP: {local_ip}")
+                self.logger.debug("透過socket方法獲取本地IP: %s", local_ip)
                 return local_ip
 
         except Exception as e:
-            self.logger.warning(f"Socket方法失敗: {e}，嘗試備用方法")
+            self.logger.warning("Socket方法失敗: %s，嘗試備用方法", e)
 
             try:
                 # 方法2: 使用hostname方法（備用）
@@ -136,7 +301,7 @@ class IPDetector:
 
                 # 檢查是否為有效的內網IP
                 if self._is_valid_local_ip(local_ip):
-                    self.logger.debug(f"透過hostname方法獲取本地IP: {local_ip}")
+                    self.logger.debug("透過hostname方法獲取本地IP: %s", local_ip)
                     return local_ip
                 else:
                     raise NetworkError(f"獲取到無效的本地IP: {local_ip}")
@@ -158,38 +323,57 @@ class IPDetector:
         Returns:
             bool: 是否為有效的本地IP
         """
-        if not ip or ip in ["127.0.0.1", "0.0.0.0"]:
+        try:
+            first_octet, second_octet = _inet_pton(socket.AF_INET, ip)[:2]
+        except (OSError, TypeError):
             return False
 
-        # 檢查是否為私有IP範圍
-        parts = ip.split(".")
-        if len(parts) != 4:
-            return False
+        # 私有IP範圍：
+        # 10.0.0.0 - 10.255.255.255
+        # 172.16.0.0 - 172.31.255.255
+        # 192.168.0.0 - 192.168.255.255
+        return (
+            first_octet == 10
+            or (first_octet == 172 and 16 <= second_octet <= 31)
+            or (first_octet == 192 and second_octet == 168)
+        )
+
+    def _create_session(self) -> requests.Session:
+        """建立帶有連線池的 HTTP Session（每個 IP 服務一個連線池）"""
+        pool_size = max(1, len(self.config["public_ip_services"]))
+        session = requests.Session()
+        adapter = CachedDNSAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": "Discord-IP-Bot/1.0"})
+        return session
+
+    def close(self):
+        """
+        寫入尚未保存的歷史記錄，並關閉自行建立的 HTTP Session
+        （共用的 Session 由建立者負責關閉）
+        """
+        if self.history_manager is not None:
+            try:
+                self._release_history()
+            except Exception as e:
+                self.logger.error("保存IP歷史記錄失敗: %s", e)
 
-        try:
-            first_octet = int(parts[0])
-            second_octet = int(parts[1])
-
-            # 私有IP範圍：
-            # 10.0.0.0 - 10.255.255.255
-            # 172.16.0.0 - 172.31.255.255
-            # 192.168.0.0 - 192.168.255.255
-            if (
-                first_octet == 10
-                or (first_octet == 172 and 16 <= second_octet <= 31)
-                or (first_octet == 192 and second_octet == 168)
-            ):
-                return True
+        if self._owns_session:
+            self._session.close()
 
-        except ValueError:
-            return False
+    def __enter__(self):
+        return self
 
-        return False
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def get_public_ip(self) -> str:
         """
         獲取外網公共IP地址
 
+        各公共IP服務以競速方式同時查詢，採用最先回傳的有效結果；
+        重試次數套用於整輪競速，而非每個服務各自重試
+
         Returns:
             str: 公共IP地址
 
@@ -198,47 +382,130 @@ class IPDetector:
         """
         last_error = None
 
-        for service_url in self.config["public_ip_services"]:
-            for attempt in range(self.config["retry_attempts"]):
-                try:
-                    self.logger.debug(
-                        f"嘗試從 {service_url} 獲取公共IP (第{attempt + 1}次)"
-                    )
-
-                    response = requests.get(
-                        service_url,
-                        timeout=self.config["timeout"],
-                        verify=False,  # 某些服務可能有SSL問題
-                        headers={"User-Agent": "Discord-IP-Bot/1.0"},
-                    )
-
-                    if response.status_code == 200:
-                        public_ip = response.text.strip()
-
-                        # 驗證返回的IP格式
-                        if self._is_valid_ip_format(public_ip):
-                            self.logger.debug(f"成功獲取公共IP: {public_ip}")
-                            return public_ip
-                        else:
-                            raise NetworkError(f"無效的IP格式: {public_ip}")
-                    else:
-                        raise NetworkError(f"HTTP狀態碼: {response.status_code}")
-
-                except requests.RequestException as e:
-                    last_error = e
-                    self.logger.warning(
-                        f"從 {service_url} 獲取IP失敗 (第{attempt + 1}次): {e}"
-                    )
+        for attempt in range(self.config["retry_attempts"]):
+            try:
+                self.logger.debug("查詢公共IP (第%d次)", attempt + 1)
+                public_ip = self._race_public_ip_services()
+                self.logger.debug("成功獲取公共IP: %s", public_ip)
+                return public_ip
 
-                    if attempt < self.config["retry_attempts"] - 1:
-                        import time
+            except NetworkError as e:
+                last_error = e
+                self.logger.warning("獲取公共IP失敗 (第%d次): %s", attempt + 1, e)
 
-                        time.sleep(self.config["retry_delay"])
+                if attempt < self.config["retry_attempts"] - 1:
+                    time.sleep(self.config["retry_delay"])
 
         error_msg = f"所有公共IP服務都無法使用，最後錯誤: {last_error}"
         self.logger.error(error_msg)
         raise NetworkError(error_msg)
 
+    def _race_public_ip_services(self) -> str:
+        """
+        競速查詢所有公共IP服務，返回最先取得的有效IP
+
+        服務依序啟動：前一個服務失敗，或在 race_stagger 秒內未回應時，
+        才啟動下一個。正常情況下只會送出一個請求，
+        服務緩慢時總等待時間約為最快服務的回應時間
+
+        Returns:
+            str: 公共IP地址
+
+        Raises:
+            NetworkError: 所有服務都失敗
+        """
+        service_urls = list(self.config["public_ip_services"])
+        if not service_urls:
+            raise NetworkError("未設定任何公共IP服務")
+
+        errors = []
+        pending = set()
+        next_index = 0
+        executor = ThreadPoolExecutor(max_workers=len(service_urls))
+
+        try:
+            while True:
+                if next_index < len(service_urls):
+                    pending.add(
+                        executor.submit(self._fetch_public_ip, service_urls[next_index])
+                    )
+                    next_index += 1
+
+                if not pending:
+                    break
+
+                timeout = (
+                    self.config["race_stagger"]
+                    if next_index < len(service_urls)
+                    else None
+                )
+                done, pending = wait(
+                    pending, timeout=timeout, return_when=FIRST_COMPLETED
+                )
+
+                for future in done:
+                    try:
+                        return future.result()
+                    except NetworkError as e:
+                        errors.append(str(e))
+                        self.logger.warning("%s", e)
+
+        finally:
+            # 不等待仍在進行中的請求（會在各自的逾時內結束）
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        raise NetworkError("; ".join(errors))
+
+    def _fetch_public_ip(self, service_url: str) -> str:
+        """
+        從單一服務獲取公共IP
+
+        Args:
+            service_url: 公共IP服務URL
+
+        Returns:
+            str: 公共IP地址
+
+        Raises:
+            NetworkError: 請求失敗或回應無效
+        """
+        try:
+            response = self._session.get(
+                service_url,
+                timeout=self.config["timeout"],
+                verify=False,  # 某些服務可能有SSL問題
+                headers={"User-Agent": "Discord-IP-Bot/1.0"},
+                stream=True,  # 只讀取有限位元組，不解碼整個回應
+            )
+        except requests.RequestException as e:
+            raise NetworkError(f"從 {service_url} 獲取IP失敗: {e}")
+
+        try:
+            if response.status_code != 200:
+                raise NetworkError(
+                    f"從 {service_url} 獲取IP失敗: HTTP狀態碼: {response.status_code}"
+                )
+
+            # 多讀一個位元組以判斷回應是否超過上限
+            raw = response.raw.read(PUBLIC_IP_MAX_BYTES + 1, decode_content=True)
+        except (requests.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+            raise NetworkError(f"從 {service_url} 讀取回應失敗: {e}")
+        finally:
+            response.close()
+
+        if len(raw) > PUBLIC_IP_MAX_BYTES:
+            raise NetworkError(f"從 {service_url} 獲取IP失敗: 回應內容過長")
+
+        public_ip = raw.decode("ascii", "ignore").strip()
+
+        # 驗證返回的IP格式
+        if not self._is_valid_ip_format(public_ip):
+            raise NetworkError(
+                f"從 {service_url} 獲取IP失敗: 無效的IP格式: {public_ip}"
+            )
+
+        return public_ip
+
     def _is_valid_ip_format(self, ip: str) -> bool:
         """
         檢查IP地址格式是否有效
@@ -249,11 +516,11 @@ class IPDetector:
         Returns:
             bool: 格式是否有效
         """
+        # inet_pton 只接受完整的四段十進位格式，不需再自行拆分檢查
         try:
-            socket.inet_aton(ip)
-            parts = ip.split(".")
-            return len(parts) == 4 and all(0 <= int(part) <= 255 for part in parts)
-        except socket.error:
+            _inet_pton(socket.AF_INET, ip)
+            return True
+        except (OSError, TypeError):
             return False
 
     def get_all_ips(self) -> Dict[str, str]:
@@ -290,9 +557,9 @@ class IPDetector:
 
         if errors:
             result["errors"] = errors
-            self.logger.warning(f"IP獲取過程中發生錯誤: {errors}")
+            self.logger.warning("IP獲取過程中發生錯誤: %s", errors)
 
-        self.logger.info(f"IP檢測完成: {result}")
+        self.logger.info("IP檢測完成: %s", result)
         return result
 
     def check_ip_with_history(self, mode: str = "scheduled") -> Dict[str, Any]:
@@ -314,7 +581,8 @@ class IPDetector:
                 "error": str | None
             }
         """
-        start_time = time.time()
+        # 執行時間以單調時鐘量測，不受系統校時影響
+        start_time = time.perf_counter()
 
         try:
             # 獲取當前IP資訊
@@ -339,7 +607,7 @@ class IPDetector:
                     "should_notify": should_notify,
                     "mode": mode,
                     "timestamp": self._get_current_timestamp(),
-                    "execution_duration": round(time.time() - start_time, 2),
+                    "execution_duration": round(time.perf_counter() - start_time, 2),
                     "error": None,
                     "using_new_history": True,
                 }
@@ -369,14 +637,14 @@ class IPDetector:
                     "should_notify": should_notify,
                     "mode": mode,
                     "timestamp": current_ips.get("timestamp"),
-                    "execution_duration": round(time.time() - start_time, 2),
+                    "execution_duration": round(time.perf_counter() - start_time, 2),
                     "error": None,
                     "using_new_history": False,
                     "comparison": comparison,
                 }
 
-                # 儲存歷史記錄（舊版方法）
-                if mode != "test":
+                # 儲存歷史記錄（舊版方法，僅在IP變化或首次執行時寫入）
+                if mode != "test" and has_changed:
                     self.save_ip_history(current_ips)
 
                 return result
@@ -392,7 +660,7 @@ class IPDetector:
                 "should_notify": False,
                 "mode": mode,
                 "timestamp": self._get_current_timestamp(),
-                "execution_duration": round(time.time() - start_time, 2),
+                "execution_duration": round(time.perf_counter() - start_time, 2),
                 "error": error_msg,
                 "using_new_history": self.history_manager is not None,
             }
@@ -419,7 +687,7 @@ class IPDetector:
             return has_changed
         else:
             # 未知模式，預設不發送
-            self.logger.warning(f"未知的執行模式: {mode}")
+            self.logger.warning("未知的執行模式: %s", mode)
             return False
 
     def _get_current_timestamp(self) -> str:
@@ -435,42 +703,94 @@ class IPDetector:
         """
         儲存IP歷史記錄到檔案
 
+        以 JSON Lines 格式附加一行，不重新讀寫整個檔案；
+        檔案超過 HISTORY_COMPACT_BYTES 時才壓縮為最近 HISTORY_MAX_RECORDS 筆
+
         Args:
             ip_data: IP資料字典
         """
         try:
             history_file = Path(self.config["history_file"])
 
-            # 讀取現有歷史記錄
-            history = []
-            if history_file.exists():
-                try:
-                    with open(history_file, "r", encoding="utf-8") as f:
-                        history = json.load(f)
-                except (json.JSONDecodeError, FileNotFoundError):
-                    self.logger.warning("無法讀取現有歷史記錄，建立新的記錄")
-                    history = []
+            if not self._legacy_history_checked:
+                history_file.parent.mkdir(parents=True, exist_ok=True)
+                self._migrate_legacy_history(history_file)
+                self._legacy_history_checked = True
 
-            # 添加新記錄
-            history.append(ip_data)
+            with open(history_file, "ab") as f:
+                f.write(json_dumpb(ip_data) + b"\n")
 
-            # 限制歷史記錄數量（保持最近100筆）
-            if len(history) > 100:
-                history = history[-100:]
+            self._last_record = ip_data
 
-            # 寫入檔案
-            with open(history_file, "w", encoding="utf-8") as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+            if history_file.stat().st_size > HISTORY_COMPACT_BYTES:
+                self._compact_history(history_file)
 
-            self.logger.debug(f"IP歷史記錄已儲存: {history_file}")
+            self.logger.debug("IP歷史記錄已儲存: %s", history_file)
 
         except Exception as e:
-            self.logger.error(f"儲存IP歷史記錄失敗: {e}")
+            self.logger.error("儲存IP歷史記錄失敗: %s", e)
+
+    def _migrate_legacy_history(self, history_file: Path) -> None:
+        """將舊版 JSON 陣列格式的歷史檔案轉換為 JSON Lines 格式"""
+        try:
+            with open(history_file, "rb") as f:
+                content = f.read()
+            if not content.lstrip().startswith(b"["):
+                return
+            history = json_loads(content)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            self.logger.warning("無法讀取現有歷史記錄，建立新的記錄")
+            history = []
+
+        self._write_history_lines(
+            history_file,
+            [json_dumpb(record) + b"\n" for record in history[-HISTORY_MAX_RECORDS:]],
+        )
+        self.logger.info("已將IP歷史記錄轉換為 JSON Lines 格式: %s", history_file)
+
+    def _compact_history(self, history_file: Path) -> None:
+        """只保留最近 HISTORY_MAX_RECORDS 筆歷史記錄"""
+        with open(history_file, "rb") as f:
+            lines = [line for line in f if line.strip()]
+
+        self._write_history_lines(history_file, lines[-HISTORY_MAX_RECORDS:])
+
+    @staticmethod
+    def _write_history_lines(history_file: Path, lines: List[bytes]) -> None:
+        """以暫存檔加原子替換的方式重寫歷史檔案（UTF-8 位元組行）"""
+        temp_file = history_file.with_name(history_file.name + ".tmp")
+        with open(temp_file, "wb") as f:
+            f.write(b"".join(lines))
+        os.replace(temp_file, history_file)
+
+    @staticmethod
+    def _read_last_line(history_file: Path) -> Optional[bytes]:
+        """由檔案尾端反向讀取最後一個非空行"""
+        with open(history_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            buffer = b""
+
+            while position > 0:
+                read_size = min(HISTORY_TAIL_BLOCK_SIZE, position)
+                position -= read_size
+                f.seek(position)
+                buffer = f.read(read_size) + buffer
+
+                stripped = buffer.rstrip()
+                if b"\n" in stripped:
+                    return stripped.rsplit(b"\n", 1)[1]
+
+        return buffer.rstrip() or None
 
     def get_last_ip_record(self) -> Optional[Dict[str, str]]:
         """
         獲取最後一次記錄的IP資料
 
+        只讀取檔案尾端的最後一行，讀取量與歷史筆數無關
+
         Returns:
             Optional[Dict[str, str]]: 最後一次的IP記錄，如果沒有則返回None
         """
@@ -480,14 +800,21 @@ class IPDetector:
             if not history_file.exists():
                 return None
 
-            with open(history_file, "r", encoding="utf-8") as f:
-                history = json.load(f)
+            last_line = self._read_last_line(history_file)
+            if last_line is None:
+                return None
 
-            if history:
-                return history[-1]
+            try:
+                return json_loads(last_line)
+            except ValueError:
+                # 舊版 JSON 陣列格式
+                with open(history_file, "rb") as f:
+                    history = json_loads(f.read())
+                if history:
+                    return history[-1]
 
         except Exception as e:
-            self.logger.error(f"讀取IP歷史記錄失敗: {e}")
+            self.logger.error("讀取IP歷史記錄失敗: %s", e)
 
         return None
 
@@ -503,7 +830,9 @@ class IPDetector:
         Returns:
             Dict: 比較結果，包含changed、changes、last_record等資訊
         """
-        last_record = self.get_last_ip_record()
+        if self._last_record is None:
+            self._last_record = self.get_last_ip_record()
+        last_record = self._last_record
 
         if not last_record:
             self.logger.info("沒有歷史記錄，這是首次執行")
@@ -543,7 +872,7 @@ class IPDetector:
         }
 
         if has_changes:
-            self.logger.info(f"IP已變化: {changes}")
+            self.logger.info("IP已變化: %s", changes)
         else:
             self.logger.info("IP無變化")
 
@@ -563,8 +892,9 @@ class IPDetector:
             # 與上次記錄比較
             comparison = self.compare_with_last(current_ips)
 
-            # 儲存當前記錄
-            self.save_ip_history(current_ips)
+            # 僅在IP變化（含首次執行）時儲存，避免寫入重複記錄
+            if comparison["changed"]:
+                self.save_ip_history(current_ips)
 
             # 組合完整結果
             result = {
@@ -591,8 +921,6 @@ def main():
     """
     測試函數 - 獨立測試IP檢測器
     """
-    import logging
-
     # 設定日誌
     logging.basicConfig(
         level=logging.INFO,
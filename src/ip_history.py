@@ -11,15 +11,57 @@ IP歷史記錄管理模組
 建立時間: 2025-01-04
 """
 
+import atexit
+import bisect
+import codecs
 import json
 import os
-import shutil
+import threading
 import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Tuple, Union, Any
 import logging
 
+try:
+    from .config import json_dumpb, json_dumps, json_loads
+except ImportError:
+    # 用於直接執行此模組時
+    from config import json_dumpb, json_dumps, json_loads
+
+# 歷史事件記錄檔（JSON Lines，每行一筆）的後綴，接在狀態檔完整名稱之後
+# （例如 ip_history.json.records.jsonl），狀態檔本身為 .jsonl 時也不會同名
+RECORDS_FILE_SUFFIX = ".records.jsonl"
+
+# 歷史管理器的預設配置
+DEFAULT_HISTORY_CONFIG = {
+    "keep_days": 30,
+    "max_records": 1000,
+    "auto_cleanup": True,
+    "batch_size": 4,  # 累積多少筆事件後一次寫入並同步到磁碟
+    "flush_interval_s": 5.0,  # 未滿一批時最長延遲寫入秒數（0 表示立即寫入）
+    "backup_on_corruption": True,
+    "compression": False,
+    "encoding": "utf-8",  # 匯出檔案編碼（歷史檔案固定為 UTF-8）
+}
+
+# 記錄檔中已不在記憶體的舊記錄超過此數量（且多於現有記錄數）時才重寫壓縮
+RECORDS_COMPACT_MIN_STALE = 100
+
+# 狀態檔（metadata / current / statistics）包含的區塊
+STATE_SECTIONS = ("metadata", "current", "statistics")
+
+# 保留期限截止時間的快取精度（秒），以天為單位的期限精確到分鐘已足夠
+CUTOFF_CACHE_RESOLUTION = 60
+
+# IP檢測失敗時的佔位值
+_UNAVAILABLE = "無法獲取"
+
+
+def _timestamp_key(record: Dict) -> str:
+    """歷史記錄的排序鍵（ISO 時間戳，字串順序即時間順序）"""
+    return record.get("timestamp", "")
+
 
 class IPHistoryError(Exception):
     """IP歷史記錄相關錯誤"""
@@ -44,7 +86,7 @@ class IPHistoryManager:
     IP歷史記錄管理器
 
     負責管理IP地址的歷史記錄，包括：
-    - 持久化存儲
+    - 持久化存儲（狀態檔 + 只附加的 JSON Lines 事件記錄檔）
     - IP變化檢測
     - 歷史統計分析
     - 自動清理與備份
@@ -67,17 +109,33 @@ class IPHistoryManager:
             IPHistoryFileError: 檔案路徑無效或權限問題
         """
         self.history_file = Path(history_file)
+        self.records_file = self.history_file.with_name(
+            self.history_file.name + RECORDS_FILE_SUFFIX
+        )
         self.logger = logging.getLogger(__name__)
 
+        # 記錄檔的附加寫入控制代碼（首次附加時開啟）與目前行數
+        self._records_handle = None
+        self._records_in_file = 0
+        self._lock = threading.RLock()
+
+        # 狀態檔與記錄檔的目前大小（讀取與寫入時更新，查詢時不必 stat）
+        self._state_bytes = 0
+        self._records_bytes = 0
+
+        # 尚未寫入記錄檔的事件（批次寫入）與延遲寫入的計時器
+        self._pending: List[Dict] = []
+        self._flush_timer: Optional[threading.Timer] = None
+        self._atexit_registered = False
+
+        # 執行模式比例的快取（統計計數變更時失效）
+        self._frequency_percentage: Optional[Dict[str, float]] = None
+
+        # 各保留天數的截止時間快取：天數 → (時間區段, ISO 字串)
+        self._cutoff_cache: Dict[int, Tuple[int, str]] = {}
+
         # 預設配置
-        self.config = {
-            "keep_days": 30,
-            "max_records": 1000,
-            "auto_cleanup": True,
-            "backup_on_corruption": True,
-            "compression": False,
-            "encoding": "utf-8",
-        }
+        self.config = dict(DEFAULT_HISTORY_CONFIG)
 
         # 更新配置
         if config:
@@ -86,10 +144,27 @@ class IPHistoryManager:
         # 確保目錄存在
         self._ensure_directory()
 
+        # 記憶體中的狀態是否有尚未寫入檔案的變更
+        self._dirty = False
+        self._legacy_format = False
+
         # 載入或初始化歷史記錄
         self._history_data = self._load_or_initialize_history()
 
-        self.logger.info(f"IP歷史管理器初始化完成，檔案路徑: {self.history_file}")
+        # 上次記錄的有效公共IP（避免每次檢查都查詢巢狀字典）
+        last_ip = self._history_data["current"].get("public_ip")
+        self._last_public_ip: Optional[str] = (
+            last_ip if last_ip and last_ip != _UNAVAILABLE else None
+        )
+
+        # 舊版單一 JSON 檔案：轉換為狀態檔 + 記錄檔
+        if self._legacy_format:
+            self.save_history(self._history_data)
+            self.logger.info(
+                "已將歷史記錄轉換為 JSON Lines 記錄檔: %s", self.records_file
+            )
+
+        self.logger.info("IP歷史管理器初始化完成，檔案路徑: %s", self.history_file)
 
     def _ensure_directory(self) -> None:
         """確保歷史記錄檔案的目錄存在"""
@@ -108,7 +183,7 @@ class IPHistoryManager:
             try:
                 return self.load_history()
             except Exception as e:
-                self.logger.error(f"載入歷史記錄失敗: {e}")
+                self.logger.error("載入歷史記錄失敗: %s", e)
                 if self.config["backup_on_corruption"]:
                     self._backup_corrupted_file()
                 return self._create_initial_history()
@@ -117,10 +192,11 @@ class IPHistoryManager:
 
     def _create_initial_history(self) -> Dict:
         """創建初始歷史記錄結構"""
+        now_iso = self._get_current_timestamp()
         initial_data = {
             "metadata": {
-                "created_at": self._get_current_timestamp(),
-                "last_updated": self._get_current_timestamp(),
+                "created_at": now_iso,
+                "last_updated": now_iso,
                 "version": "1.0",
                 "total_checks": 0,
             },
@@ -140,25 +216,33 @@ class IPHistoryManager:
         }
 
         # 保存初始結構到檔案
-        self.save_history(initial_data)
+        self.save_history(initial_data, now_iso)
         self.logger.info("創建新的IP歷史記錄檔案")
 
         return initial_data
 
     def _backup_corrupted_file(self) -> None:
         """備份損壞的歷史檔案"""
+        # 只在檔案損壞時才需要，延遲到此處才載入
+        import shutil
+
         try:
             backup_file = self.history_file.with_suffix(
                 f".corrupted.{int(time.time())}.bak"
             )
             shutil.copy2(self.history_file, backup_file)
-            self.logger.warning(f"已備份損壞檔案到: {backup_file}")
+            if self.records_file.exists():
+                shutil.copy2(
+                    self.records_file,
+                    backup_file.with_name(backup_file.name + RECORDS_FILE_SUFFIX),
+                )
+            self.logger.warning("已備份損壞檔案到: %s", backup_file)
         except Exception as e:
-            self.logger.error(f"備份損壞檔案失敗: {e}")
+            self.logger.error("備份損壞檔案失敗: %s", e)
 
     def load_history(self) -> Dict:
         """
-        載入IP歷史記錄
+        載入IP歷史記錄（狀態檔與事件記錄檔）
 
         Returns:
             Dict: 歷史記錄資料
@@ -168,19 +252,33 @@ class IPHistoryManager:
             IPHistoryValidationError: 資料格式無效
         """
         try:
-            with open(self.history_file, "r", encoding=self.config["encoding"]) as f:
-                data = json.load(f)
+            with open(self.history_file, "rb") as f:
+                content = f.read()
+            self._state_bytes = len(content)
+            data = json_loads(content)
+
+            if isinstance(data, dict) and "history" in data:
+                # 舊版格式：事件記錄直接存放在同一個 JSON 檔案
+                self._legacy_format = True
+            elif isinstance(data, dict):
+                data["history"] = self._read_records()
 
             # 驗證資料結構
             self._validate_history_data(data)
 
+            # 記錄依時間先後排列，清理與查詢以二分搜尋找出起點
+            # （舊版清理曾將記錄反轉為新到舊，已排序時 Timsort 只需線性時間）
+            data["history"].sort(key=_timestamp_key)
+
             self.logger.debug(
-                f"成功載入歷史記錄，共 {len(data.get('history', []))} 筆記錄"
+                "成功載入歷史記錄，共 %s 筆記錄", len(data.get("history", []))
             )
             return data
 
         except json.JSONDecodeError as e:
             raise IPHistoryValidationError(f"JSON格式錯誤: {e}")
+        except IPHistoryValidationError:
+            raise
         except FileNotFoundError:
             raise IPHistoryFileError(f"歷史記錄檔案不存在: {self.history_file}")
         except PermissionError:
@@ -188,6 +286,37 @@ class IPHistoryManager:
         except Exception as e:
             raise IPHistoryFileError(f"載入歷史記錄失敗: {e}")
 
+    def _read_records(self) -> List[Dict]:
+        """
+        逐行讀取事件記錄檔，並套用與清理相同的保留規則
+
+        無法解析的行（例如寫入中斷留下的半行）會被略過
+
+        Returns:
+            List[Dict]: 事件記錄列表
+        """
+        records = []
+        line_count = 0
+        records_bytes = 0
+
+        try:
+            with open(self.records_file, "rb") as f:
+                for line in f:
+                    records_bytes += len(line)
+                    if not line.strip():
+                        continue
+                    line_count += 1
+                    try:
+                        records.append(json_loads(line))
+                    except ValueError:
+                        self.logger.warning("略過無法解析的歷史記錄行: %r", line[:80])
+        except FileNotFoundError:
+            pass
+
+        self._records_in_file = line_count
+        self._records_bytes = records_bytes
+        return self._filter_records(records, self.config["keep_days"])
+
     def _validate_history_data(self, data: Dict) -> None:
         """驗證歷史記錄資料結構"""
         required_keys = ["metadata", "current", "statistics", "history"]
@@ -204,12 +333,15 @@ class IPHistoryManager:
         if not isinstance(data["history"], list):
             raise IPHistoryValidationError("history 必須是陣列")
 
-    def save_history(self, history_data: Dict) -> bool:
+    def save_history(self, history_data: Dict, now_iso: Optional[str] = None) -> bool:
         """
-        保存IP歷史記錄到檔案
+        保存完整的IP歷史記錄到檔案（重寫狀態檔與事件記錄檔）
+
+        一般的檢測事件只會附加到記錄檔，此方法用於初始化、格式轉換與壓縮
 
         Args:
             history_data: 要保存的歷史記錄資料
+            now_iso: 最後修改時間（ISO格式），不提供則使用當前時間
 
         Returns:
             bool: 保存是否成功
@@ -217,29 +349,189 @@ class IPHistoryManager:
         Raises:
             IPHistoryFileError: 檔案寫入失敗
         """
-        try:
-            # 更新最後修改時間
-            history_data["metadata"]["last_updated"] = self._get_current_timestamp()
+        with self._lock:
+            self._close_records_handle()
+            # 記錄檔將以完整記錄重寫，尚未寫入的事件不需再附加
+            self._pending.clear()
+            records = history_data.get("history", [])
+            payload = b"".join(json_dumpb(record) + b"\n" for record in records)
+            self._write_atomic(self.records_file, payload)
+            self._records_in_file = len(records)
+            self._records_bytes = len(payload)
+            return self._save_state(history_data, now_iso)
+
+    def _save_state(self, history_data: Dict, now_iso: Optional[str] = None) -> bool:
+        """
+        保存狀態檔（metadata / current / statistics），不含事件記錄
+
+        Raises:
+            IPHistoryFileError: 檔案寫入失敗
+        """
+        # 更新最後修改時間
+        history_data["metadata"]["last_updated"] = (
+            now_iso or self._get_current_timestamp()
+        )
+
+        state = {section: history_data[section] for section in STATE_SECTIONS}
+        payload = json_dumpb(state, indent=True)
+        self._write_atomic(self.history_file, payload)
+        self._state_bytes = len(payload)
+
+        self.logger.debug("成功保存歷史記錄到 %s", self.history_file)
+        return True
+
+    def _write_atomic(self, path: Path, payload: bytes) -> None:
+        """
+        以暫存檔寫入後原子性替換
 
+        Raises:
+            IPHistoryFileError: 檔案寫入失敗
+        """
+        try:
             # 創建臨時檔案以確保原子性操作
-            temp_file = self.history_file.with_suffix(".tmp")
+            temp_file = path.with_suffix(path.suffix + ".tmp")
 
-            with open(temp_file, "w", encoding=self.config["encoding"]) as f:
-                json.dump(history_data, f, indent=2, ensure_ascii=False)
+            # 先序列化為單一位元組緩衝區，再一次寫入並同步到磁碟
+            with open(temp_file, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
 
             # 原子性替換
-            temp_file.replace(self.history_file)
-
-            self.logger.debug(f"成功保存歷史記錄到 {self.history_file}")
-            return True
+            os.replace(temp_file, path)
 
         except PermissionError:
-            raise IPHistoryFileError(f"歷史記錄檔案寫入權限不足: {self.history_file}")
+            raise IPHistoryFileError(f"歷史記錄檔案寫入權限不足: {path}")
         except OSError as e:
             raise IPHistoryFileError(f"保存歷史記錄失敗: {e}")
         except Exception as e:
             raise IPHistoryFileError(f"未知錯誤，保存歷史記錄失敗: {e}")
 
+    def _flush_pending(self) -> None:
+        """
+        將累積的事件一次附加到記錄檔（整批只寫入與同步一次）
+
+        Raises:
+            IPHistoryFileError: 檔案寫入失敗
+        """
+        if not self._pending:
+            return
+
+        payload = b"".join(json_dumpb(record) + b"\n" for record in self._pending)
+        try:
+            if self._records_handle is None:
+                self._records_handle = open(self.records_file, "ab")
+
+            self._records_handle.write(payload)
+            self._records_handle.flush()
+            os.fsync(self._records_handle.fileno())
+
+        except OSError as e:
+            self._close_records_handle()
+            raise IPHistoryFileError(f"附加歷史記錄失敗: {e}")
+
+        self._records_in_file += len(self._pending)
+        self._records_bytes += len(payload)
+        self._pending.clear()
+
+    def _schedule_flush(self) -> None:
+        """未滿一批時啟動延遲寫入計時器（已有計時器時沿用）"""
+        if self._flush_timer is not None:
+            return
+
+        # 程式結束前仍會寫入尚未保存的事件
+        if not self._atexit_registered:
+            atexit.register(self._close_at_exit)
+            self._atexit_registered = True
+
+        self._flush_timer = threading.Timer(
+            self.config["flush_interval_s"], self._flush_from_timer
+        )
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _flush_from_timer(self) -> None:
+        """計時器到期時寫入累積的事件"""
+        with self._lock:
+            # 等待鎖期間可能已有新的計時器，只清除仍指向自己的欄位
+            if self._flush_timer is threading.current_thread():
+                self._flush_timer = None
+            try:
+                self.flush()
+            except IPHistoryError as e:
+                self.logger.error("延遲寫入歷史記錄失敗: %s", e)
+
+    def _close_at_exit(self) -> None:
+        """程式結束時寫入尚未保存的事件（錯誤只記錄，不中斷結束流程）"""
+        # 歷史檔案所在目錄已被移除（例如臨時目錄）時沒有可寫入的位置
+        if not self.history_file.parent.exists():
+            self.logger.debug(
+                "歷史記錄目錄已不存在，略過結束時寫入: %s", self.history_file.parent
+            )
+            return
+
+        try:
+            self.close()
+        except IPHistoryError as e:
+            self.logger.error("結束時寫入歷史記錄失敗: %s", e)
+
+    def _cancel_flush_timer(self) -> None:
+        """取消尚未到期的延遲寫入計時器"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def _close_records_handle(self) -> None:
+        """關閉記錄檔的附加寫入控制代碼（重寫記錄檔前必須關閉，Windows 才能替換）"""
+        if self._records_handle is not None:
+            try:
+                self._records_handle.close()
+            finally:
+                self._records_handle = None
+
+    def _compact_records_if_needed(self, now_iso: Optional[str] = None) -> None:
+        """記錄檔累積過多已清理的舊記錄時，重寫為記憶體中的現有記錄"""
+        current_count = len(self._history_data["history"])
+        stale_count = self._records_in_file + len(self._pending) - current_count
+        if stale_count > max(current_count, RECORDS_COMPACT_MIN_STALE):
+            self.save_history(self._history_data, now_iso)
+            self._dirty = False
+            self.logger.info("已壓縮歷史記錄檔，移除 %s 筆舊記錄", stale_count)
+
+    def close(self) -> None:
+        """保存尚未寫入的變更並關閉記錄檔"""
+        with self._lock:
+            self.flush()
+            self._close_records_handle()
+
+            if self._atexit_registered:
+                atexit.unregister(self._close_at_exit)
+                self._atexit_registered = False
+
+    def flush(self, now_iso: Optional[str] = None) -> bool:
+        """
+        將尚未寫入的變更保存到檔案（沒有變更時不做任何事）
+
+        Args:
+            now_iso: 最後修改時間（ISO格式），不提供則使用當前時間
+
+        Returns:
+            bool: 保存是否成功
+
+        Raises:
+            IPHistoryFileError: 檔案寫入失敗
+        """
+        with self._lock:
+            self._cancel_flush_timer()
+            self._flush_pending()
+
+            if not self._dirty:
+                return True
+
+            self._save_state(self._history_data, now_iso)
+            self._dirty = False
+            return True
+
     def get_last_public_ip(self) -> Optional[str]:
         """
         獲取上次記錄的公共IP地址
@@ -247,10 +539,7 @@ class IPHistoryManager:
         Returns:
             Optional[str]: 上次記錄的公共IP，如果沒有記錄則返回None
         """
-        current_ip = self._history_data["current"]["public_ip"]
-        if current_ip and current_ip != "無法獲取":
-            return current_ip
-        return None
+        return self._last_public_ip
 
     def has_ip_changed(self, current_public_ip: str) -> bool:
         """
@@ -262,10 +551,10 @@ class IPHistoryManager:
         Returns:
             bool: IP是否有變化
         """
-        if not current_public_ip or current_public_ip == "無法獲取":
+        if not current_public_ip or current_public_ip == _UNAVAILABLE:
             return False
 
-        last_ip = self.get_last_public_ip()
+        last_ip = self._last_public_ip
 
         # 如果沒有歷史記錄，視為有變化
         if last_ip is None:
@@ -276,9 +565,9 @@ class IPHistoryManager:
         has_changed = current_public_ip != last_ip
 
         if has_changed:
-            self.logger.info(f"IP地址變化: {last_ip} → {current_public_ip}")
+            self.logger.info("IP地址變化: %s → %s", last_ip, current_public_ip)
         else:
-            self.logger.debug(f"IP地址無變化: {current_public_ip}")
+            self.logger.debug("IP地址無變化: %s", current_public_ip)
 
         return has_changed
 
@@ -301,68 +590,91 @@ class IPHistoryManager:
         Returns:
             bool: 記錄是否成功
         """
-        try:
-            current_time = self._get_current_timestamp()
-            public_ip = ip_data.get("public_ip")
-            local_ip = ip_data.get("local_ip")
-
-            # 檢查IP是否有變化
-            ip_changed = (
-                self.has_ip_changed(public_ip)
-                if public_ip and public_ip != "無法獲取"
-                else False
-            )
-
-            # 創建歷史記錄項目
-            history_item = {
-                "timestamp": current_time,
-                "public_ip": public_ip,
-                "local_ip": local_ip,
-                "mode": mode,
-                "ip_changed": ip_changed,
-                "notification_sent": notification_sent,
-                "execution_duration": round(execution_duration, 2),
-            }
-
-            # 如果IP有變化，記錄前一個IP
-            if ip_changed:
-                previous_ip = self.get_last_public_ip()
-                if previous_ip:
+        with self._lock:
+            try:
+                # 同一事件的所有時間戳與清理基準共用同一次 datetime.now()
+                now_dt = datetime.now(timezone.utc)
+                current_time = now_dt.isoformat()
+                public_ip = ip_data.get("public_ip")
+                local_ip = ip_data.get("local_ip")
+
+                current = self._history_data["current"]
+                previous_ip = self._last_public_ip
+
+                if public_ip is not None and public_ip == previous_ip:
+                    # 最常見情況：IP無變化，略過變化檢測與目前IP更新
+                    ip_changed = False
+                    current["last_updated"] = current_time
+                else:
+                    # 檢查IP是否有變化
+                    ip_available = bool(public_ip) and public_ip != _UNAVAILABLE
+                    ip_changed = (
+                        self.has_ip_changed(public_ip) if ip_available else False
+                    )
+
+                    # 更新當前IP資訊
+                    if ip_available:
+                        current["public_ip"] = public_ip
+                        current["last_updated"] = current_time
+                        self._last_public_ip = public_ip
+
+                # 創建歷史記錄項目
+                history_item = {
+                    "timestamp": current_time,
+                    "public_ip": public_ip,
+                    "local_ip": local_ip,
+                    "mode": mode,
+                    "ip_changed": ip_changed,
+                    "notification_sent": notification_sent,
+                    "execution_duration": round(execution_duration, 2),
+                }
+
+                # 如果IP有變化，記錄前一個IP
+                if ip_changed and previous_ip:
                     history_item["previous_public_ip"] = previous_ip
 
-            # 更新歷史記錄
-            self._history_data["history"].append(history_item)
-
-            # 更新當前IP資訊
-            if public_ip and public_ip != "無法獲取":
-                self._history_data["current"]["public_ip"] = public_ip
-                self._history_data["current"]["last_updated"] = current_time
-
-            if local_ip and local_ip != "無法獲取":
-                self._history_data["current"]["local_ip"] = local_ip
-
-            # 更新通知發送時間
-            if notification_sent:
-                self._history_data["current"]["last_notification_sent"] = current_time
-
-            # 更新統計資訊
-            self._update_statistics(mode, ip_changed, notification_sent, current_time)
+                # 更新歷史記錄：記憶體列表 + 待寫入記錄檔的批次
+                self._history_data["history"].append(history_item)
+                self._pending.append(history_item)
+
+                if local_ip and local_ip != _UNAVAILABLE:
+                    current["local_ip"] = local_ip
+
+                # 更新通知發送時間
+                if notification_sent:
+                    current["last_notification_sent"] = current_time
+
+                # 更新統計資訊
+                self._update_statistics(
+                    mode, ip_changed, notification_sent, current_time
+                )
+
+                # 自動清理舊記錄（只清理記憶體，記錄檔累積足夠舊記錄後才壓縮）
+                if self.config["auto_cleanup"] and self._needs_cleanup(now_dt):
+                    self._cleanup_old_records(now=now_dt)
+                    self._compact_records_if_needed(current_time)
+
+                # 累積滿一批才寫入檔案，否則交由計時器延遲寫入
+                self._dirty = True
+                if (
+                    len(self._pending) >= self.config["batch_size"]
+                    or self.config["flush_interval_s"] <= 0
+                ):
+                    self.flush(current_time)
+                else:
+                    self._schedule_flush()
 
-            # 自動清理舊記錄
-            if self.config["auto_cleanup"]:
-                self._cleanup_old_records()
+                self.logger.info(
+                    "記錄IP檢測事件: mode=%s, IP變化=%s, 通知發送=%s",
+                    mode,
+                    ip_changed,
+                    notification_sent,
+                )
+                return True
 
-            # 保存到檔案
-            self.save_history(self._history_data)
-
-            self.logger.info(
-                f"記錄IP檢測事件: mode={mode}, IP變化={ip_changed}, 通知發送={notification_sent}"
-            )
-            return True
-
-        except Exception as e:
-            self.logger.error(f"記錄IP檢測事件失敗: {e}")
-            return False
+            except Exception as e:
+                self.logger.error("記錄IP檢測事件失敗: %s", e)
+                return False
 
     def _update_statistics(
         self, mode: str, ip_changed: bool, notification_sent: bool, timestamp: str
@@ -373,6 +685,7 @@ class IPHistoryManager:
 
         # 更新總檢測次數
         metadata["total_checks"] += 1
+        self._frequency_percentage = None
 
         # 更新模式統計
         if mode in stats["check_frequency"]:
@@ -403,47 +716,40 @@ class IPHistoryManager:
         history_records = history_data["history"]
 
         # 最近活動
-        recent_activity = []
-        if history_records:
-            recent_activity = sorted(
-                history_records, key=lambda x: x["timestamp"], reverse=True
-            )[:10]
-
-        # 統計各種執行模式的比例
-        total_checks = metadata["total_checks"]
-        frequency_percentage = {}
-        if total_checks > 0:
-            for mode, count in stats["check_frequency"].items():
-                frequency_percentage[mode] = round((count / total_checks) * 100, 1)
+        recent_activity = history_records[-10:][::-1]
+
+        # 統計各種執行模式的比例（計數未變更時沿用快取）
+        if self._frequency_percentage is None:
+            total_checks = metadata["total_checks"]
+            frequency_percentage = {}
+            if total_checks > 0:
+                for mode, count in stats["check_frequency"].items():
+                    frequency_percentage[mode] = round((count / total_checks) * 100, 1)
+            self._frequency_percentage = frequency_percentage
 
         return {
             "metadata": metadata,
             "current_status": current,
             "statistics": stats,
-            "frequency_percentage": frequency_percentage,
+            "frequency_percentage": dict(self._frequency_percentage),
             "recent_activity": recent_activity,
             "history_file_size": self._get_file_size(),
             "total_history_records": len(history_records),
         }
 
     def _get_file_size(self) -> str:
-        """獲取歷史檔案大小"""
-        try:
-            if self.history_file.exists():
-                size_bytes = self.history_file.stat().st_size
-                if size_bytes < 1024:
-                    return f"{size_bytes} B"
-                elif size_bytes < 1024 * 1024:
-                    return f"{size_bytes / 1024:.1f} KB"
-                else:
-                    return f"{size_bytes / (1024 * 1024):.1f} MB"
-            return "0 B"
-        except Exception:
-            return "未知"
+        """獲取歷史檔案大小（狀態檔與記錄檔合計，使用寫入時記錄的大小）"""
+        size_bytes = self._state_bytes + self._records_bytes
+        if size_bytes < 1024:
+            return f"{size_bytes} B"
+        elif size_bytes < 1024 * 1024:
+            return f"{size_bytes / 1024:.1f} KB"
+        else:
+            return f"{size_bytes / (1024 * 1024):.1f} MB"
 
     def cleanup_old_records(self, keep_days: Optional[int] = None) -> int:
         """
-        清理舊記錄
+        清理舊記錄，並立即壓縮事件記錄檔
 
         Args:
             keep_days: 保留天數，如果不提供則使用配置中的值
@@ -454,44 +760,97 @@ class IPHistoryManager:
         if keep_days is None:
             keep_days = self.config["keep_days"]
 
-        return self._cleanup_old_records(keep_days)
+        with self._lock:
+            cleaned_count = self._cleanup_old_records(keep_days)
+            records_count = self._records_in_file + len(self._pending)
+            if records_count != len(self._history_data["history"]):
+                self.save_history(self._history_data)
+                self._dirty = False
 
-    def _cleanup_old_records(self, keep_days: Optional[int] = None) -> int:
-        """內部清理舊記錄方法"""
-        if keep_days is None:
-            keep_days = self.config["keep_days"]
+        return cleaned_count
+
+    def _needs_cleanup(self, now: datetime) -> bool:
+        """
+        檢查是否有需要清理的記錄
 
+        記錄依時間先後排列，只需比較最舊一筆的時間與記錄總數，
+        不必每次新增都掃描並重建整個列表
+        """
+        history_records = self._history_data["history"]
+        if not history_records:
+            return False
+        if len(history_records) > self.config["max_records"]:
+            return True
+
+        keep_days = self.config["keep_days"]
         if keep_days <= 0:
-            return 0
+            return False
+        cutoff_iso = self._get_cutoff_iso(keep_days, now)
+        return _timestamp_key(history_records[0]) < cutoff_iso
 
-        cutoff_date = datetime.now(timezone.utc) - timedelta(days=keep_days)
-        cutoff_iso = cutoff_date.isoformat()
+    def _get_cutoff_iso(self, days: int, now: Optional[datetime] = None) -> str:
+        """
+        取得 days 天前的截止時間（ISO格式），同一分鐘內重複使用先前的結果
 
-        history_records = self._history_data["history"]
-        original_count = len(history_records)
+        Args:
+            days: 保留天數
+            now: 基準時間，不提供則使用當前時間
 
-        # 過濾舊記錄
-        filtered_records = [
-            record
-            for record in history_records
-            if record.get("timestamp", "") >= cutoff_iso
-        ]
+        Returns:
+            str: 截止時間的 ISO 字串
+        """
+        if now is None:
+            now = datetime.now(timezone.utc)
+
+        bucket = int(now.timestamp() // CUTOFF_CACHE_RESOLUTION)
+        cached = self._cutoff_cache.get(days)
+        if cached is not None and cached[0] == bucket:
+            return cached[1]
+
+        cutoff_iso = (now - timedelta(days=days)).isoformat()
+        self._cutoff_cache[days] = (bucket, cutoff_iso)
+        return cutoff_iso
+
+    def _cleanup_old_records(
+        self, keep_days: Optional[int] = None, now: Optional[datetime] = None
+    ) -> int:
+        """內部清理舊記錄方法（只清理記憶體中的記錄，now 為清理基準時間）"""
+        if keep_days is None:
+            keep_days = self.config["keep_days"]
 
-        # 如果超過最大記錄數，保留最新的記錄
-        max_records = self.config["max_records"]
-        if len(filtered_records) > max_records:
-            filtered_records = sorted(
-                filtered_records, key=lambda x: x.get("timestamp", ""), reverse=True
-            )[:max_records]
+        history_records = self._history_data["history"]
 
-        cleaned_count = original_count - len(filtered_records)
+        # 直接刪除列表前段，不必為保留的記錄另外配置新列表
+        cleaned_count = self._retention_start(history_records, keep_days, now)
 
         if cleaned_count > 0:
-            self._history_data["history"] = filtered_records
-            self.logger.info(f"清理了 {cleaned_count} 筆舊記錄")
+            del history_records[:cleaned_count]
+            self.logger.info("清理了 %s 筆舊記錄", cleaned_count)
 
         return cleaned_count
 
+    def _filter_records(
+        self, records: List[Dict], keep_days: int, now: Optional[datetime] = None
+    ) -> List[Dict]:
+        """依保留天數與最大記錄數過濾記錄（記錄須依時間先後排列）"""
+        start = self._retention_start(records, keep_days, now)
+        return records[start:] if start else records
+
+    def _retention_start(
+        self, records: List[Dict], keep_days: int, now: Optional[datetime] = None
+    ) -> int:
+        """計算依保留天數與最大記錄數應保留的第一筆記錄索引（記錄須依時間先後排列）"""
+        if keep_days <= 0:
+            return 0
+
+        cutoff_iso = self._get_cutoff_iso(keep_days, now)
+
+        # 過濾舊記錄
+        start = bisect.bisect_left(records, cutoff_iso, key=_timestamp_key)
+
+        # 如果超過最大記錄數，保留最新的記錄
+        return max(start, len(records) - self.config["max_records"])
+
     def get_ip_change_timeline(self, days: int = 7) -> List[Dict]:
         """
         獲取IP變化時間線
@@ -500,21 +859,20 @@ class IPHistoryManager:
             days: 查詢天數
 
         Returns:
-            List[Dict]: IP變化事件列表
+            List[Dict]: IP變化事件列表（新到舊）
         """
-        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
-        cutoff_iso = cutoff_date.isoformat()
+        cutoff_iso = self._get_cutoff_iso(days)
+
+        history_records = self._history_data["history"]
+        start = bisect.bisect_left(history_records, cutoff_iso, key=_timestamp_key)
 
         ip_changes = [
             record
-            for record in self._history_data["history"]
-            if (
-                record.get("timestamp", "") >= cutoff_iso
-                and record.get("ip_changed", False)
-            )
+            for record in history_records[start:]
+            if record.get("ip_changed", False)
         ]
 
-        return sorted(ip_changes, key=lambda x: x.get("timestamp", ""), reverse=True)
+        return ip_changes[::-1]
 
     def export_history(self, output_file: Optional[str] = None) -> str:
         """
@@ -533,14 +891,29 @@ class IPHistoryManager:
         output_path = Path(output_file)
 
         try:
-            with open(output_path, "w", encoding=self.config["encoding"]) as f:
-                json.dump(self._history_data, f, indent=2, ensure_ascii=False)
+            encoding = self.config["encoding"]
+            use_bytes = codecs.lookup(encoding).name == "utf-8"
+
+            # 序列化期間持有鎖，避免其他執行緒同時新增或清理記錄
+            with self._lock:
+                if use_bytes:
+                    # UTF-8 直接序列化為位元組，不經過文字層編碼
+                    content = json_dumpb(self._history_data, indent=True)
+                else:
+                    content = json_dumps(self._history_data, indent=True)
+
+            if use_bytes:
+                with open(output_path, "wb") as f:
+                    f.write(content)
+            else:
+                with open(output_path, "w", encoding=encoding) as f:
+                    f.write(content)
 
-            self.logger.info(f"歷史記錄已匯出到: {output_path}")
+            self.logger.info("歷史記錄已匯出到: %s", output_path)
             return str(output_path)
 
         except Exception as e:
-            self.logger.error(f"匯出歷史記錄失敗: {e}")
+            self.logger.error("匯出歷史記錄失敗: %s", e)
             raise IPHistoryFileError(f"匯出失敗: {e}")
 
 
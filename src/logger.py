@@ -5,6 +5,8 @@
 包括檔案輪轉、格式化和多級別日誌
 """
 
+import fnmatch
+import io
 import os
 import logging
 import logging.handlers
@@ -18,6 +20,34 @@ except ImportError:
     # 用於直接執行此模組時
     from config import ConfigManager
 
+# 各日誌類型對應的檔案名稱
+LOG_FILE_NAMES = {
+    "scheduler": "scheduler.log",
+    "error": "error.log",
+    "main": "discord_ip_bot.log",
+}
+
+# 由檔案尾端反向讀取日誌時的區塊大小
+TAIL_BLOCK_SIZE = 8 * 1024
+
+
+class _SharedFormatter(logging.Formatter):
+    """
+    多個處理器共用的格式化器，同一筆記錄只格式化一次
+
+    控制台、主要日誌與錯誤日誌共用此格式化器，輪轉檢查也會格式化記錄，
+    ERROR 記錄原本要格式化多達五次
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        cached = record.__dict__.get("_shared_format")
+        if cached is not None and cached[0] is self:
+            return cached[1]
+
+        text = super().format(record)
+        record._shared_format = (self, text)
+        return text
+
 
 class LoggerManager:
     """日誌管理器"""
@@ -37,6 +67,7 @@ class LoggerManager:
         self.config = config_manager or ConfigManager()
         self.name = name
         self.logger = None
+        self._log_file_paths = {}
 
         # 確保日誌目錄存在
         self._ensure_log_directory()
@@ -44,6 +75,9 @@ class LoggerManager:
         # 設定日誌系統
         self._setup_logging()
 
+        # 輸出設定管理器在日誌系統建立前暫存的訊息
+        self.config.flush_pending_logs(self)
+
     def _ensure_log_directory(self):
         """確保日誌目錄存在"""
         logs_dir = Path(self.config.get("system", "logs_dir"))
@@ -62,8 +96,8 @@ class LoggerManager:
         # 清除現有處理器（避免重複）
         self.logger.handlers.clear()
 
-        # 設定日誌格式
-        formatter = logging.Formatter(
+        # 設定日誌格式（所有主要處理器共用，同一筆記錄只格式化一次）
+        formatter = _SharedFormatter(
             fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
             datefmt="%Y-%m-%d %H:%M:%S",
         )
@@ -137,11 +171,7 @@ class LoggerManager:
             logger = logging.getLogger(logger_name)
             logger.setLevel(self.logger.level)
 
-            # 如果沒有處理器，使用主要日誌器的處理器
-            if not logger.handlers:
-                for handler in self.logger.handlers:
-                    logger.addHandler(handler)
-
+            # 不另外加入處理器，記錄會傳遞給主要日誌器的處理器輸出
             return logger
 
         return self.logger
@@ -162,16 +192,16 @@ class LoggerManager:
         """
         scheduler_logger = self.get_scheduler_logger()
 
-        # 構建日誌訊息
-        message_parts = [f"[{mode}]", action, f"→ {result}"]
+        # INFO 被過濾時不必構建訊息
+        if not scheduler_logger.isEnabledFor(logging.INFO):
+            return
 
         # 添加額外資訊
         if kwargs:
             extra_info = ", ".join(f"{k}={v}" for k, v in kwargs.items())
-            message_parts.append(f"({extra_info})")
-
-        message = " ".join(message_parts)
-        scheduler_logger.info(message)
+            scheduler_logger.info("[%s] %s → %s (%s)", mode, action, result, extra_info)
+        else:
+            scheduler_logger.info("[%s] %s → %s", mode, action, result)
 
     def log_ip_change(self, old_ip: str, new_ip: str, mode: str = "排程"):
         """記錄IP變化"""
@@ -207,16 +237,19 @@ class LoggerManager:
         """記錄系統資訊"""
         logger = self.get_logger("system")
         for key, value in info.items():
-            logger.info(f"系統資訊 - {key}: {value}")
+            logger.info("系統資訊 - %s: %s", key, value)
 
     def log_config_info(self, config_summary: dict):
         """記錄設定資訊"""
         logger = self.get_logger("config")
+        if not logger.isEnabledFor(logging.INFO):
+            return
+
         logger.info("應用程式設定:")
         for section, settings in config_summary.items():
-            logger.info(f"  [{section}]")
+            logger.info("  [%s]", section)
             for key, value in settings.items():
-                logger.info(f"    {key}: {value}")
+                logger.info("    %s: %s", key, value)
 
     def get_recent_logs(self, lines: int = 50, log_type: str = "scheduler") -> list:
         """
@@ -229,29 +262,61 @@ class LoggerManager:
         Returns:
             日誌行列表
         """
-        system_config = self.config.get_system_config()
+        if lines <= 0:
+            return []
 
-        log_files = {
-            "scheduler": "scheduler.log",
-            "error": "error.log",
-            "main": "discord_ip_bot.log",
-        }
-
-        log_file = Path(system_config["logs_dir"]) / log_files.get(
-            log_type, "scheduler.log"
-        )
+        log_file = self._get_log_file_path(log_type)
 
         if not log_file.exists():
             return []
 
         try:
-            with open(log_file, "r", encoding="utf-8") as f:
-                lines_list = f.readlines()
-                return lines_list[-lines:] if len(lines_list) > lines else lines_list
+            return self._read_tail_lines(log_file, lines)
         except Exception as e:
-            self.logger.error(f"讀取日誌檔案失敗: {e}")
+            self.logger.error("讀取日誌檔案失敗: %s", e)
             return []
 
+    def _get_log_file_path(self, log_type: str) -> Path:
+        """取得日誌類型對應的檔案路徑（結果快取）"""
+        log_file = self._log_file_paths.get(log_type)
+        if log_file is None:
+            logs_dir = Path(self.config.get("system", "logs_dir"))
+            log_file = logs_dir / LOG_FILE_NAMES.get(log_type, "scheduler.log")
+            self._log_file_paths[log_type] = log_file
+        return log_file
+
+    @staticmethod
+    def _read_tail_lines(log_file: Path, lines: int) -> list:
+        """
+        由檔案尾端反向分塊讀取最後幾行，讀取量與行數成正比而非檔案大小
+
+        Args:
+            log_file: 日誌檔案路徑
+            lines: 行數
+
+        Returns:
+            日誌行列表（保留換行字元）
+        """
+        with open(log_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            blocks = []
+            newlines = 0
+
+            # 多讀一個換行，確保最前面可能不完整的一行會被捨棄
+            # 每個區塊只計算一次換行數，最後才合併，避免重複複製已讀取的內容
+            while position > 0 and newlines <= lines:
+                read_size = min(TAIL_BLOCK_SIZE, position)
+                position -= read_size
+                f.seek(position)
+                block = f.read(read_size)
+                blocks.append(block)
+                newlines += block.count(b"\n")
+
+        blocks.reverse()
+        text = b"".join(blocks).decode("utf-8", errors="replace")
+        return io.StringIO(text, newline=None).readlines()[-lines:]
+
     def cleanup_old_logs(self):
         """清理舊日誌檔案"""
         system_config = self.config.get_system_config()
@@ -260,19 +325,22 @@ class LoggerManager:
         if not logs_dir.exists():
             return
 
-        # 清理超過保留數量的日誌檔案
-        for log_pattern in ["*.log.*", "*.log.1", "*.log.2"]:
-            log_files = list(logs_dir.glob(log_pattern))
-            log_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-
-            # 保留最新的 max_log_files 個檔案
-            max_files = system_config["max_log_files"]
-            for old_file in log_files[max_files:]:
-                try:
-                    old_file.unlink()
-                    self.logger.info(f"清理舊日誌檔案: {old_file}")
-                except Exception as e:
-                    self.logger.error(f"清理日誌檔案失敗: {e}")
+        # 清理超過保留數量的輪轉日誌檔案（*.log.*，單次掃描並只讀取一次修改時間）
+        log_files = []
+        with os.scandir(logs_dir) as entries:
+            for entry in entries:
+                if fnmatch.fnmatch(entry.name, "*.log.*") and entry.is_file():
+                    log_files.append((entry.stat().st_mtime, entry.path))
+        log_files.sort(reverse=True)
+
+        # 保留最新的 max_log_files 個檔案
+        max_files = system_config["max_log_files"]
+        for _, old_file in log_files[max_files:]:
+            try:
+                os.unlink(old_file)
+                self.logger.info("清理舊日誌檔案: %s", old_file)
+            except Exception as e:
+                self.logger.error("清理日誌檔案失敗: %s", e)
 
 
 def setup_logging(config_manager: Optional[ConfigManager] = None) -> LoggerManager:
@@ -8,13 +8,16 @@
 import os
 import sys
 import time
+import asyncio
+import queue
 import signal
-import schedule
 import psutil
 import threading
+from collections import deque
 from datetime import datetime, timedelta
+from itertools import islice
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Deque, Optional, Dict, Any, Tuple
 
 try:
     from .config import ConfigManager
@@ -28,6 +31,23 @@ except ImportError:
     from ip_detector import IPDetector
     from discord_client import DiscordClient
 
+# 清除螢幕並將游標移到左上角的 ANSI 控制碼
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+
+# 停止時等待佇列中Discord通知發送完成的最長時間（秒）
+SEND_DRAIN_TIMEOUT = 60.0
+
+# 停止時等待執行中任務完成的最長時間（秒）
+EXEC_WAIT_TIMEOUT = 30.0
+
+# asyncio 排程單次睡眠的上限（秒）：睡眠以單調時鐘計時，排程時間則是牆上時間，
+# 分段睡眠並每次重新比對，時鐘調整或主機休眠後也能準時執行
+ASYNC_SLEEP_CHUNK = 60.0
+
+# 行程資源使用量的快取時間（秒）：執行任務時較常取樣，閒置時避免重複讀取 /proc
+SYSTEM_INFO_TTL_ACTIVE = 1.0
+SYSTEM_INFO_TTL_IDLE = 10.0
+
 
 class ExecutionRecord:
     """執行記錄"""
@@ -46,25 +66,30 @@ class ExecutionRecord:
         self.result = result
         self.details = details
 
-    def __str__(self):
+        # 記錄建立後不再變更，顯示文字只格式化一次
         time_str = self.timestamp.strftime("%H:%M:%S")
-        status_icon = (
-            "✅"
-            if "成功" in self.result or "完成" in self.result
-            else "❌" if "失敗" in self.result else "ℹ️"
-        )
-        return f"[{time_str}] {status_icon} {self.mode} - {self.action} → {self.result}"
+        if "成功" in result or "完成" in result:
+            status_icon = "✅"
+        elif "失敗" in result:
+            status_icon = "❌"
+        else:
+            status_icon = "ℹ️"
+        self._text = f"[{time_str}] {status_icon} {mode} - {action} → {result}"
+
+    def __str__(self):
+        return self._text
 
 
 class SchedulerManager:
     """排程管理器"""
 
-    def __init__(self, config_manager: Optional[ConfigManager] = None):
+    def __init__(self, config_manager: Optional[ConfigManager] = None, session=None):
         """
         初始化排程管理器
 
         Args:
             config_manager: 設定管理器實例
+            session: 共用的 requests.Session（IP檢測與Discord發送共用連線）
         """
         self.config = config_manager or ConfigManager()
         self.log_manager = LoggerManager(self.config)
@@ -73,33 +98,59 @@ class SchedulerManager:
 
         # 核心組件 - 整合歷史管理
         ip_history_config = self.config.get_ip_history_config()
-        ip_detector_config = self.config.get_ip_config()
 
-        # 將歷史配置合併到IP檢測器配置中
-        ip_detector_config.update(
-            {"ip_history_file": self.config.get_history_file_path()}
-        )
+        # 將歷史配置合併到IP檢測器配置中（設定檢視為唯讀，需複製）
+        ip_detector_config = dict(self.config.get_ip_config())
+        ip_detector_config["ip_history_file"] = self.config.get_history_file_path()
 
-        self.ip_detector = IPDetector(ip_detector_config)
+        self.ip_detector = IPDetector(ip_detector_config, session=session)
         webhook_url = self.config.get("discord", "webhook_url")
-        self.discord_client = DiscordClient(webhook_url)
+        self.discord_client = DiscordClient(webhook_url, session=session)
 
         # 狀態管理
         self.is_running = False
         self.is_executing = False
-        self.execution_history: List[ExecutionRecord] = []
         self.execution_lock = threading.Lock()
+        self._exec_done = threading.Event()  # 無任務執行時為 set
+        self._exec_done.set()
         self.last_execution_time = None
         self.start_time = datetime.now()
-
-        # 排程設定
+        self._start_mono = time.monotonic()  # 運行時間以單調時鐘計算，不受系統校時影響
+        self._next_run: Optional[datetime] = None  # asyncio 排程模式使用
+        self._next_run_cache: Optional[datetime] = None  # schedule 模式的下次執行時間
+
+        # 狀態畫面：狀態變化時喚醒更新，內容未變化時不重繪
+        self._wake = threading.Event()
+        self._history_version = 0
+        self._last_rendered_state: Optional[tuple] = None
+        self._next_run_label: tuple = (None, "")  # (下次執行時間, 格式化文字)
+        self._history_block: tuple = (None, "")  # (歷史版本, 執行歷史顯示文字)
+
+        # 排程模式的Discord通知佇列與發送執行緒
+        self._send_queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._sender: Optional[threading.Thread] = None
+        self._history_lock = threading.Lock()
+        # 最近一次排程任務是否已將通知排入佇列（最終結果由發送執行緒記錄）
+        self._notification_queued = False
+
+        # 排程設定（初始化時讀取一次，狀態更新與任務執行時不再查詢設定）
         scheduler_config = self.config.get_scheduler_config()
         self.daily_time = scheduler_config["daily_time"]
         self.status_update_interval = scheduler_config["status_update_interval"]
         self.max_history = scheduler_config["max_execution_history"]
+        self.logs_dir = self.config.get("system", "logs_dir")
+
+        # 執行歷史：超過上限時自動捨棄最舊的記錄
+        self.execution_history: Deque[ExecutionRecord] = deque(maxlen=self.max_history)
+
+        # Windows 10+ 主控台需先啟用虛擬終端處理才能解析 ANSI 控制碼
+        if os.name == "nt":
+            os.system("")
 
         # 系統監控
         self.process = psutil.Process()
+        self._sysinfo_cache: Optional[Dict[str, str]] = None
+        self._sysinfo_ts = 0.0
 
         # 設定信號處理
         self._setup_signal_handlers()
@@ -122,94 +173,192 @@ class SchedulerManager:
     ):
         """添加執行記錄"""
         record = ExecutionRecord(mode, action, result, details)
-        self.execution_history.append(record)
+        # 發送執行緒也會新增記錄
+        with self._history_lock:
+            self.execution_history.append(record)
+            self._history_version += 1
+        self._wake.set()
+
+    def _compute_next_run(self, now: Optional[datetime] = None) -> datetime:
+        """
+        依每日排程時間計算下次執行時間
 
-        # 保持歷史記錄數量在限制內
-        if len(self.execution_history) > self.max_history:
-            self.execution_history = self.execution_history[-self.max_history :]
+        Args:
+            now: 基準時間，預設為當前時間
+
+        Returns:
+            下次執行時間（今天已過則為明天）
+        """
+        now = now or datetime.now()
+        hours, minutes = (int(part) for part in self.daily_time.split(":"))
+        next_run = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return next_run
 
     def _get_next_scheduled_time(self) -> Optional[datetime]:
         """取得下次排程執行時間"""
+        if self._next_run is not None:
+            return self._next_run
+
+        # 排程時間尚未到達前不會改變，到達後才重新查詢（此時任務已執行並排定下次時間）
+        cached = self._next_run_cache
+        if cached is not None and cached > datetime.now():
+            return cached
+
+        # schedule 只在 --legacy-scheduler 時載入，尚未載入表示沒有任何排程
+        schedule = sys.modules.get("schedule")
+        if schedule is None:
+            return None
+
         try:
             jobs = schedule.jobs
             if not jobs:
                 return None
 
             next_run = min(job.next_run for job in jobs if job.next_run)
+            self._next_run_cache = next_run
             return next_run
         except Exception:
             return None
 
     def _get_system_info(self) -> Dict[str, str]:
-        """取得系統資訊"""
+        """取得系統資訊（記憶體與 CPU 使用量依執行狀態快取）"""
         try:
-            memory_mb = self.process.memory_info().rss / 1024 / 1024
-            cpu_percent = self.process.cpu_percent()
-
+            now = time.monotonic()
+            ttl = SYSTEM_INFO_TTL_ACTIVE if self.is_executing else SYSTEM_INFO_TTL_IDLE
+            if self._sysinfo_cache is None or now - self._sysinfo_ts >= ttl:
+                # oneshot 讓多個指標共用同一次 /proc 讀取
+                with self.process.oneshot():
+                    memory_mb = self.process.memory_info().rss / 1024 / 1024
+                    cpu_percent = self.process.cpu_percent(interval=0.0)
+
+                self._sysinfo_cache = {
+                    "memory": f"{memory_mb:.1f}MB",
+                    "cpu": f"{cpu_percent:.1f}%",
+                }
+                self._sysinfo_ts = now
+
+            hours, rem = divmod(int(now - self._start_mono), 3600)
+            minutes, seconds = divmod(rem, 60)
             return {
-                "memory": f"{memory_mb:.1f}MB",
-                "cpu": f"{cpu_percent:.1f}%",
-                "uptime": str(datetime.now() - self.start_time).split(".")[0],
+                **self._sysinfo_cache,
+                "uptime": f"{hours}:{minutes:02d}:{seconds:02d}",
             }
         except Exception as e:
             self.logger.error(f"取得系統資訊失敗: {e}")
             return {"memory": "N/A", "cpu": "N/A", "uptime": "N/A"}
 
-    def _clear_screen(self):
-        """清除螢幕"""
-        os.system("clear" if os.name == "posix" else "cls")
-
     def _display_status(self):
-        """顯示實時狀態"""
-        self._clear_screen()
+        """顯示實時狀態（清除螢幕與整個畫面以單次寫入輸出）"""
+        sys.stdout.write(CLEAR_SCREEN + self._render_status())
+        sys.stdout.flush()
+
+    def _format_next_run(self, next_run: datetime) -> str:
+        """格式化下次執行時間（每次排程只格式化一次）"""
+        if self._next_run_label[0] != next_run:
+            self._next_run_label = (next_run, next_run.strftime("%Y-%m-%d %H:%M:%S"))
+        return self._next_run_label[1]
+
+    def _get_history_block(self) -> str:
+        """取得最近10次執行記錄的顯示文字（只在新增記錄後重新組合）"""
+        with self._history_lock:
+            version = self._history_version
+            if self._history_block[0] != version:
+                if self.execution_history:
+                    recent = list(islice(reversed(self.execution_history), 10))
+                    text = "\n".join(f"  {record}" for record in reversed(recent))
+                else:
+                    text = "  暫無執行記錄"
+                self._history_block = (version, text)
+            return self._history_block[1]
 
+    def _render_status(self) -> str:
+        """組合狀態畫面的完整內容"""
         current_time = datetime.now()
         next_run = self._get_next_scheduled_time()
         system_info = self._get_system_info()
 
-        print("🤖 Discord IP Bot - 排程模式運行中")
-        print("=" * 60)
-        print(f"📅 排程設定: 每天 {self.daily_time}")
-        print(f"⏰ 當前時間: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        lines = [
+            "🤖 Discord IP Bot - 排程模式運行中",
+            "=" * 60,
+            f"📅 排程設定: 每天 {self.daily_time}",
+            f"⏰ 當前時間: {current_time.strftime('%Y-%m-%d %H:%M:%S')}",
+        ]
 
         if next_run:
-            time_diff = next_run - current_time
-            if time_diff.total_seconds() > 0:
-                hours, remainder = divmod(time_diff.total_seconds(), 3600)
-                minutes, _ = divmod(remainder, 60)
-                print(
-                    f"⏳ 下次執行: {next_run.strftime('%Y-%m-%d %H:%M:%S')} ({int(hours)}小時{int(minutes)}分鐘後)"
+            remaining = int((next_run - current_time).total_seconds())
+            if remaining > 0:
+                hours, remainder = divmod(remaining, 3600)
+                lines.append(
+                    f"⏳ 下次執行: {self._format_next_run(next_run)} ({hours}小時{remainder // 60}分鐘後)"
                 )
             else:
-                print("⏳ 下次執行: 即將執行...")
+                lines.append("⏳ 下次執行: 即將執行...")
         else:
-            print("⏳ 下次執行: 排程未設定")
+            lines.append("⏳ 下次執行: 排程未設定")
 
-        print(f"📊 執行狀態: {'🔄 執行中...' if self.is_executing else '💤 等待中'}")
-        print(f"💻 系統資源: RAM: {system_info['memory']}, CPU: {system_info['cpu']}")
-        print(f"⏱️  運行時間: {system_info['uptime']}")
-        print()
+        lines.append(
+            f"📊 執行狀態: {'🔄 執行中...' if self.is_executing else '💤 等待中'}"
+        )
+        lines.append(
+            f"💻 系統資源: RAM: {system_info['memory']}, CPU: {system_info['cpu']}"
+        )
+        lines.append(f"⏱️  運行時間: {system_info['uptime']}")
+        lines.append("")
 
         # 顯示執行歷史（最近10次）
-        print("📋 執行歷史:")
-        if self.execution_history:
-            for record in self.execution_history[-10:]:
-                print(f"  {record}")
-        else:
-            print("  暫無執行記錄")
+        lines.append("📋 執行歷史:")
+        lines.append(self._get_history_block())
 
-        print()
+        lines.append("")
         if self.last_execution_time:
-            print(
+            lines.append(
                 f"🕐 上次執行: {self.last_execution_time.strftime('%Y-%m-%d %H:%M:%S')}"
             )
 
-        print(
+        lines.append(
             "💡 提示: 按 Ctrl+C 停止排程，手動執行請開啟新terminal運行 'python main.py --manual'"
         )
-        print("-" * 60)
+        lines.append("-" * 60)
+        return "\n".join(lines) + "\n"
+
+    def _get_render_state(self) -> tuple:
+        """取得影響狀態畫面的狀態（倒數顯示到分鐘，因此包含當前分鐘）"""
+        return (
+            self.is_executing,
+            self._history_version,
+            self.last_execution_time,
+            self._get_next_scheduled_time(),
+            datetime.now().replace(second=0, microsecond=0),
+        )
+
+    def _refresh_status(self) -> bool:
+        """
+        狀態有變化時才重繪狀態畫面
+
+        Returns:
+            是否重繪
+        """
+        state = self._get_render_state()
+        if state == self._last_rendered_state:
+            return False
+
+        self._display_status()
+        self._last_rendered_state = state
+        return True
 
-    def _execute_ip_check(self, mode: str = "排程") -> bool:
+    def _wait_for_wake(self, deadline: float):
+        """
+        等待狀態變化或到達期限（取代固定間隔的 sleep）
+
+        Args:
+            deadline: time.monotonic() 的絕對期限，扣除繪製耗時讓更新間隔不漂移
+        """
+        self._wake.wait(timeout=max(0.0, deadline - time.monotonic()))
+        self._wake.clear()
+
+    def _execute_ip_check(self, mode: str = "排程") -> Tuple[bool, str]:
         """
         執行IP檢測任務（使用新的智能變化檢測）
 
@@ -217,11 +366,15 @@ class SchedulerManager:
             mode: 執行模式 ("排程", "手動", "測試")
 
         Returns:
-            是否成功
+            (是否成功, 檢測到的公共IP)
         """
         with self.execution_lock:
             self.is_executing = True
+            self._exec_done.clear()
+            self._wake.set()
             success = False
+            public_ip = "無法獲取"
+            self._notification_queued = False
 
             try:
                 # 映射中文模式到英文（for IPDetector）
@@ -240,7 +393,7 @@ class SchedulerManager:
                         mode, "IP檢測", "失敗", ip_result["error"]
                     )
                     self.log_manager.log_execution(mode, "IP檢測", "失敗")
-                    return False
+                    return False, public_ip
 
                 public_ip = ip_result.get("public_ip", "無法獲取")
                 local_ip = ip_result.get("local_ip", "無法獲取")
@@ -252,7 +405,7 @@ class SchedulerManager:
                     self.log_manager.log_execution(
                         mode, "IP檢測", "失敗", ip="無法獲取"
                     )
-                    return False
+                    return False, public_ip
 
                 # 記錄IP檢測成功
                 ip_details = f"公共IP: {public_ip}"
@@ -275,44 +428,22 @@ class SchedulerManager:
 
                 # 根據智能邏輯決定是否發送Discord通知
                 if should_notify:
-                    try:
-                        # 構建IP資料字典給Discord客戶端
-                        current_ips = {
-                            "public_ip": public_ip,
-                            "local_ip": local_ip,
-                            "timestamp": ip_result.get("timestamp"),
-                        }
-
-                        discord_success = (
-                            self.discord_client.send_minecraft_server_notification(
-                                current_ips
-                            )
-                        )
-
-                        if discord_success:
-                            self._add_execution_record(
-                                mode,
-                                "Discord通知",
-                                "Discord發送成功",
-                                f"IP: {public_ip}",
-                            )
-                            self.log_manager.log_discord_send(public_ip, True, mode)
-                        else:
-                            self._add_execution_record(
-                                mode,
-                                "Discord通知",
-                                "Discord發送失敗",
-                                f"IP: {public_ip}",
-                            )
-                            self.log_manager.log_discord_send(public_ip, False, mode)
-                            return False
-
-                    except Exception as e:
+                    # 構建IP資料字典給Discord客戶端
+                    current_ips = {
+                        "public_ip": public_ip,
+                        "local_ip": local_ip,
+                        "timestamp": ip_result.get("timestamp"),
+                    }
+
+                    if mode == "排程":
+                        # 排程通知交由背景執行緒發送，不阻塞排程與狀態畫面
+                        # （於記錄檢測完成後才排入，發送結果必定記錄在其後）
+                        self._notification_queued = True
                         self._add_execution_record(
-                            mode, "Discord通知", "Discord發送失敗", f"錯誤: {str(e)}"
+                            mode, "Discord通知", "已排入發送佇列", f"IP: {public_ip}"
                         )
-                        self.logger.error(f"Discord發送失敗: {e}")
-                        return False
+                    elif not self._send_notification(current_ips, mode):
+                        return False, public_ip
                 else:
                     # 解釋為什麼不發送通知
                     if mode == "測試":
@@ -330,7 +461,16 @@ class SchedulerManager:
                 execution_summary = (
                     f"IP={public_ip}, 變化={has_changed}, 通知={should_notify}"
                 )
-                self._add_execution_record(mode, "任務完成", "成功", execution_summary)
+                if self._notification_queued:
+                    # 任務是否成功取決於發送結果，由發送執行緒記錄最終的任務完成記錄
+                    self._add_execution_record(
+                        mode, "IP檢測完成", "等待Discord發送", execution_summary
+                    )
+                    self._enqueue_notification(current_ips, mode)
+                else:
+                    self._add_execution_record(
+                        mode, "任務完成", "成功", execution_summary
+                    )
                 success = True
                 self.last_execution_time = datetime.now()
 
@@ -341,41 +481,161 @@ class SchedulerManager:
 
             finally:
                 self.is_executing = False
+                self._exec_done.set()
+                self._wake.set()
+
+            return success, public_ip
+
+    def _send_notification(self, current_ips: Dict[str, Any], mode: str) -> bool:
+        """
+        發送Discord通知並記錄結果
+
+        Args:
+            current_ips: IP資料字典
+            mode: 執行模式
+
+        Returns:
+            是否發送成功
+        """
+        public_ip = current_ips["public_ip"]
+        try:
+            discord_success = self.discord_client.send_minecraft_server_notification(
+                current_ips
+            )
+        except Exception as e:
+            self._add_execution_record(
+                mode, "Discord通知", "Discord發送失敗", f"錯誤: {str(e)}"
+            )
+            self.logger.error(f"Discord發送失敗: {e}")
+            return False
 
-            return success
+        if discord_success:
+            self._add_execution_record(
+                mode, "Discord通知", "Discord發送成功", f"IP: {public_ip}"
+            )
+        else:
+            self._add_execution_record(
+                mode, "Discord通知", "Discord發送失敗", f"IP: {public_ip}"
+            )
+        self.log_manager.log_discord_send(public_ip, discord_success, mode)
+        return discord_success
+
+    def _enqueue_notification(self, current_ips: Dict[str, Any], mode: str):
+        """將Discord通知排入發送佇列（首次使用時啟動發送執行緒）"""
+        if self._sender is None or not self._sender.is_alive():
+            self._sender = threading.Thread(
+                target=self._send_worker, name="discord-sender", daemon=True
+            )
+            self._sender.start()
+
+        self._send_queue.put({"ips": current_ips, "mode": mode})
+
+    def _send_worker(self):
+        """
+        依序發送佇列中的Discord通知，收到 None 時結束
+
+        佇列累積多筆通知時只發送最新的一筆（較舊的IP已失效），
+        連續多次檢測只需一次 HTTP 請求；每筆通知所屬排程任務的最終結果
+        （含被合併而未發送的通知）記錄到執行歷史與排程日誌
+        """
+        stopping = False
+        while not stopping:
+            items = [self._send_queue.get()]
+            try:
+                while True:
+                    try:
+                        items.append(self._send_queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stopping = None in items
+                pending = [item for item in items if item is not None]
+                if pending:
+                    if len(pending) > 1:
+                        self.logger.info(
+                            "合併 %d 筆Discord通知，只發送最新IP", len(pending)
+                        )
+                    latest = pending[-1]
+                    sent = self._send_notification(latest["ips"], latest["mode"])
+                    for item in pending:
+                        self._finish_queued_task(
+                            item, sent, superseded=item is not latest
+                        )
+            finally:
+                for _ in items:
+                    self._send_queue.task_done()
+
+    def _finish_queued_task(
+        self, item: Dict[str, Any], sent: bool, superseded: bool = False
+    ):
+        """
+        記錄已排入佇列之排程任務的最終結果
+
+        Args:
+            item: 佇列中的通知
+            sent: 通知是否發送成功
+            superseded: 是否因合併而改發送較新的IP
+        """
+        mode = item["mode"]
+        public_ip = item["ips"].get("public_ip")
+
+        if superseded:
+            details = f"通知已由較新的IP取代，未發送: {public_ip}"
+        elif sent:
+            details = f"Discord通知已發送: {public_ip}"
+        else:
+            details = f"Discord通知發送失敗: {public_ip}"
+
+        success = sent and not superseded
+        self._add_execution_record(
+            mode, "任務完成", "成功" if success else "失敗", details
+        )
+        if success:
+            self.scheduler_logger.info(f"排程任務執行完成 - {details}")
+        else:
+            self.scheduler_logger.error(f"排程任務執行失敗 - {details}")
+
+    def _drain_send_queue(self):
+        """等待佇列中的Discord通知發送完成並結束發送執行緒"""
+        if self._sender is None or not self._sender.is_alive():
+            return
+
+        if self._send_queue.unfinished_tasks:
+            print("⏳ 等待Discord通知發送完成...")
+        self._send_queue.put(None)
+        self._sender.join(timeout=SEND_DRAIN_TIMEOUT)
+        self._sender = None
 
     def scheduled_task(self):
         """排程任務：檢測IP變化，有變化才發送"""
         self.scheduler_logger.info("開始執行排程任務")
-        success = self._execute_ip_check("排程")
-        result = "完成" if success else "失敗"
-        self.scheduler_logger.info(f"排程任務執行{result}")
+        success, _ = self._execute_ip_check("排程")
+        if success and self._notification_queued:
+            # 最終結果於發送執行緒送出通知後記錄
+            self.scheduler_logger.info("排程任務IP檢測完成，等待Discord通知發送")
+        else:
+            result = "完成" if success else "失敗"
+            self.scheduler_logger.info(f"排程任務執行{result}")
 
     def manual_task(self) -> bool:
         """手動任務：立即檢測並發送當前IP"""
         self.logger.info("執行手動任務")
-        success = self._execute_ip_check("手動")
-        self.log_manager.log_manual_execution(
-            ip="已處理" if success else "失敗", success=success
-        )
+        success, public_ip = self._execute_ip_check("手動")
+        self.log_manager.log_manual_execution(ip=public_ip, success=success)
         return success
 
     def test_task(self) -> bool:
         """測試任務：檢測IP但不發送Discord（使用新的智能檢測）"""
         self.logger.info("執行測試任務")
-        success = self._execute_ip_check("測試")
+        success, public_ip = self._execute_ip_check("測試")
 
-        # 記錄測試執行結果
-        if success:
-            # IP 資訊已經在 _execute_ip_check 中處理了
-            self.log_manager.log_test_execution("測試完成")
-        else:
-            self.log_manager.log_test_execution("測試失敗")
+        # 記錄測試執行結果（直接使用檢測到的IP，不重新查詢）
+        self.log_manager.log_test_execution(public_ip if success else "測試失敗")
 
         return success
 
-    def start_daemon(self):
-        """啟動守護程式模式"""
+    def _print_daemon_banner(self):
+        """顯示守護程式啟動資訊並檢查設定"""
         self.logger.info("啟動排程守護程式")
         print("🤖 Discord IP Bot - 排程模式啟動中...")
         print("=" * 60)
@@ -399,8 +659,15 @@ class SchedulerManager:
         print()
         print("⚡ 排程系統啟動中...")
 
+    def start_daemon(self):
+        """啟動守護程式模式（schedule 輪詢版本，供 --legacy-scheduler 使用）"""
+        self._print_daemon_banner()
+
+        import schedule
+
         # 設定排程
         schedule.every().day.at(self.daily_time).do(self.scheduled_task)
+        self._next_run_cache = None
         self._add_execution_record(
             "系統", "排程啟動", "成功", f"每日 {self.daily_time}"
         )
@@ -411,9 +678,19 @@ class SchedulerManager:
 
         try:
             while self.is_running:
-                self._display_status()
-                schedule.run_pending()
-                time.sleep(self.status_update_interval)
+                deadline = time.monotonic() + self.status_update_interval
+                self._refresh_status()
+
+                # 只在有任務到期時才逐一檢查排程
+                idle_seconds = schedule.idle_seconds()
+                if idle_seconds is not None and idle_seconds <= 0:
+                    schedule.run_pending()
+                    idle_seconds = schedule.idle_seconds()
+
+                # 等到狀態變化、下次排程或下次狀態更新，以先到者為準
+                if idle_seconds is not None:
+                    deadline = min(deadline, time.monotonic() + max(0.0, idle_seconds))
+                self._wait_for_wake(deadline)
 
         except KeyboardInterrupt:
             self.stop()
@@ -422,10 +699,64 @@ class SchedulerManager:
             self.logger.error(f"排程系統異常: {e}")
             self.stop()
 
+    async def start_daemon_async(self):
+        """
+        啟動守護程式模式（asyncio 事件迴圈版本）
+
+        睡眠到下次排程時間再執行任務（每段最多 ASYNC_SLEEP_CHUNK 秒），不需每秒輪詢；
+        狀態畫面由獨立的協程依 status_update_interval 更新
+        """
+        self._print_daemon_banner()
+
+        self._next_run = self._compute_next_run()
+        self._add_execution_record(
+            "系統", "排程啟動", "成功", f"每日 {self.daily_time}"
+        )
+
+        self.is_running = True
+        print("✅ 排程系統已啟動")
+        await asyncio.sleep(2)  # 短暫延遲，讓用戶看到啟動訊息
+
+        status_task = asyncio.create_task(self._status_loop_async())
+
+        try:
+            while self.is_running:
+                # 只在牆上時間確實到達排程時間後才執行，提早喚醒時繼續睡眠
+                delay = (self._next_run - datetime.now()).total_seconds()
+                if delay > 0:
+                    await asyncio.sleep(min(delay, ASYNC_SLEEP_CHUNK))
+                    continue
+
+                # 同步的 IP 檢測與 Discord 發送在執行緒中進行，不阻塞事件迴圈
+                await asyncio.to_thread(self.scheduled_task)
+
+                # 從本次排程時間之後計算，同一時段不會重複執行
+                self._next_run = self._compute_next_run(
+                    max(datetime.now(), self._next_run)
+                )
+
+        except asyncio.CancelledError:
+            self.stop()
+
+        except Exception as e:
+            self.logger.error(f"排程系統異常: {e}")
+            self.stop()
+
+        finally:
+            status_task.cancel()
+
+    async def _status_loop_async(self):
+        """狀態變化或定期逾時時更新狀態畫面的協程"""
+        while self.is_running:
+            deadline = time.monotonic() + self.status_update_interval
+            self._refresh_status()
+            await asyncio.to_thread(self._wait_for_wake, deadline)
+
     def stop(self):
         """停止排程系統"""
         self.logger.info("正在停止排程系統...")
         self.is_running = False
+        self._wake.set()
         self._add_execution_record("系統", "排程停止", "成功", "使用者中斷")
 
         print()
@@ -434,16 +765,22 @@ class SchedulerManager:
         # 等待當前任務完成
         if self.is_executing:
             print("⏳ 等待當前任務完成...")
-            while self.is_executing:
-                time.sleep(0.5)
+            self._exec_done.wait(timeout=EXEC_WAIT_TIMEOUT)
 
-        # 清理排程
-        schedule.clear()
+        # 清理排程（schedule 僅在舊版輪詢模式載入）
+        schedule = sys.modules.get("schedule")
+        if schedule is not None:
+            schedule.clear()
+        self._next_run = None
+        self._next_run_cache = None
+
+        # 送出尚未發送的通知後再釋放 HTTP 連線
+        self._drain_send_queue()
+        self.ip_detector.close()
+        self.discord_client.close()
 
         print("✅ 排程系統已安全關閉")
-        print(
-            f"💾 執行歷史已保存到 {self.config.get('system', 'logs_dir')}/scheduler.log"
-        )
+        print(f"💾 執行歷史已保存到 {self.logs_dir}/scheduler.log")
         print("👋 再見！")
 
     def get_status_info(self) -> Dict[str, Any]:
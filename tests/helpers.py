@@ -0,0 +1,40 @@
+"""
+測試共用工具
+
+提供各測試模組共用的臨時目錄與模擬 HTTP 回應
+"""
+
+import tempfile
+from typing import Callable
+from unittest.mock import MagicMock
+
+# 測試臨時目錄的名稱前綴
+TEMP_DIR_PREFIX = "discord_ip_bot_test_"
+
+
+def make_temp_dir(add_cleanup: Callable) -> str:
+    """
+    建立臨時目錄，並以 add_cleanup 註冊結束時刪除
+
+    之後才註冊的清理（例如關閉歷史管理器）會先執行，
+    目錄刪除前其中的檔案都已寫入並關閉
+
+    Args:
+        add_cleanup: TestCase.addCleanup 或 TestCase.addClassCleanup
+
+    Returns:
+        str: 臨時目錄路徑
+    """
+    temp_dir = tempfile.TemporaryDirectory(
+        prefix=TEMP_DIR_PREFIX, ignore_cleanup_errors=True
+    )
+    add_cleanup(temp_dir.cleanup)
+    return temp_dir.name
+
+
+def make_mock_response(status_code: int, body: bytes = b"") -> MagicMock:
+    """建立模擬的 HTTP 回應（IP 服務讀取 raw 內容）"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.raw.read.return_value = body
+    return response
@@ -0,0 +1,440 @@
+"""
+設定管理模組測試
+
+測試 ConfigManager 的設定載入、驗證與磁碟快取功能
+"""
+
+import os
+import sys
+import json
+import tempfile
+import shutil
+import stat
+import unittest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# 確保可以導入src模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import src.config as config_module
+from src.config import (
+    ConfigManager,
+    ConfigError,
+    CACHE_FILE_NAME,
+    SCHEMA,
+    TOML_FILE_NAME,
+    json_dumpb,
+    json_dumps,
+    json_loads,
+)
+
+TEST_WEBHOOK_URL = "https://discord.com/api/webhooks/123456789/test-webhook-token"
+
+
+class TestConfigManagerCache(unittest.TestCase):
+    """ConfigManager 磁碟快取測試"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.test_dir = tempfile.mkdtemp()
+        self.env_file = os.path.join(self.test_dir, ".env")
+        self.cache_file = Path(self.test_dir) / CACHE_FILE_NAME
+        self._write_env(
+            f"DISCORD_WEBHOOK_URL={TEST_WEBHOOK_URL}\nAPP_NAME=Cache Test\n"
+        )
+
+        # 每個測試使用乾淨的環境變數（load_dotenv 的修改會在測試後還原）
+        self.env_patcher = patch.dict(os.environ, {}, clear=True)
+        self.env_patcher.start()
+        self.injected_patcher = patch.dict("src.config._DOTENV_INJECTED", clear=True)
+        self.injected_patcher.start()
+
+    def tearDown(self):
+        """測試後清理"""
+        self.injected_patcher.stop()
+        self.env_patcher.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _write_env(self, content: str):
+        with open(self.env_file, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def test_cache_written_after_first_load(self):
+        """測試首次載入後寫入快取"""
+        config = ConfigManager(self.env_file)
+
+        self.assertTrue(self.cache_file.exists())
+        with open(self.cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        self.assertEqual(cached["config"], config.config)
+
+    @unittest.skipIf(os.name != "posix", "僅 POSIX 系統有檔案權限位元")
+    def test_cache_file_owner_only(self):
+        """測試快取檔案僅擁有者可讀寫（內含 Webhook URL）"""
+        ConfigManager(self.env_file)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache_file).st_mode), 0o600)
+        self.assertFalse(self.cache_file.with_name(CACHE_FILE_NAME + ".tmp").exists())
+
+    def test_cache_hit_skips_dotenv(self):
+        """測試快取命中時不重新解析 .env"""
+        first = ConfigManager(self.env_file)
+
+        with patch("src.config.load_dotenv") as mock_load_dotenv:
+            second = ConfigManager(self.env_file)
+
+        mock_load_dotenv.assert_not_called()
+        self.assertEqual(second.config, first.config)
+        self.assertEqual(second.get("app", "name"), "Cache Test")
+
+    def test_cache_invalidated_when_env_file_changes(self):
+        """測試 .env 變更後快取失效"""
+        ConfigManager(self.env_file)
+
+        self._write_env(
+            f"DISCORD_WEBHOOK_URL={TEST_WEBHOOK_URL}\nAPP_NAME=Changed Name Value\n"
+        )
+        os.environ.clear()
+
+        config = ConfigManager(self.env_file)
+        self.assertEqual(config.get("app", "name"), "Changed Name Value")
+
+    def test_cache_invalidated_when_environment_changes(self):
+        """測試環境變數變更後快取失效"""
+        ConfigManager(self.env_file)
+
+        os.environ.clear()
+        os.environ["APP_NAME"] = "From Environment"
+
+        config = ConfigManager(self.env_file)
+        self.assertEqual(config.get("app", "name"), "From Environment")
+
+    def test_dotenv_skipped_when_environment_preloaded(self):
+        """測試必要環境變數已存在時不解析 .env"""
+        os.environ["DISCORD_WEBHOOK_URL"] = TEST_WEBHOOK_URL
+        os.environ["APP_NAME"] = "From systemd"
+
+        with patch("src.config.load_dotenv") as mock_load_dotenv:
+            config = ConfigManager(self.env_file, use_cache=False)
+
+        mock_load_dotenv.assert_not_called()
+        self.assertEqual(config.get("app", "name"), "From systemd")
+
+    def test_dotenv_loaded_when_environment_partial(self):
+        """測試只有部分環境變數存在時仍解析 .env"""
+        os.environ["DISCORD_WEBHOOK_URL"] = TEST_WEBHOOK_URL
+
+        config = ConfigManager(self.env_file, use_cache=False)
+        self.assertEqual(config.get("app", "name"), "Cache Test")
+
+    def test_use_cache_disabled(self):
+        """測試停用快取"""
+        ConfigManager(self.env_file, use_cache=False)
+        self.assertFalse(self.cache_file.exists())
+
+    def test_corrupted_cache_ignored(self):
+        """測試損壞的快取檔案會被忽略"""
+        self.cache_file.write_text("invalid json {", encoding="utf-8")
+
+        config = ConfigManager(self.env_file)
+        self.assertEqual(config.get("discord", "webhook_url"), TEST_WEBHOOK_URL)
+
+    def test_invalid_config_not_cached(self):
+        """測試驗證失敗的設定不會被快取"""
+        self._write_env("DISCORD_WEBHOOK_URL=https://example.com/invalid\n")
+
+        with self.assertRaises(ConfigError):
+            ConfigManager(self.env_file)
+
+        self.assertFalse(self.cache_file.exists())
+
+
+class TestConfigSchema(unittest.TestCase):
+    """ConfigManager 設定結構載入測試"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.env_patcher = patch.dict(
+            os.environ, {"DISCORD_WEBHOOK_URL": TEST_WEBHOOK_URL}, clear=True
+        )
+        self.env_patcher.start()
+
+    def tearDown(self):
+        """測試後清理"""
+        self.env_patcher.stop()
+
+    def _load(self) -> ConfigManager:
+        return ConfigManager(env_file="nonexistent.env", use_cache=False)
+
+    def test_defaults_follow_schema(self):
+        """測試未設定的環境變數使用 SCHEMA 預設值"""
+        config = self._load()
+
+        for section, key, env_key, value_type, default in SCHEMA:
+            if env_key == "DISCORD_WEBHOOK_URL":
+                continue
+            self.assertEqual(config.get(section, key, default), default)
+
+    def test_value_coercion(self):
+        """測試整數與布林值轉換"""
+        os.environ.update(
+            {
+                "DISCORD_RETRY_ATTEMPTS": "5",
+                "IP_CHECK_TIMEOUT": "not-a-number",
+                "CHECK_LOCAL_IP": "false",
+                "IP_HISTORY_COMPRESSION": "Yes",
+                "IP_HISTORY_AUTO_CLEANUP": " on ",
+                "APP_NAME": "",
+            }
+        )
+        config = self._load()
+
+        self.assertEqual(config.get("discord", "retry_attempts"), 5)
+        self.assertEqual(config.get("ip_detection", "timeout"), 10)
+        self.assertFalse(config.get("ip_detection", "check_local_ip"))
+        self.assertTrue(config.get("ip_history", "compression"))
+        self.assertTrue(config.get("ip_history", "auto_cleanup"))
+        self.assertEqual(config.get("app", "name"), "Discord IP Bot")
+
+    def test_section_views_are_read_only(self):
+        """測試區塊設定以唯讀檢視返回且不重複配置"""
+        config = self._load()
+
+        discord_config = config.get_discord_config()
+        self.assertIs(discord_config, config.get_discord_config())
+        with self.assertRaises(TypeError):
+            discord_config["timeout"] = 1
+
+    def test_ensure_directories(self):
+        """測試建立缺少的目錄並略過已存在的目錄"""
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir, True)
+        os.makedirs(os.path.join(test_dir, "logs"))
+        os.environ.update(
+            {
+                "LOGS_DIR": os.path.join(test_dir, "logs"),
+                "DATA_DIR": os.path.join(test_dir, "data"),
+                "IP_HISTORY_FILE": os.path.join(test_dir, "nested", "history.json"),
+            }
+        )
+        config = self._load()
+
+        config.ensure_directories()
+
+        for name in ("logs", "data", "nested"):
+            self.assertTrue(os.path.isdir(os.path.join(test_dir, name)))
+
+    def test_webhook_url_validation(self):
+        """測試 Webhook URL 格式驗證"""
+        valid_urls = [
+            TEST_WEBHOOK_URL,
+            "https://ptb.discord.com/api/webhooks/123/abc_DEF-xyz",
+            "https://canary.discord.com/api/webhooks/123/abc",
+            "https://discord.com/api/webhooks/123/abc?thread_id=456",
+        ]
+        invalid_urls = [
+            "https://discord.com/api/webhooks/",
+            "https://discord.com/api/webhooks/abc/token",
+            "https://discord.com/api/webhooks/123/token/extra",
+            "http://discord.com/api/webhooks/123/token",
+            "https://evil.com/?https://discord.com/api/webhooks/123/token",
+        ]
+
+        for url in valid_urls:
+            os.environ["DISCORD_WEBHOOK_URL"] = url
+            self.assertEqual(self._load().get("discord", "webhook_url"), url)
+
+        for url in invalid_urls:
+            os.environ["DISCORD_WEBHOOK_URL"] = url
+            with self.assertRaises(ConfigError, msg=url):
+                self._load()
+
+    def test_schedule_time_validation(self):
+        """測試排程時間格式驗證"""
+        for value in ("00:00", "9:30", "23:59"):
+            os.environ["SCHEDULE_TIME"] = value
+            self.assertEqual(self._load().get("scheduler", "daily_time"), value)
+
+        for value in ("24:00", "12:60", "12", "ab:cd", "12:30:00"):
+            os.environ["SCHEDULE_TIME"] = value
+            with self.assertRaises(ConfigError, msg=value):
+                self._load()
+
+    def test_logs_queued_until_logger_configured(self):
+        """測試日誌系統設定前的訊息會暫存並在之後輸出"""
+        with patch.object(config_module._LOG, "hasHandlers", return_value=False):
+            config = self._load()
+
+        self.assertTrue(config._pending_logs)
+        pending = list(config._pending_logs)
+
+        log_manager = MagicMock()
+        config.flush_pending_logs(log_manager)
+
+        log_manager.get_logger.assert_called_once_with("config")
+        logged = [
+            c.args for c in log_manager.get_logger.return_value.log.call_args_list
+        ]
+        self.assertEqual(logged, pending)
+        self.assertEqual(config._pending_logs, [])
+
+    def test_get_all_config_masks_sensitive_values(self):
+        """測試 get_all_config 遮蔽敏感資訊"""
+        config = self._load()
+
+        masked = config.get_all_config()
+
+        self.assertNotEqual(masked["discord"]["webhook_url"], TEST_WEBHOOK_URL)
+        self.assertTrue(
+            masked["discord"]["webhook_url"].endswith("..." + TEST_WEBHOOK_URL[-5:])
+        )
+        self.assertEqual(masked["app"]["name"], "Discord IP Bot")
+        self.assertTrue(ConfigManager._is_sensitive_key("bot_token"))
+        self.assertFalse(ConfigManager._is_sensitive_key("timeout"))
+
+    def test_missing_required_key(self):
+        """測試缺少必要設定時拋出異常"""
+        del os.environ["DISCORD_WEBHOOK_URL"]
+
+        with self.assertRaises(ConfigError) as context:
+            self._load()
+        self.assertIn("DISCORD_WEBHOOK_URL", str(context.exception))
+
+
+@unittest.skipIf(config_module.tomllib is None, "tomllib/tomli 不可用")
+class TestConfigToml(unittest.TestCase):
+    """ConfigManager TOML 設定檔測試"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.test_dir = tempfile.mkdtemp()
+        self.env_file = os.path.join(self.test_dir, ".env")
+        self.toml_file = Path(self.test_dir) / TOML_FILE_NAME
+
+        self.env_patcher = patch.dict(os.environ, {}, clear=True)
+        self.env_patcher.start()
+        self.injected_patcher = patch.dict("src.config._DOTENV_INJECTED", clear=True)
+        self.injected_patcher.start()
+
+    def tearDown(self):
+        """測試後清理"""
+        self.injected_patcher.stop()
+        self.env_patcher.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _write_toml(self, content: str):
+        self.toml_file.write_text(content, encoding="utf-8")
+
+    def test_typed_values_from_toml(self):
+        """測試由 TOML 載入具型別的設定值"""
+        self._write_toml(f"""
+[discord]
+webhook_url = "{TEST_WEBHOOK_URL}"
+retry_attempts = 5
+
+[ip_detection]
+check_local_ip = false
+""")
+
+        config = ConfigManager(self.env_file, use_cache=False)
+
+        self.assertEqual(config.get("discord", "webhook_url"), TEST_WEBHOOK_URL)
+        self.assertEqual(config.get("discord", "retry_attempts"), 5)
+        self.assertFalse(config.get("ip_detection", "check_local_ip"))
+        # 未在 TOML 中設定的項目使用預設值
+        self.assertEqual(config.get("app", "name"), "Discord IP Bot")
+
+    def test_only_allowlisted_env_overrides(self):
+        """測試只有允許清單中的環境變數可覆寫 TOML"""
+        self._write_toml("""
+[discord]
+webhook_url = "https://discord.com/api/webhooks/1/from-toml"
+
+[app]
+name = "From TOML"
+log_level = "INFO"
+""")
+        os.environ.update(
+            {
+                "DISCORD_WEBHOOK_URL": TEST_WEBHOOK_URL,
+                "LOG_LEVEL": "DEBUG",
+                "APP_NAME": "From Environment",
+            }
+        )
+
+        config = ConfigManager(self.env_file, use_cache=False)
+
+        self.assertEqual(config.get("discord", "webhook_url"), TEST_WEBHOOK_URL)
+        self.assertEqual(config.get("app", "log_level"), "DEBUG")
+        self.assertEqual(config.get("app", "name"), "From TOML")
+
+    def test_wrong_type_uses_default(self):
+        """測試型別不符的 TOML 值使用預設值"""
+        self._write_toml(f"""
+[discord]
+webhook_url = "{TEST_WEBHOOK_URL}"
+timeout = "fast"
+retry_attempts = true
+""")
+
+        config = ConfigManager(self.env_file, use_cache=False)
+
+        self.assertEqual(config.get("discord", "timeout"), 10)
+        self.assertEqual(config.get("discord", "retry_attempts"), 3)
+
+    def test_invalid_toml_raises_config_error(self):
+        """測試 TOML 格式錯誤時拋出 ConfigError"""
+        self._write_toml("[discord\nwebhook_url = ")
+
+        with self.assertRaises(ConfigError):
+            ConfigManager(self.env_file, use_cache=False)
+
+
+class TestJSONHelpers(unittest.TestCase):
+    """JSON 序列化輔助函數測試"""
+
+    def test_round_trip(self):
+        """測試序列化後可還原且不跳脫非 ASCII 字元"""
+        data = {"ip": "203.0.113.1", "note": "伺服器", "tags": [1, 2], "ok": True}
+
+        compact = json_dumps(data)
+        indented = json_dumps(data, indent=True)
+
+        self.assertIn("伺服器", compact)
+        self.assertIn("\n  ", indented)
+        self.assertEqual(json_loads(compact), data)
+        self.assertEqual(json.loads(indented), data)
+
+    def test_dumpb_returns_utf8_bytes(self):
+        """測試位元組序列化輸出 UTF-8 編碼且與字串版本一致"""
+        data = {"note": "伺服器", "items": [1, 2]}
+
+        self.assertIsInstance(json_dumpb(data), bytes)
+        self.assertEqual(
+            json_dumpb(data, indent=True).decode("utf-8"), json_dumps(data, indent=True)
+        )
+        self.assertEqual(json_loads(json_dumpb(data)), data)
+
+    @unittest.skipUnless(config_module.JSON_BACKEND == "orjson", "需要 orjson")
+    def test_dumpb_matches_orjson_utf8_output(self):
+        """測試中文內容直接輸出 UTF-8 位元組，與 orjson 結果完全一致"""
+        import orjson
+
+        data = {
+            "local_ip": "192.168.1.100",
+            "public_ip": "203.0.113.1",
+            "mode": "無法獲取",
+        }
+
+        self.assertEqual(json_dumpb(data), orjson.dumps(data))
+        self.assertIn("無法獲取".encode("utf-8"), json_dumpb(data))
+
+    def test_invalid_json_raises_json_decode_error(self):
+        """測試無效 JSON 拋出標準庫的 JSONDecodeError"""
+        with self.assertRaises(json.JSONDecodeError):
+            json_loads("invalid json {")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -11,6 +11,7 @@ import json
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import requests
 
 # 添加 src 目錄到 Python 路徑
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -45,6 +46,20 @@ class TestDiscordClient(unittest.TestCase):
         self.assertEqual(client.config["timeout"], 5)
         self.assertEqual(client.config["retry_attempts"], 2)
 
+    def test_session_lifecycle(self):
+        """測試自行建立的 Session 於離開 with 區塊時關閉，共用的 Session 則不關閉"""
+        client = DiscordClient(self.test_webhook_url, self.test_config)
+        self.assertIsInstance(client._session, requests.Session)
+        with patch.object(client._session, "close") as mock_close:
+            with client:
+                pass
+        mock_close.assert_called_once()
+
+        shared_session = MagicMock()
+        with DiscordClient(self.test_webhook_url, session=shared_session) as client:
+            self.assertIs(client._session, shared_session)
+        shared_session.close.assert_not_called()
+
     def test_init_invalid_webhook_empty(self):
         """測試空 Webhook URL"""
         with self.assertRaises(ValueError):
@@ -59,12 +74,32 @@ class TestDiscordClient(unittest.TestCase):
             "https://google.com",
             "not-a-url",
             "http://discord.com/api/webhooks/123/test",  # http instead of https
+            "https://discord.com/api/webhooks/test/example",  # 非數字 ID
         ]
 
         for invalid_url in invalid_urls:
             with self.assertRaises(ValueError):
                 DiscordClient(invalid_url)
 
+    def test_init_webhook_variants(self):
+        """測試 ptb/canary 子網域與討論串查詢參數的 Webhook URL"""
+        valid_urls = [
+            "https://canary.discord.com/api/webhooks/123/abc-DEF",
+            "https://ptb.discord.com/api/webhooks/123/abc_DEF",
+            "https://discord.com/api/webhooks/123/abc?thread_id=456",
+        ]
+
+        for valid_url in valid_urls:
+            with DiscordClient(valid_url) as client:
+                self.assertEqual(client.webhook_url, valid_url)
+
+    def test_init_invalid_webhook_creates_no_session(self):
+        """測試無效 Webhook URL 不會建立連線池"""
+        with patch.object(DiscordClient, "_create_session") as mock_create:
+            with self.assertRaises(ValueError):
+                DiscordClient("https://google.com")
+        mock_create.assert_not_called()
+
     def test_format_message_valid_ip(self):
         """測試訊息格式化 - 有效IP"""
         client = DiscordClient(self.test_webhook_url)
@@ -106,7 +141,34 @@ class TestDiscordClient(unittest.TestCase):
         with self.assertRaises(MessageFormatError):
             client._format_message("192.168.1.100")
 
-    @patch("requests.post")
+    def test_format_message_precompiled_template(self):
+        """測試預先解析的模板與 str.format 結果一致，且模板變更後重新解析"""
+        client = DiscordClient(self.test_webhook_url, self.test_config)
+        ip = "203.0.113.1"
+
+        for template in [
+            "{ip}",
+            "IP: {ip}:25565",
+            "{{literal}} {ip} / {ip}",
+            "{ip!r}",
+            "No placeholder",
+        ]:
+            client.config["message_template"] = template
+            self.assertEqual(client._format_message(ip), template.format(ip=ip))
+
+    def test_template_compiled_at_init(self):
+        """測試模板於初始化時解析，格式化時不再重新解析"""
+        client = DiscordClient(self.test_webhook_url, self.test_config)
+
+        with patch.object(
+            DiscordClient, "_compile_template", wraps=DiscordClient._compile_template
+        ) as mock_compile:
+            client._format_message("203.0.113.1")
+            client._format_message("203.0.113.2")
+
+        mock_compile.assert_not_called()
+
+    @patch("requests.Session.post")
     def test_send_message_success(self, mock_post):
         """測試發送訊息 - 成功情況"""
         # 模擬成功回應
@@ -125,7 +187,7 @@ class TestDiscordClient(unittest.TestCase):
         self.assertEqual(call_args[0][0], self.test_webhook_url)
         self.assertEqual(call_args[1]["json"]["content"], "Test message")
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_send_message_rate_limit(self, mock_post):
         """測試發送訊息 - 速率限制處理"""
         # 第一次回應速率限制，第二次成功
@@ -144,7 +206,37 @@ class TestDiscordClient(unittest.TestCase):
         self.assertTrue(result)
         self.assertEqual(mock_post.call_count, 2)
 
-    @patch("requests.post")
+    @patch("time.sleep")
+    @patch("requests.Session.post")
+    def test_send_message_rate_limit_exhausted(self, mock_post, mock_sleep):
+        """測試持續速率限制時計入重試次數並拋出錯誤，等待時間受上限限制"""
+        rate_limit_response = MagicMock()
+        rate_limit_response.status_code = 429
+        rate_limit_response.headers = {"Retry-After": "600"}
+        mock_post.return_value = rate_limit_response
+
+        config = dict(self.test_config, retry_max_delay=5.0)
+        client = DiscordClient(self.test_webhook_url, config)
+
+        with self.assertRaises(WebhookError):
+            client._send_message("Test message")
+
+        self.assertEqual(mock_post.call_count, config["retry_attempts"])
+        mock_sleep.assert_called_once_with(5.0)
+
+    def test_backoff_delay(self):
+        """測試指數退避等待時間"""
+        config = dict(
+            self.test_config, retry_delay=1.0, retry_jitter=0.5, retry_max_delay=30.0
+        )
+        client = DiscordClient(self.test_webhook_url, config)
+
+        with patch("random.random", return_value=1.0):
+            self.assertEqual(client._backoff_delay(0), 1.5)
+            self.assertEqual(client._backoff_delay(2), 6.0)
+            self.assertEqual(client._backoff_delay(10), 30.0)
+
+    @patch("requests.Session.post")
     def test_send_message_failure(self, mock_post):
         """測試發送訊息 - 失敗情況"""
         # 模擬請求失敗
@@ -157,7 +249,7 @@ class TestDiscordClient(unittest.TestCase):
         with self.assertRaises(WebhookError):
             client._send_message("Test message")
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_send_message_http_error(self, mock_post):
         """測試發送訊息 - HTTP錯誤"""
         # 模擬HTTP錯誤回應
@@ -171,7 +263,7 @@ class TestDiscordClient(unittest.TestCase):
         with self.assertRaises(WebhookError):
             client._send_message("Test message")
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_send_ip_notification_success(self, mock_post):
         """測試發送IP通知 - 成功情況"""
         mock_response = MagicMock()
@@ -197,7 +289,7 @@ class TestDiscordClient(unittest.TestCase):
         with self.assertRaises(MessageFormatError):
             client.send_ip_notification("   ")
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_test_connection_success(self, mock_post):
         """測試連線測試 - 成功情況"""
         mock_response = MagicMock()
@@ -212,7 +304,7 @@ class TestDiscordClient(unittest.TestCase):
         call_args = mock_post.call_args
         self.assertIn("連線測試", call_args[1]["json"]["content"])
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_test_connection_failure(self, mock_post):
         """測試連線測試 - 失敗情況"""
         import requests
@@ -224,7 +316,7 @@ class TestDiscordClient(unittest.TestCase):
         with self.assertRaises(WebhookError):
             client.test_connection()
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_send_multiple_ips_success(self, mock_post):
         """測試發送多個IP - 成功情況"""
         mock_response = MagicMock()
@@ -279,7 +371,7 @@ class TestDiscordClient(unittest.TestCase):
         # 檢查URL是否被遮蔽
         self.assertTrue(info["webhook_url_masked"].endswith("..."))
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_send_minecraft_server_notification_success(self, mock_post):
         """測試 Minecraft 伺服器通知 - 成功情況"""
         mock_response = MagicMock()
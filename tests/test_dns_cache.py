@@ -0,0 +1,96 @@
+"""
+DNS 快取模組測試
+
+測試 DNSCache 的 TTL 行為與 CachedDNSAdapter 的連線池設定
+"""
+
+import os
+import socket
+import sys
+import unittest
+from unittest.mock import patch
+
+# 確保可以導入src模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.dns_cache import (
+    DNSCache,
+    CachedDNSAdapter,
+    CachedHTTPSConnectionPool,
+    get_ssl_context,
+)
+
+FAKE_ADDRINFO = [
+    (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("203.0.113.5", 443)),
+    (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("203.0.113.5", 443)),
+    (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("203.0.113.6", 443)),
+]
+
+
+class TestDNSCache(unittest.TestCase):
+    """DNSCache 測試"""
+
+    @patch("socket.getaddrinfo", return_value=FAKE_ADDRINFO)
+    def test_resolve_uses_cache_within_ttl(self, mock_getaddrinfo):
+        """測試 TTL 內重複解析只查詢一次"""
+        cache = DNSCache(ttl=900)
+
+        first = cache.resolve("api.ipify.org", 443)
+        second = cache.resolve("api.ipify.org", 443)
+
+        self.assertEqual(first, ["203.0.113.5", "203.0.113.6"])
+        self.assertEqual(second, first)
+        self.assertEqual(mock_getaddrinfo.call_count, 1)
+
+    @patch("src.dns_cache.time.monotonic")
+    @patch("socket.getaddrinfo", return_value=FAKE_ADDRINFO)
+    def test_resolve_expires_after_ttl(self, mock_getaddrinfo, mock_monotonic):
+        """測試超過 TTL 後重新解析"""
+        cache = DNSCache(ttl=900)
+
+        mock_monotonic.return_value = 1000.0
+        cache.resolve("api.ipify.org", 443)
+        mock_monotonic.return_value = 1901.0
+        cache.resolve("api.ipify.org", 443)
+
+        self.assertEqual(mock_getaddrinfo.call_count, 2)
+
+    @patch("socket.getaddrinfo", return_value=FAKE_ADDRINFO)
+    def test_invalidate(self, mock_getaddrinfo):
+        """測試清除快取後重新解析"""
+        cache = DNSCache()
+
+        cache.resolve("discord.com", 443)
+        cache.invalidate("discord.com", 443)
+        cache.resolve("discord.com", 443)
+
+        self.assertEqual(mock_getaddrinfo.call_count, 2)
+
+    def test_adapter_uses_cached_pools(self):
+        """測試 CachedDNSAdapter 使用帶快取的連線池"""
+        adapter = CachedDNSAdapter(pool_connections=1, pool_maxsize=1)
+        try:
+            pool = adapter.poolmanager.connection_from_url("https://discord.com/")
+            self.assertIsInstance(pool, CachedHTTPSConnectionPool)
+        finally:
+            adapter.close()
+
+    def test_adapter_shares_ssl_context(self):
+        """測試不同 Adapter 的連線池共用同一個 SSLContext"""
+        url = "https://api.ipify.org/"
+        contexts = []
+        for _ in range(2):
+            adapter = CachedDNSAdapter(pool_connections=1, pool_maxsize=1)
+            try:
+                pool = adapter.poolmanager.connection_from_url(url)
+                adapter.cert_verify(pool, url, False, None)
+                contexts.append(pool.conn_kw["ssl_context"])
+            finally:
+                adapter.close()
+
+        self.assertIs(contexts[0], contexts[1])
+        self.assertIs(contexts[0], get_ssl_context(None))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -11,6 +11,7 @@ import time
 import threading
 from unittest.mock import patch, MagicMock
 from pathlib import Path
+from typing import Optional
 
 # 確保可以導入 src 模組
 project_root = Path(__file__).parent.parent
@@ -23,31 +24,62 @@ try:
     from scheduler import SchedulerManager
     from ip_detector import IPDetector
     from discord_client import DiscordClient
+    from ip_history import IPHistoryManager
+    import main
 except ImportError as e:
     print(f"無法導入模組: {e}")
     sys.exit(1)
 
+try:
+    from tests.helpers import make_temp_dir, make_mock_response
+except ImportError:
+    # 直接執行測試檔案時
+    from helpers import make_temp_dir, make_mock_response
+
 
 class TestFullIntegration(unittest.TestCase):
     """完整整合測試"""
 
-    def setUp(self):
-        """測試前準備"""
-        # 確保測試環境乾淨
-        os.environ.pop("DISCORD_WEBHOOK_URL", None)
+    test_webhook_url = "https://discord.com/api/webhooks/123456789/example"
 
-        # 設定測試用的環境變數
-        self.test_webhook_url = "https://discord.com/api/webhooks/test/example"
-        os.environ["DISCORD_WEBHOOK_URL"] = self.test_webhook_url
-        os.environ["LOG_LEVEL"] = "DEBUG"
-        os.environ["SCHEDULE_TIME"] = "09:00"
+    @classmethod
+    def setUpClass(cls):
+        """建立各測試共用的Discord客戶端（發送之間不保留狀態）"""
+        cls.discord_client = DiscordClient(cls.test_webhook_url)
 
-    def tearDown(self):
-        """測試後清理"""
-        # 清理測試環境變數
-        test_vars = ["DISCORD_WEBHOOK_URL", "LOG_LEVEL", "SCHEDULE_TIME"]
-        for var in test_vars:
-            os.environ.pop(var, None)
+    @classmethod
+    def tearDownClass(cls):
+        """關閉共用的Discord客戶端"""
+        cls.discord_client.close()
+
+    def setUp(self):
+        """測試前準備"""
+        self.test_dir = make_temp_dir(self.addCleanup)
+
+        # 設定測試用的環境變數（測試結束後自動還原）
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "DISCORD_WEBHOOK_URL": self.test_webhook_url,
+                "LOG_LEVEL": "DEBUG",
+                "SCHEDULE_TIME": "09:00",
+                "LOGS_DIR": os.path.join(self.test_dir, "logs"),
+                "IP_HISTORY_FILE": self._temp_history_file(),
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+
+    def _temp_history_file(self) -> str:
+        """取得此測試專用的歷史檔案路徑"""
+        return os.path.join(self.test_dir, "ip_history.json")
+
+    def _temp_ip_config(self) -> dict:
+        """取得歷史記錄都寫入此測試專用路徑的IP檢測器設定"""
+        return {
+            "history_file": os.path.join(self.test_dir, "legacy_ip_history.jsonl"),
+            "ip_history_file": self._temp_history_file(),
+        }
 
     def test_config_logger_integration(self):
         """測試設定管理器與日誌系統整合"""
@@ -70,55 +102,54 @@ class TestFullIntegration(unittest.TestCase):
 
         print("  ✅ 設定與日誌整合測試通過")
 
-    @patch("src.ip_detector.requests.get")
+    @patch("requests.Session.get")
     def test_ip_detection_integration(self, mock_get):
         """測試IP檢測與其他模組整合（新版智能檢測）"""
         print("🧪 測試IP檢測整合...")
 
         # 模擬網路回應
-        mock_response = MagicMock()
-        mock_response.text = "203.0.113.1"
-        mock_response.status_code = 200
+        mock_response = make_mock_response(200, b"203.0.113.1")
         mock_get.return_value = mock_response
 
         # 建立配置
         config = ConfigManager()
 
         # 測試新的IP檢測方法
-        ip_detector = IPDetector()
+        ip_detector = IPDetector(self._temp_ip_config())
+        self.addCleanup(ip_detector.close)
 
-        # 測試不同模式
+        # 測試不同模式（各模式以 subTest 獨立回報失敗）
         test_modes = ["scheduled", "manual", "test"]
         for mode in test_modes:
-            ip_result = ip_detector.check_ip_with_history(mode)
+            with self.subTest(mode=mode):
+                ip_result = ip_detector.check_ip_with_history(mode)
 
-            self.assertIsNone(ip_result.get("error"))
-            self.assertIn("local_ip", ip_result)
-            self.assertIn("public_ip", ip_result)
-            self.assertIn("has_changed", ip_result)
-            self.assertIn("should_notify", ip_result)
+                self.assertIsNone(ip_result.get("error"))
+                self.assertIn("local_ip", ip_result)
+                self.assertIn("public_ip", ip_result)
+                self.assertIn("has_changed", ip_result)
+                self.assertIn("should_notify", ip_result)
 
-            print(
-                f"  🔧 模式 {mode}: IP={ip_result['public_ip']}, 變化={ip_result['has_changed']}, 通知={ip_result['should_notify']}"
-            )
+                print(
+                    f"  🔧 模式 {mode}: IP={ip_result['public_ip']}, 變化={ip_result['has_changed']}, 通知={ip_result['should_notify']}"
+                )
 
         print("  ✅ IP檢測整合測試通過")
 
-    @patch("src.discord_client.requests.post")
+    @patch("requests.Session.post")
     def test_discord_integration(self, mock_post):
         """測試Discord客戶端整合"""
         print("🧪 測試Discord客戶端整合...")
 
         # 模擬Discord API回應
-        mock_response = MagicMock()
-        mock_response.status_code = 204
+        mock_response = make_mock_response(204)
         mock_post.return_value = mock_response
 
         # 建立配置
         config = ConfigManager()
 
-        # 建立Discord客戶端
-        discord_client = DiscordClient(self.test_webhook_url)
+        # 使用共用的Discord客戶端
+        discord_client = self.discord_client
 
         # 測試連線
         test_result = discord_client.test_connection()
@@ -144,26 +175,24 @@ class TestFullIntegration(unittest.TestCase):
         print(f"  📱 發送訊息: {sent_message}")
         print("  ✅ Discord整合測試通過")
 
-    @patch("src.discord_client.requests.post")
-    @patch("src.ip_detector.requests.get")
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
     def test_scheduler_integration(self, mock_ip_get, mock_discord_post):
         """測試排程系統整合"""
         print("🧪 測試排程系統整合...")
 
         # 模擬IP檢測回應
-        mock_ip_response = MagicMock()
-        mock_ip_response.text = "203.0.113.1"
-        mock_ip_response.status_code = 200
+        mock_ip_response = make_mock_response(200, b"203.0.113.1")
         mock_ip_get.return_value = mock_ip_response
 
         # 模擬Discord回應
-        mock_discord_response = MagicMock()
-        mock_discord_response.status_code = 204
+        mock_discord_response = make_mock_response(204)
         mock_discord_post.return_value = mock_discord_response
 
         # 建立排程管理器
         config = ConfigManager()
         scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
 
         # 測試手動任務
         success = scheduler.manual_task()
@@ -181,21 +210,387 @@ class TestFullIntegration(unittest.TestCase):
         print(f"  💻 系統資源: {status['system_info']}")
         print("  ✅ 排程系統整合測試通過")
 
-    @patch("src.discord_client.requests.post")
-    @patch("src.ip_detector.requests.get")
+    def test_scheduler_next_run_computation(self):
+        """測試 asyncio 排程的下次執行時間計算"""
+        from datetime import datetime, timedelta
+
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+
+        before = datetime(2024, 1, 1, 8, 30)
+        self.assertEqual(
+            scheduler._compute_next_run(before), datetime(2024, 1, 1, 9, 0)
+        )
+
+        after = datetime(2024, 1, 1, 9, 0)
+        self.assertEqual(
+            scheduler._compute_next_run(after),
+            datetime(2024, 1, 1, 9, 0) + timedelta(days=1),
+        )
+
+        # asyncio 模式下狀態畫面使用計算出的下次執行時間
+        scheduler._next_run = datetime(2024, 1, 2, 9, 0)
+        self.assertEqual(
+            scheduler._get_next_scheduled_time(), datetime(2024, 1, 2, 9, 0)
+        )
+
+    def test_scheduler_async_runs_once_per_slot(self):
+        """測試 asyncio 排程分段睡眠，提早喚醒時不會重複執行同一時段"""
+        import asyncio
+        from datetime import datetime, timedelta
+
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+
+        clock = [datetime(2024, 1, 1, 8, 58)]
+        sleeps = []
+
+        class FakeDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock[0]
+
+        async def fake_sleep(delay):
+            # 單調時鐘比牆上時間稍快：每段睡眠提早半秒喚醒
+            sleeps.append(delay)
+            clock[0] += timedelta(seconds=delay - 0.5 if delay > 1 else delay)
+
+        async def no_status():
+            return None
+
+        def run_task():
+            runs.append(clock[0])
+            if len(runs) == 1:
+                # 任務結束時牆上時間仍可能早於排程時間
+                clock[0] = datetime(2024, 1, 1, 8, 59, 59)
+            else:
+                scheduler.is_running = False
+
+        runs = []
+        with patch("scheduler.datetime", FakeDatetime), patch(
+            "scheduler.asyncio.sleep", fake_sleep
+        ), patch.object(scheduler, "_status_loop_async", no_status), patch.object(
+            scheduler, "scheduled_task", side_effect=run_task
+        ), patch.object(
+            scheduler, "_print_daemon_banner"
+        ):
+            asyncio.run(scheduler.start_daemon_async())
+
+        self.assertEqual(len(runs), 2)
+        self.assertGreaterEqual(runs[0], datetime(2024, 1, 1, 9, 0))
+        self.assertGreaterEqual(runs[1], datetime(2024, 1, 2, 9, 0))
+        self.assertLessEqual(max(sleeps), 60.0)
+
+    def test_scheduler_status_redraw_only_on_change(self):
+        """測試狀態畫面只在狀態變化時重繪"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+
+        with patch.object(scheduler, "_display_status") as mock_display:
+            self.assertTrue(scheduler._refresh_status())
+            self.assertFalse(scheduler._refresh_status())
+            self.assertEqual(mock_display.call_count, 1)
+
+            scheduler._add_execution_record("測試", "狀態更新", "成功")
+            self.assertTrue(scheduler._wake.is_set())
+            self.assertTrue(scheduler._refresh_status())
+            self.assertEqual(mock_display.call_count, 2)
+
+    def test_scheduler_wait_for_wake_deadline(self):
+        """測試等待以絕對期限計算，期限已過時立即返回"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+
+        start = time.monotonic()
+        scheduler._wait_for_wake(start - 5)
+        self.assertLess(time.monotonic() - start, 1)
+
+        scheduler._wake.set()
+        scheduler._wait_for_wake(time.monotonic() + 30)
+        self.assertFalse(scheduler._wake.is_set())
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_scheduler_execution_history_capped(self):
+        """測試執行歷史超過上限時捨棄最舊的記錄"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+
+        for i in range(scheduler.max_history + 5):
+            scheduler._add_execution_record("測試", f"動作{i}", "成功")
+
+        self.assertEqual(len(scheduler.execution_history), scheduler.max_history)
+        self.assertEqual(scheduler.execution_history[0].action, "動作5")
+
+    def test_execution_record_str(self):
+        """測試執行記錄的顯示文字"""
+        from datetime import datetime
+        from scheduler import ExecutionRecord
+
+        timestamp = datetime(2024, 1, 1, 9, 5, 30)
+        self.assertEqual(
+            str(ExecutionRecord("排程", "IP檢測", "成功", timestamp=timestamp)),
+            "[09:05:30] ✅ 排程 - IP檢測 → 成功",
+        )
+        self.assertEqual(
+            str(
+                ExecutionRecord(
+                    "手動", "Discord通知", "Discord發送失敗", timestamp=timestamp
+                )
+            ),
+            "[09:05:30] ❌ 手動 - Discord通知 → Discord發送失敗",
+        )
+        self.assertEqual(
+            str(ExecutionRecord("排程", "IP變化檢測", "IP無變化", timestamp=timestamp)),
+            "[09:05:30] ℹ️ 排程 - IP變化檢測 → IP無變化",
+        )
+
+    def test_scheduler_status_written_once(self):
+        """測試狀態畫面（含清除螢幕）以單次寫入輸出"""
+        from scheduler import CLEAR_SCREEN
+
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+        scheduler._add_execution_record("測試", "IP檢測", "成功")
+
+        with patch("sys.stdout") as mock_stdout:
+            scheduler._display_status()
+
+        mock_stdout.write.assert_called_once()
+        frame = mock_stdout.write.call_args[0][0]
+        self.assertTrue(frame.startswith(CLEAR_SCREEN))
+        self.assertIn("📋 執行歷史:", frame)
+        self.assertIn("測試 - IP檢測 → 成功", frame)
+
+    def test_scheduler_history_block_cached(self):
+        """測試執行歷史顯示文字只在新增記錄後重新組合"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+
+        self.assertEqual(scheduler._get_history_block(), "  暫無執行記錄")
+        for i in range(12):
+            scheduler._add_execution_record("測試", f"動作{i}", "成功")
+
+        block = scheduler._get_history_block()
+        self.assertIs(scheduler._get_history_block(), block)
+        lines = block.split("\n")
+        self.assertEqual(len(lines), 10)
+        self.assertIn("動作2 →", lines[0])
+        self.assertIn("動作11 →", lines[-1])
+
+        scheduler._add_execution_record("測試", "新動作", "成功")
+        self.assertIn("新動作", scheduler._get_history_block())
+
+    def test_scheduler_next_run_countdown(self):
+        """測試下次執行倒數的顯示文字"""
+        from datetime import datetime, timedelta
+
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+        next_run = (
+            datetime.now() + timedelta(hours=2, minutes=30, seconds=30)
+        ).replace(microsecond=0)
+        scheduler._next_run = next_run
+
+        frame = scheduler._render_status()
+        self.assertIn(
+            f"⏳ 下次執行: {next_run.strftime('%Y-%m-%d %H:%M:%S')} (2小時30分鐘後)",
+            frame,
+        )
+
+        scheduler._next_run = datetime.now() - timedelta(seconds=1)
+        self.assertIn("⏳ 下次執行: 即將執行...", scheduler._render_status())
+
+    def test_scheduler_next_run_cached(self):
+        """測試 schedule 模式的下次執行時間在到達前不重新查詢"""
+        from datetime import datetime, timedelta
+
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+        job = MagicMock(next_run=datetime.now() + timedelta(hours=1))
+
+        mock_schedule = MagicMock()
+        with patch.dict(sys.modules, {"schedule": mock_schedule}):
+            mock_schedule.jobs = [job]
+            first = scheduler._get_next_scheduled_time()
+            mock_schedule.jobs = []
+            self.assertEqual(scheduler._get_next_scheduled_time(), first)
+
+            # 排程時間已過時重新查詢
+            scheduler._next_run_cache = datetime.now() - timedelta(seconds=1)
+            self.assertIsNone(scheduler._get_next_scheduled_time())
+
+    def test_scheduled_notification_sent_by_worker(self):
+        """測試排程模式的Discord通知由背景執行緒發送"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+        ip_result = {
+            "public_ip": "203.0.113.1",
+            "local_ip": "192.168.1.100",
+            "has_changed": True,
+            "should_notify": True,
+        }
+        caller_threads = []
+
+        def fake_send(current_ips):
+            caller_threads.append(threading.current_thread())
+            return True
+
+        with patch.object(
+            scheduler.ip_detector, "check_ip_with_history", return_value=ip_result
+        ), patch.object(
+            scheduler.discord_client,
+            "send_minecraft_server_notification",
+            side_effect=fake_send,
+        ):
+            self.assertEqual(
+                scheduler._execute_ip_check("排程"), (True, ip_result["public_ip"])
+            )
+            results = [r.result for r in scheduler.execution_history]
+            self.assertIn("已排入發送佇列", results)
+
+            scheduler._drain_send_queue()
+
+        self.assertEqual(len(caller_threads), 1)
+        self.assertIsNot(caller_threads[0], threading.current_thread())
+        results = [r.result for r in scheduler.execution_history]
+        self.assertIn("Discord發送成功", results)
+        # 任務完成記錄在通知送出後才寫入
+        last = scheduler.execution_history[-1]
+        self.assertEqual((last.action, last.result), ("任務完成", "成功"))
+
+    def test_queued_notification_failure_fails_task(self):
+        """測試排程通知發送失敗時，任務最終記錄為失敗"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+        ip_result = {
+            "public_ip": "203.0.113.1",
+            "local_ip": "192.168.1.100",
+            "has_changed": True,
+            "should_notify": True,
+        }
+
+        with patch.object(
+            scheduler.ip_detector, "check_ip_with_history", return_value=ip_result
+        ), patch.object(
+            scheduler.discord_client,
+            "send_minecraft_server_notification",
+            return_value=False,
+        ), patch.object(
+            scheduler.scheduler_logger, "error"
+        ) as mock_error:
+            scheduler.scheduled_task()
+            scheduler._drain_send_queue()
+
+        task_results = [
+            r.result for r in scheduler.execution_history if r.action == "任務完成"
+        ]
+        self.assertEqual(task_results, ["失敗"])
+        mock_error.assert_called_once()
+
+    def test_queued_notifications_coalesced(self):
+        """測試佇列中累積的Discord通知只發送最新的一筆"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+        for ip in ("203.0.113.1", "203.0.113.2", "203.0.113.3"):
+            scheduler._send_queue.put({"ips": {"public_ip": ip}, "mode": "排程"})
+        scheduler._send_queue.put(None)
+
+        with patch.object(
+            scheduler, "_send_notification", return_value=True
+        ) as mock_send:
+            scheduler._send_worker()
+
+        mock_send.assert_called_once_with({"public_ip": "203.0.113.3"}, "排程")
+        self.assertEqual(scheduler._send_queue.unfinished_tasks, 0)
+
+        # 被合併而未發送的通知，其任務記錄為失敗
+        task_results = [
+            r.result for r in scheduler.execution_history if r.action == "任務完成"
+        ]
+        self.assertEqual(task_results, ["失敗", "失敗", "成功"])
+
+    def test_test_task_checks_ip_once(self):
+        """測試 test_task 只檢測一次IP並直接記錄檢測結果"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+        ip_result = {
+            "public_ip": "203.0.113.1",
+            "local_ip": "192.168.1.100",
+            "has_changed": False,
+            "should_notify": False,
+        }
+
+        with patch.object(
+            scheduler.ip_detector, "check_ip_with_history", return_value=ip_result
+        ) as mock_check, patch.object(
+            scheduler.log_manager, "log_test_execution"
+        ) as mock_log:
+            self.assertTrue(scheduler.test_task())
+
+        self.assertEqual(mock_check.call_count, 1)
+        mock_log.assert_called_once_with("203.0.113.1")
+        self.assertTrue(scheduler._exec_done.is_set())
+
+    def test_scheduler_system_info_cached(self):
+        """測試系統資源使用量在快取時間內不重複讀取"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+
+        with patch.object(
+            scheduler.process, "memory_info", wraps=scheduler.process.memory_info
+        ) as mock_memory:
+            first = scheduler._get_system_info()
+            second = scheduler._get_system_info()
+            self.assertEqual(mock_memory.call_count, 1)
+            self.assertEqual(first["memory"], second["memory"])
+
+            scheduler._sysinfo_ts -= 10
+            scheduler._get_system_info()
+            self.assertEqual(mock_memory.call_count, 2)
+
+            # 執行任務時使用較短的快取時間
+            scheduler._sysinfo_ts -= 2
+            scheduler._get_system_info()
+            self.assertEqual(mock_memory.call_count, 2)
+            scheduler.is_executing = True
+            scheduler._get_system_info()
+            self.assertEqual(mock_memory.call_count, 3)
+
+    def test_scheduler_uptime_format(self):
+        """測試運行時間以單調時鐘計算並格式化為 h:mm:ss"""
+        config = ConfigManager()
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
+
+        scheduler._start_mono -= 26 * 3600 + 3 * 60 + 4
+        self.assertEqual(scheduler._get_system_info()["uptime"], "26:03:04")
+
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
     def test_end_to_end_workflow(self, mock_ip_get, mock_discord_post):
         """測試端到端工作流程"""
         print("🧪 測試端到端工作流程...")
 
         # 模擬IP檢測回應
-        mock_ip_response = MagicMock()
-        mock_ip_response.text = "36.230.8.13"  # 使用真實的公共IP
-        mock_ip_response.status_code = 200
+        mock_ip_response = make_mock_response(200, b"36.230.8.13")  # 使用真實的公共IP
         mock_ip_get.return_value = mock_ip_response
 
         # 模擬Discord回應
-        mock_discord_response = MagicMock()
-        mock_discord_response.status_code = 204
+        mock_discord_response = make_mock_response(204)
         mock_discord_post.return_value = mock_discord_response
 
         # 步驟1: 初始化所有組件
@@ -203,10 +598,12 @@ class TestFullIntegration(unittest.TestCase):
         config = ConfigManager()
         log_manager = LoggerManager(config)
         scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
 
         # 步驟2: 執行IP檢測
         print("  🌐 步驟2: 執行IP檢測...")
-        ip_detector = IPDetector()
+        ip_detector = IPDetector(self._temp_ip_config())
+        self.addCleanup(ip_detector.close)
         ip_result = ip_detector.check_and_update()
         self.assertTrue(ip_result["success"])
 
@@ -216,10 +613,10 @@ class TestFullIntegration(unittest.TestCase):
 
         # 步驟3: 發送Discord通知
         print("  📱 步驟3: 發送Discord通知...")
-        webhook_url = config.get("discord", "webhook_url")
-        discord_client = DiscordClient(webhook_url)
-
-        send_result = discord_client.send_minecraft_server_notification(current_ips)
+        self.assertEqual(config.get("discord", "webhook_url"), self.test_webhook_url)
+        send_result = self.discord_client.send_minecraft_server_notification(
+            current_ips
+        )
         self.assertTrue(send_result)
 
         # 步驟4: 記錄執行結果
@@ -242,39 +639,33 @@ class TestFullIntegration(unittest.TestCase):
         with self.assertRaises(ValueError):
             DiscordClient("invalid_url")
 
-        # 測試缺少環境變數
+        # 測試缺少環境變數（setUp 的 patch.dict 會在測試結束後還原）
         os.environ.pop("DISCORD_WEBHOOK_URL", None)
 
-        try:
-            from config import ConfigError
+        from config import ConfigError
 
-            with self.assertRaises(ConfigError):
-                ConfigManager()
-        finally:
-            # 恢復環境變數
-            os.environ["DISCORD_WEBHOOK_URL"] = self.test_webhook_url
+        with self.assertRaises(ConfigError):
+            ConfigManager()
 
         print("  ✅ 錯誤處理整合測試通過")
 
-    @patch("src.discord_client.requests.post")
-    @patch("src.ip_detector.requests.get")
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
     def test_minecraft_server_notification_format(self, mock_ip_get, mock_discord_post):
         """測試Minecraft伺服器通知格式"""
         print("🧪 測試Minecraft伺服器通知格式...")
 
         # 模擬回應
-        mock_ip_response = MagicMock()
-        mock_ip_response.text = "36.230.8.13"
-        mock_ip_response.status_code = 200
+        mock_ip_response = make_mock_response(200, b"36.230.8.13")
         mock_ip_get.return_value = mock_ip_response
 
-        mock_discord_response = MagicMock()
-        mock_discord_response.status_code = 204
+        mock_discord_response = make_mock_response(204)
         mock_discord_post.return_value = mock_discord_response
 
         # 執行完整流程
         config = ConfigManager()
         scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
         success = scheduler.manual_task()
 
         self.assertTrue(success)
@@ -295,206 +686,190 @@ class TestFullIntegration(unittest.TestCase):
         print(f"  🎮 Minecraft通知格式: {sent_message}")
         print("  ✅ Minecraft通知格式測試通過")
 
-    @patch("src.ip_detector.requests.get")
+    @patch("requests.Session.get")
     def test_ip_change_detection_logic(self, mock_get):
         """測試IP變化檢測邏輯（新版智能檢測）"""
         print("🧪 測試IP變化檢測邏輯...")
 
-        import tempfile
-        import os
-
-        # 創建臨時歷史檔案
-        with tempfile.TemporaryDirectory() as temp_dir:
-            history_file = os.path.join(temp_dir, "test_history.json")
-
-            # 模擬不同的IP回應
-            ip_responses = ["203.0.113.1", "203.0.113.1", "203.0.113.2"]
-            response_index = [0]  # 使用列表來在nested function中修改
+        # 臨時歷史檔案
+        history_file = self._temp_history_file()
 
-            def mock_get_side_effect(*args, **kwargs):
-                mock_response = MagicMock()
-                mock_response.text = ip_responses[response_index[0] % len(ip_responses)]
-                mock_response.status_code = 200
-                response_index[0] += 1
-                return mock_response
+        # 模擬不同的IP回應（每次檢測依序取用一個回應）
+        mock_get.side_effect = [
+            make_mock_response(200, ip)
+            for ip in (b"203.0.113.1", b"203.0.113.1", b"203.0.113.2")
+        ]
 
-            mock_get.side_effect = mock_get_side_effect
-
-            # 建立配置，指定歷史檔案路徑
-            config = ConfigManager()
-            ip_config = config.get_ip_config()
-            ip_config["ip_history_file"] = history_file
-
-            # 測試IP檢測器
-            ip_detector = IPDetector(ip_config)
-
-            # 第一次檢測：首次執行，應該發送通知
-            result1 = ip_detector.check_ip_with_history("scheduled")
-            self.assertTrue(result1["has_changed"])  # 首次算變化
-            self.assertTrue(result1["should_notify"])  # 排程模式首次變化應通知
-            self.assertEqual(result1["public_ip"], "203.0.113.1")
-
-            # 第二次檢測：相同IP，排程模式不應發送通知
-            result2 = ip_detector.check_ip_with_history("scheduled")
-            self.assertFalse(result2["has_changed"])  # IP無變化
-            self.assertFalse(result2["should_notify"])  # 排程模式無變化不通知
-            self.assertEqual(result2["public_ip"], "203.0.113.1")
-
-            # 第三次檢測：IP變化，排程模式應發送通知
-            result3 = ip_detector.check_ip_with_history("scheduled")
-            self.assertTrue(result3["has_changed"])  # IP有變化
-            self.assertTrue(result3["should_notify"])  # 排程模式有變化應通知
-            self.assertEqual(result3["public_ip"], "203.0.113.2")
-
-            print(
-                f"  🔄 第一次檢測: IP={result1['public_ip']}, 變化={result1['has_changed']}, 通知={result1['should_notify']}"
-            )
-            print(
-                f"  🔄 第二次檢測: IP={result2['public_ip']}, 變化={result2['has_changed']}, 通知={result2['should_notify']}"
-            )
-            print(
-                f"  🔄 第三次檢測: IP={result3['public_ip']}, 變化={result3['has_changed']}, 通知={result3['should_notify']}"
-            )
+        # 建立配置，指定歷史檔案路徑
+        config = ConfigManager()
+        ip_config = dict(config.get_ip_config())
+        ip_config["ip_history_file"] = history_file
+
+        # 測試IP檢測器
+        ip_detector = IPDetector(ip_config)
+        self.addCleanup(ip_detector.close)
+
+        # 第一次檢測：首次執行，應該發送通知
+        result1 = ip_detector.check_ip_with_history("scheduled")
+        self.assertTrue(result1["has_changed"])  # 首次算變化
+        self.assertTrue(result1["should_notify"])  # 排程模式首次變化應通知
+        self.assertEqual(result1["public_ip"], "203.0.113.1")
+
+        # 第二次檢測：相同IP，排程模式不應發送通知
+        result2 = ip_detector.check_ip_with_history("scheduled")
+        self.assertFalse(result2["has_changed"])  # IP無變化
+        self.assertFalse(result2["should_notify"])  # 排程模式無變化不通知
+        self.assertEqual(result2["public_ip"], "203.0.113.1")
+
+        # 第三次檢測：IP變化，排程模式應發送通知
+        result3 = ip_detector.check_ip_with_history("scheduled")
+        self.assertTrue(result3["has_changed"])  # IP有變化
+        self.assertTrue(result3["should_notify"])  # 排程模式有變化應通知
+        self.assertEqual(result3["public_ip"], "203.0.113.2")
+
+        print(
+            f"  🔄 第一次檢測: IP={result1['public_ip']}, 變化={result1['has_changed']}, 通知={result1['should_notify']}"
+        )
+        print(
+            f"  🔄 第二次檢測: IP={result2['public_ip']}, 變化={result2['has_changed']}, 通知={result2['should_notify']}"
+        )
+        print(
+            f"  🔄 第三次檢測: IP={result3['public_ip']}, 變化={result3['has_changed']}, 通知={result3['should_notify']}"
+        )
 
         print("  ✅ IP變化檢測邏輯測試通過")
 
-    @patch("src.discord_client.requests.post")
-    @patch("src.ip_detector.requests.get")
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
     def test_manual_vs_scheduled_mode_behavior(self, mock_ip_get, mock_discord_post):
         """測試手動模式與排程模式的不同行為"""
         print("🧪 測試手動模式與排程模式行為差異...")
 
-        import tempfile
-        import os
+        # 臨時歷史檔案
+        history_file = self._temp_history_file()
 
-        # 創建臨時歷史檔案
-        with tempfile.TemporaryDirectory() as temp_dir:
-            history_file = os.path.join(temp_dir, "mode_test_history.json")
+        # 模擬相同的IP回應（模擬IP無變化情況）
+        mock_ip_response = make_mock_response(200, b"203.0.113.1")
+        mock_ip_get.return_value = mock_ip_response
 
-            # 模擬相同的IP回應（模擬IP無變化情況）
-            mock_ip_response = MagicMock()
-            mock_ip_response.text = "203.0.113.1"
-            mock_ip_response.status_code = 200
-            mock_ip_get.return_value = mock_ip_response
+        # 模擬Discord成功回應
+        mock_discord_response = make_mock_response(204)
+        mock_discord_post.return_value = mock_discord_response
 
-            # 模擬Discord成功回應
-            mock_discord_response = MagicMock()
-            mock_discord_response.status_code = 204
-            mock_discord_post.return_value = mock_discord_response
+        # 模擬已有IP記錄的情況（直接寫入初始歷史，不必執行一次完整的檢測）
+        history_manager = IPHistoryManager(history_file)
+        history_manager.record_ip_check(
+            {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}, "test", False
+        )
+        history_manager.close()
 
-            # 建立配置
+        # 建立配置與排程管理器，使用上面的歷史檔案
+        with patch.dict(os.environ, {"IP_HISTORY_FILE": history_file}):
             config = ConfigManager()
-            ip_config = config.get_ip_config()
-            ip_config["ip_history_file"] = history_file
-
-            # 建立排程管理器
-            scheduler = SchedulerManager(config)
-
-            # 模擬已有IP記錄的情況（先執行一次建立歷史）
-            scheduler.test_task()  # 建立初始歷史記錄
-            mock_discord_post.reset_mock()  # 重置mock以便後續檢查
+        scheduler = SchedulerManager(config)
+        self.addCleanup(scheduler.ip_detector.close)
 
-            # 測試排程模式：IP無變化時不應發送
-            print("  🔄 測試排程模式（IP無變化）...")
-            scheduled_success = scheduler.scheduled_task()
+        # 測試排程模式：IP無變化時不應發送
+        print("  🔄 測試排程模式（IP無變化）...")
+        scheduled_success = scheduler.scheduled_task()
+        scheduler._drain_send_queue()
 
-            # 檢查排程模式下是否跳過了Discord發送
-            # 由於IP無變化，排程模式不應該調用Discord API
-            print(f"    Discord API 被調用次數: {mock_discord_post.call_count}")
+        # 檢查排程模式下是否跳過了Discord發送
+        # 由於IP無變化，排程模式不應該調用Discord API
+        self.assertFalse(mock_discord_post.called, "排程模式IP無變化時不應發送")
+        print(f"    Discord API 被調用次數: {mock_discord_post.call_count}")
 
-            # 重置mock
-            mock_discord_post.reset_mock()
+        # 重置mock
+        mock_discord_post.reset_mock()
 
-            # 測試手動模式：即使IP無變化也應發送
-            print("  🔧 測試手動模式（IP無變化）...")
-            manual_success = scheduler.manual_task()
+        # 測試手動模式：即使IP無變化也應發送
+        print("  🔧 測試手動模式（IP無變化）...")
+        manual_success = scheduler.manual_task()
 
-            # 檢查手動模式下是否調用了Discord API
-            self.assertTrue(mock_discord_post.called, "手動模式應該總是發送Discord通知")
-            print(f"    Discord API 被調用次數: {mock_discord_post.call_count}")
+        # 檢查手動模式下是否調用了Discord API
+        self.assertTrue(mock_discord_post.called, "手動模式應該總是發送Discord通知")
+        print(f"    Discord API 被調用次數: {mock_discord_post.call_count}")
 
-            # 驗證發送的訊息格式
-            call_args = mock_discord_post.call_args
-            sent_message = call_args[1]["json"]["content"]
-            expected_format = "Minecraft Server IP Updated: 203.0.113.1:25565"
-            self.assertEqual(sent_message, expected_format)
+        # 驗證發送的訊息格式
+        call_args = mock_discord_post.call_args
+        sent_message = call_args[1]["json"]["content"]
+        expected_format = "Minecraft Server IP Updated: 203.0.113.1:25565"
+        self.assertEqual(sent_message, expected_format)
 
-            print(f"  📱 手動模式發送訊息: {sent_message}")
+        print(f"  📱 手動模式發送訊息: {sent_message}")
 
         print("  ✅ 模式行為差異測試通過")
 
-    @patch("src.ip_detector.requests.get")
+    @patch("requests.Session.get")
     def test_ip_history_persistence(self, mock_get):
         """測試IP歷史記錄持久化"""
         print("🧪 測試IP歷史記錄持久化...")
 
-        import tempfile
-        import os
         import json
 
-        # 創建臨時歷史檔案
-        with tempfile.TemporaryDirectory() as temp_dir:
-            history_file = os.path.join(temp_dir, "persistence_test.json")
-
-            # 模擬IP回應
-            mock_response = MagicMock()
-            mock_response.text = "203.0.113.1"
-            mock_response.status_code = 200
-            mock_get.return_value = mock_response
-
-            # 建立配置
-            config = ConfigManager()
-            ip_config = config.get_ip_config()
-            ip_config["ip_history_file"] = history_file
+        # 臨時歷史檔案
+        history_file = self._temp_history_file()
 
-            # 第一個IP檢測器實例
-            ip_detector1 = IPDetector(ip_config)
-            result1 = ip_detector1.check_ip_with_history("manual")
-
-            # 檢查歷史檔案是否被創建
-            self.assertTrue(os.path.exists(history_file))
-
-            # 讀取歷史檔案內容
-            with open(history_file, "r", encoding="utf-8") as f:
-                history_data = json.load(f)
-
-            # 驗證歷史記錄結構
-            self.assertIn("metadata", history_data)
-            self.assertIn("current", history_data)
-            self.assertIn("statistics", history_data)
-            self.assertIn("history", history_data)
-
-            # 驗證記錄內容
-            self.assertEqual(history_data["current"]["public_ip"], "203.0.113.1")
-            self.assertEqual(history_data["metadata"]["total_checks"], 1)
-            self.assertEqual(len(history_data["history"]), 1)
-
-            # 創建第二個IP檢測器實例（模擬重啟）
-            ip_detector2 = IPDetector(ip_config)
-
-            # 驗證歷史記錄被正確載入
-            last_ip = ip_detector2.history_manager.get_last_public_ip()
-            self.assertEqual(last_ip, "203.0.113.1")
-
-            # 模擬IP變化
-            mock_response.text = "203.0.113.2"
-            result2 = ip_detector2.check_ip_with_history("scheduled")
-
-            # 驗證變化被正確檢測
-            self.assertTrue(result2["has_changed"])
-            self.assertEqual(result2["public_ip"], "203.0.113.2")
-
-            # 再次讀取歷史檔案，驗證更新
-            with open(history_file, "r", encoding="utf-8") as f:
-                updated_history = json.load(f)
-
-            self.assertEqual(updated_history["current"]["public_ip"], "203.0.113.2")
-            self.assertEqual(updated_history["metadata"]["total_checks"], 2)
-            self.assertEqual(len(updated_history["history"]), 2)
+        # 模擬IP回應
+        mock_response = make_mock_response(200, b"203.0.113.1")
+        mock_get.return_value = mock_response
 
-            print(f"  💾 第一次記錄: {history_data['current']['public_ip']}")
-            print(f"  💾 第二次記錄: {updated_history['current']['public_ip']}")
-            print(f"  📊 總檢測次數: {updated_history['metadata']['total_checks']}")
+        # 建立配置
+        config = ConfigManager()
+        ip_config = dict(config.get_ip_config())
+        ip_config["ip_history_file"] = history_file
+
+        # 第一個IP檢測器實例
+        ip_detector1 = IPDetector(ip_config)
+        self.addCleanup(ip_detector1.close)
+        result1 = ip_detector1.check_ip_with_history("manual")
+        # 結束時寫入尚未保存的批次記錄
+        ip_detector1.close()
+
+        # 檢查歷史檔案是否被創建
+        self.assertTrue(os.path.exists(history_file))
+
+        # 創建第二個IP檢測器實例（模擬重啟）
+        ip_detector2 = IPDetector(ip_config)
+        self.addCleanup(ip_detector2.close)
+
+        # 驗證歷史記錄被正確載入（重啟後的記憶體狀態即來自檔案內容）
+        last_ip = ip_detector2.history_manager.get_last_public_ip()
+        self.assertEqual(last_ip, "203.0.113.1")
+
+        history_stats = ip_detector2.history_manager.get_history_stats()
+        self.assertEqual(history_stats["current_status"]["public_ip"], "203.0.113.1")
+        self.assertEqual(history_stats["metadata"]["total_checks"], 1)
+        self.assertEqual(history_stats["total_history_records"], 1)
+
+        # 模擬IP變化
+        mock_response.raw.read.return_value = b"203.0.113.2"
+        result2 = ip_detector2.check_ip_with_history("scheduled")
+        ip_detector2.close()
+
+        # 驗證變化被正確檢測
+        self.assertTrue(result2["has_changed"])
+        self.assertEqual(result2["public_ip"], "203.0.113.2")
+
+        # 讀取歷史檔案內容（狀態檔 + JSON Lines 事件記錄檔），驗證寫入結果
+        records_file = history_file + ".records.jsonl"
+        with open(history_file, "r", encoding="utf-8") as f:
+            updated_history = json.load(f)
+        with open(records_file, "r", encoding="utf-8") as f:
+            updated_records = [json.loads(line) for line in f]
+
+        # 驗證歷史記錄結構
+        self.assertIn("metadata", updated_history)
+        self.assertIn("current", updated_history)
+        self.assertIn("statistics", updated_history)
+
+        self.assertEqual(updated_history["current"]["public_ip"], "203.0.113.2")
+        self.assertEqual(updated_history["metadata"]["total_checks"], 2)
+        self.assertEqual(len(updated_records), 2)
+
+        print(f"  💾 第一次記錄: {history_stats['current_status']['public_ip']}")
+        print(f"  💾 第二次記錄: {updated_history['current']['public_ip']}")
+        print(f"  📊 總檢測次數: {updated_history['metadata']['total_checks']}")
 
         print("  ✅ IP歷史記錄持久化測試通過")
 
@@ -504,40 +879,39 @@ class TestMainApplication(unittest.TestCase):
 
     def setUp(self):
         """測試前準備"""
-        self.test_webhook_url = "https://discord.com/api/webhooks/test/example"
-        os.environ["DISCORD_WEBHOOK_URL"] = self.test_webhook_url
-
-    def tearDown(self):
-        """測試後清理"""
-        os.environ.pop("DISCORD_WEBHOOK_URL", None)
-
-    @patch("src.discord_client.requests.post")
-    @patch("src.ip_detector.requests.get")
+        self.test_webhook_url = "https://discord.com/api/webhooks/123456789/example"
+        self.test_dir = make_temp_dir(self.addCleanup)
+        env_patcher = patch.dict(
+            os.environ,
+            {
+                "DISCORD_WEBHOOK_URL": self.test_webhook_url,
+                "LOGS_DIR": os.path.join(self.test_dir, "logs"),
+                "IP_HISTORY_FILE": os.path.join(self.test_dir, "ip_history.json"),
+            },
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
     def test_main_application_manual_mode(self, mock_ip_get, mock_discord_post):
         """測試主應用程式手動模式"""
         print("🧪 測試主應用程式手動模式...")
 
         # 模擬回應
-        mock_ip_response = MagicMock()
-        mock_ip_response.text = "36.230.8.13"
-        mock_ip_response.status_code = 200
+        mock_ip_response = make_mock_response(200, b"36.230.8.13")
         mock_ip_get.return_value = mock_ip_response
 
-        mock_discord_response = MagicMock()
-        mock_discord_response.status_code = 204
+        mock_discord_response = make_mock_response(204)
         mock_discord_post.return_value = mock_discord_response
 
-        # 導入主應用程式
-        main_path = project_root / "main.py"
-        sys.path.insert(0, str(project_root))
-
         try:
-            import main
-
             app = main.IPBotApplication()
+            self.addCleanup(app.close)
 
             # 測試手動模式
             app.run_manual_mode()
+            self.addCleanup(app.scheduler.ip_detector.close)
 
             # 驗證Discord發送
             self.assertTrue(mock_discord_post.called)
@@ -547,18 +921,67 @@ class TestMainApplication(unittest.TestCase):
         except Exception as e:
             self.fail(f"主應用程式測試失敗: {e}")
 
+    @patch("requests.Session.post")
+    @patch("requests.Session.get")
+    def test_component_checks(self, mock_ip_get, mock_discord_post):
+        """測試並行組件檢查"""
+        print("🧪 測試並行組件檢查...")
+
+        mock_ip_response = make_mock_response(200, b"36.230.8.13")
+        mock_ip_get.return_value = mock_ip_response
+
+        mock_discord_response = make_mock_response(204)
+        mock_discord_post.return_value = mock_discord_response
+
+        app = main.IPBotApplication()
+        self.addCleanup(app.close)
+
+        # 全部成功
+        app._run_component_checks()
+
+        # Discord 連線失敗時拋出例外
+        mock_discord_response.status_code = 404
+        with self.assertRaises(main.ComponentCheckError):
+            app._run_component_checks()
+
+        print("  ✅ 並行組件檢查測試通過")
+
+
+def _run_parallel_tests() -> Optional[bool]:
+    """
+    已安裝 pytest-xdist 時以多個行程平行運行整合測試
+
+    每個 worker 是獨立行程，測試中修改的環境變數不會互相影響
+
+    Returns:
+        Optional[bool]: 是否全部通過，未安裝 pytest-xdist 時返回 None
+    """
+    try:
+        import pytest
+        import xdist  # noqa: F401
+    except ImportError:
+        return None
+
+    workers = max(1, (os.cpu_count() or 1) - 2)
+    return pytest.main(["-n", str(workers), "--dist=loadfile", __file__]) == 0
+
 
 def run_integration_tests():
     """運行整合測試"""
     print("🚀 Discord IP Bot - 整合測試開始")
     print("=" * 60)
 
+    parallel_result = _run_parallel_tests()
+    if parallel_result is not None:
+        return parallel_result
+
     # 建立測試套件
     test_suite = unittest.TestSuite()
 
     # 添加測試案例
-    test_suite.addTest(unittest.makeSuite(TestFullIntegration))
-    test_suite.addTest(unittest.makeSuite(TestMainApplication))
+    loader = unittest.TestLoader()
+    test_suite.addTests(loader.loadTestsFromTestCase(TestFullIntegration))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestMainApplication))
 
     # 運行測試
     runner = unittest.TextTestRunner(verbosity=2)
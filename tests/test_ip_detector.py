@@ -12,12 +12,36 @@ from pathlib import Path
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import socket
+from urllib.parse import urlparse
 
 # 添加 src 目錄到 Python 路徑
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
 from ip_detector import IPDetector, NetworkError, IPDetectorError
 
+try:
+    from tests.helpers import make_temp_dir, make_mock_response
+except ImportError:
+    # 直接執行測試檔案時
+    from helpers import make_temp_dir, make_mock_response
+
+
+# 真實網路測試前探測連線的逾時秒數
+NETWORK_PROBE_TIMEOUT = 1.0
+
+
+def _network_available(service_url: str) -> bool:
+    """以單次 TCP 連線探測IP服務是否可達（離線時避免逐一等待重試逾時）"""
+    parsed = urlparse(service_url)
+    try:
+        socket.create_connection(
+            (parsed.hostname, parsed.port or 443), timeout=NETWORK_PROBE_TIMEOUT
+        ).close()
+    except OSError:
+        return False
+    return True
+
 
 class TestIPDetector(unittest.TestCase):
     """IP檢測器測試類別"""
@@ -25,18 +49,16 @@ class TestIPDetector(unittest.TestCase):
     def setUp(self):
         """測試前準備"""
         # 建立臨時目錄用於測試
-        self.test_dir = tempfile.mkdtemp()
+        self.test_dir = make_temp_dir(self.addCleanup)
         self.test_config = {
             "timeout": 5,
             "retry_attempts": 2,
             "retry_delay": 1,
             "history_file": os.path.join(self.test_dir, "test_ip_history.json"),
+            "ip_history_file": os.path.join(self.test_dir, "ip_history.json"),
         }
         self.detector = IPDetector(self.test_config)
-
-    def tearDown(self):
-        """測試後清理"""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+        self.addCleanup(self.detector.close)
 
     def test_init(self):
         """測試初始化"""
@@ -44,32 +66,67 @@ class TestIPDetector(unittest.TestCase):
         self.assertEqual(self.detector.config["timeout"], 5)
         self.assertEqual(self.detector.config["retry_attempts"], 2)
 
-    def test_is_valid_local_ip(self):
-        """測試本地IP驗證"""
-        # 有效的私有IP
-        self.assertTrue(self.detector._is_valid_local_ip("192.168.1.100"))
-        self.assertTrue(self.detector._is_valid_local_ip("10.0.0.1"))
-        self.assertTrue(self.detector._is_valid_local_ip("172.16.0.1"))
-
-        # 無效的IP
-        self.assertFalse(self.detector._is_valid_local_ip("127.0.0.1"))
-        self.assertFalse(self.detector._is_valid_local_ip("0.0.0.0"))
-        self.assertFalse(self.detector._is_valid_local_ip("8.8.8.8"))
-        self.assertFalse(self.detector._is_valid_local_ip("invalid"))
-        self.assertFalse(self.detector._is_valid_local_ip(""))
+    def test_history_manager_shared(self):
+        """測試相同歷史檔案路徑的檢測器共用同一個歷史管理器"""
+        config = dict(
+            self.test_config,
+            ip_history_file=os.path.join(self.test_dir, "shared_history.json"),
+            history_file=os.path.join(self.test_dir, "legacy", "history.jsonl"),
+        )
+        first = IPDetector(config)
+        self.addCleanup(first.close)
+        second = IPDetector(config)
+        self.addCleanup(second.close)
+
+        self.assertIsNotNone(first.history_manager)
+        self.assertIs(first.history_manager, second.history_manager)
+        # 舊版歷史目錄延遲到第一次寫入時才建立
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, "legacy")))
+
+    def test_shared_history_config_mismatch(self):
+        """測試共用歷史管理器的設定不同時：無人使用則重建，仍有人使用則沿用"""
+        config = dict(
+            self.test_config,
+            ip_history_file=os.path.join(self.test_dir, "shared_history.json"),
+            max_records=5,
+            keep_days=1,
+        )
+        first = IPDetector(config)
+        self.addCleanup(first.close)
+
+        larger = dict(config, max_records=500, keep_days=99)
+        with self.assertLogs("ip_detector", level="WARNING"):
+            second = IPDetector(larger)
+        self.addCleanup(second.close)
+        self.assertIs(second.history_manager, first.history_manager)
+
+        first.close()
+        second.close()
+
+        third = IPDetector(larger)
+        self.addCleanup(third.close)
+        self.assertIsNot(third.history_manager, first.history_manager)
+        self.assertEqual(third.history_manager.config["max_records"], 500)
+        self.assertEqual(third.history_manager.config["keep_days"], 99)
+
+    def test_shared_history_closed_by_last_user(self):
+        """測試共用歷史管理器在最後一個檢測器關閉時才關閉"""
+        config = dict(
+            self.test_config,
+            ip_history_file=os.path.join(self.test_dir, "shared_history.json"),
+        )
+        first = IPDetector(config)
+        self.addCleanup(first.close)
+        second = IPDetector(config)
+        self.addCleanup(second.close)
 
-    def test_is_valid_ip_format(self):
-        """測試IP格式驗證"""
-        # 有效格式
-        self.assertTrue(self.detector._is_valid_ip_format("192.168.1.1"))
-        self.assertTrue(self.detector._is_valid_ip_format("8.8.8.8"))
-        self.assertTrue(self.detector._is_valid_ip_format("255.255.255.255"))
-
-        # 無效格式
-        self.assertFalse(self.detector._is_valid_ip_format("256.1.1.1"))
-        self.assertFalse(self.detector._is_valid_ip_format("192.168.1"))
-        self.assertFalse(self.detector._is_valid_ip_format("invalid"))
-        self.assertFalse(self.detector._is_valid_ip_format(""))
+        with patch.object(first.history_manager, "close") as mock_close:
+            first.close()
+            first.close()
+            mock_close.assert_not_called()
+
+            second.close()
+            mock_close.assert_called_once()
 
     def test_get_local_ip(self):
         """測試獲取本地IP"""
@@ -81,20 +138,56 @@ class TestIPDetector(unittest.TestCase):
         except NetworkError as e:
             self.skipTest(f"本地IP獲取失敗，可能是網路環境問題: {e}")
 
-    @patch("requests.get")
+    def test_get_local_ip_cached(self):
+        """測試本地IP在快取時間內不重複偵測"""
+        with patch.object(
+            self.detector, "_get_local_ip_from_interfaces", return_value=None
+        ), patch.object(
+            self.detector, "_detect_local_ip", return_value="192.168.1.50"
+        ) as mock_detect:
+            self.assertEqual(self.detector.get_local_ip(), "192.168.1.50")
+            self.assertEqual(self.detector.get_local_ip(), "192.168.1.50")
+            self.assertEqual(mock_detect.call_count, 1)
+
+            self.detector.config["local_ip_ttl"] = 0
+            self.detector.get_local_ip()
+            self.assertEqual(mock_detect.call_count, 2)
+
+    @patch("ip_detector.psutil")
+    def test_get_local_ip_from_interfaces(self, mock_psutil):
+        """測試從網路介面取得本地IP，多個候選時交給 socket 方法"""
+        import socket
+
+        def addr(ip):
+            return MagicMock(family=socket.AF_INET, address=ip)
+
+        mock_psutil.net_if_stats.return_value = {
+            "lo": MagicMock(isup=True),
+            "eth0": MagicMock(isup=True),
+            "docker0": MagicMock(isup=False),
+        }
+        mock_psutil.net_if_addrs.return_value = {
+            "lo": [addr("127.0.0.1")],
+            "eth0": [addr("192.168.1.20")],
+            "docker0": [addr("172.17.0.1")],
+        }
+        self.assertEqual(self.detector._get_local_ip_from_interfaces(), "192.168.1.20")
+
+        mock_psutil.net_if_stats.return_value["docker0"].isup = True
+        self.assertIsNone(self.detector._get_local_ip_from_interfaces())
+
+    @patch("requests.Session.get")
     def test_get_public_ip_success(self, mock_get):
         """測試獲取公共IP - 成功情況"""
         # 模擬成功響應
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = "203.0.113.1"
+        mock_response = make_mock_response(200, b"203.0.113.1")
         mock_get.return_value = mock_response
 
         public_ip = self.detector.get_public_ip()
         self.assertEqual(public_ip, "203.0.113.1")
         self.assertTrue(mock_get.called)
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_get_public_ip_failure(self, mock_get):
         """測試獲取公共IP - 失敗情況"""
         # 模擬請求失敗
@@ -105,13 +198,41 @@ class TestIPDetector(unittest.TestCase):
         with self.assertRaises(NetworkError):
             self.detector.get_public_ip()
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
+    def test_get_public_ip_oversized_response(self, mock_get):
+        """測試回應內容超過上限時視為失敗"""
+        mock_response = make_mock_response(200, b"203.0.113.1" + b" " * 100)
+        mock_get.return_value = mock_response
+
+        with self.assertRaises(NetworkError):
+            self.detector._fetch_public_ip("https://api.ipify.org")
+        mock_response.close.assert_called_once()
+
+    @patch("requests.Session.get")
+    def test_get_public_ip_race_fallback(self, mock_get):
+        """測試競速查詢 - 第一個服務失敗時採用下一個服務的結果"""
+        import requests
+
+        def fake_get(url, **kwargs):
+            if url == "https://bad.example":
+                raise requests.RequestException("Connection failed")
+            response = make_mock_response(200, b"203.0.113.9")
+            return response
+
+        mock_get.side_effect = fake_get
+        self.detector.config["public_ip_services"] = [
+            "https://bad.example",
+            "https://good.example",
+        ]
+
+        self.assertEqual(self.detector.get_public_ip(), "203.0.113.9")
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch("requests.Session.get")
     def test_get_all_ips(self, mock_get):
         """測試獲取所有IP"""
         # 模擬公共IP請求成功
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = "203.0.113.1"
+        mock_response = make_mock_response(200, b"203.0.113.1")
         mock_get.return_value = mock_response
 
         ips = self.detector.get_all_ips()
@@ -145,6 +266,49 @@ class TestIPDetector(unittest.TestCase):
 
         print("✓ 歷史記錄測試通過")
 
+    def test_history_is_append_only_and_compacted(self):
+        """測試歷史記錄以 JSON Lines 附加並在超過門檻時壓縮"""
+        import ip_detector
+
+        with patch.object(ip_detector, "HISTORY_COMPACT_BYTES", 2048), patch.object(
+            ip_detector, "HISTORY_MAX_RECORDS", 5
+        ):
+            for i in range(50):
+                self.detector.save_ip_history(
+                    {"local_ip": "192.168.1.100", "public_ip": f"203.0.113.{i}"}
+                )
+
+        with open(self.test_config["history_file"], encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertLess(len(records), 50)
+        self.assertEqual(records[-1]["public_ip"], "203.0.113.49")
+        self.assertEqual(
+            self.detector.get_last_ip_record()["public_ip"], "203.0.113.49"
+        )
+
+    def test_legacy_json_history(self):
+        """測試讀取並轉換舊版 JSON 陣列格式的歷史記錄"""
+        legacy = [
+            {"local_ip": "192.168.1.100", "public_ip": "203.0.113.1"},
+            {"local_ip": "192.168.1.100", "public_ip": "203.0.113.2"},
+        ]
+        with open(self.test_config["history_file"], "w", encoding="utf-8") as f:
+            json.dump(legacy, f, indent=2)
+
+        self.assertEqual(self.detector.get_last_ip_record()["public_ip"], "203.0.113.2")
+
+        self.detector.save_ip_history(
+            {"local_ip": "192.168.1.100", "public_ip": "203.0.113.3"}
+        )
+        with open(self.test_config["history_file"], encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(
+            [r["public_ip"] for r in records],
+            ["203.0.113.1", "203.0.113.2", "203.0.113.3"],
+        )
+
     def test_compare_with_last_first_run(self):
         """測試首次執行的IP比較"""
         current_ips = {"local_ip": "192.168.1.100", "public_ip": "203.0.113.1"}
@@ -191,13 +355,11 @@ class TestIPDetector(unittest.TestCase):
 
         print("✓ 有變化比較測試通過")
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_check_and_update_success(self, mock_get):
         """測試完整的檢查和更新流程"""
         # 模擬公共IP請求成功
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = "203.0.113.1"
+        mock_response = make_mock_response(200, b"203.0.113.1")
         mock_get.return_value = mock_response
 
         result = self.detector.check_and_update()
@@ -209,21 +371,98 @@ class TestIPDetector(unittest.TestCase):
 
         print("✓ 完整流程測試通過")
 
+    @patch("requests.Session.get")
+    def test_check_and_update_skips_unchanged(self, mock_get):
+        """測試IP無變化時不寫入歷史記錄，也不重新讀取檔案"""
+        mock_response = make_mock_response(200, b"203.0.113.1")
+        mock_get.return_value = mock_response
+
+        self.detector.check_and_update()
+
+        with patch.object(self.detector, "get_last_ip_record") as mock_read:
+            result = self.detector.check_and_update()
+            mock_read.assert_not_called()
+
+        self.assertFalse(result["comparison"]["changed"])
+        with open(self.test_config["history_file"], encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+
+class TestIPValidation(unittest.TestCase):
+    """IP格式驗證測試（純函式行為，整個類別共用一個檢測器）"""
+
+    @classmethod
+    def setUpClass(cls):
+        """建立共用的IP檢測器"""
+        test_dir = make_temp_dir(cls.addClassCleanup)
+        cls.detector = IPDetector(
+            {
+                "history_file": os.path.join(test_dir, "test_ip_history.json"),
+                "ip_history_file": os.path.join(test_dir, "ip_history.json"),
+            }
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        """關閉共用的IP檢測器"""
+        cls.detector.close()
+
+    def test_is_valid_local_ip(self):
+        """測試本地IP驗證（各案例以 subTest 獨立回報失敗）"""
+        cases = [
+            # 有效的私有IP
+            ("192.168.1.100", True),
+            ("10.0.0.1", True),
+            ("172.16.0.1", True),
+            # 無效的IP
+            ("127.0.0.1", False),
+            ("0.0.0.0", False),
+            ("8.8.8.8", False),
+            ("invalid", False),
+            ("10.0.0.999", False),
+            ("192.168.1", False),
+            ("", False),
+        ]
+        for ip, valid in cases:
+            with self.subTest(ip=ip):
+                self.assertIs(self.detector._is_valid_local_ip(ip), valid)
+
+    def test_is_valid_ip_format(self):
+        """測試IP格式驗證（各案例以 subTest 獨立回報失敗）"""
+        cases = [
+            # 有效格式
+            ("192.168.1.1", True),
+            ("8.8.8.8", True),
+            ("255.255.255.255", True),
+            # 無效格式
+            ("256.1.1.1", False),
+            ("192.168.1", False),
+            ("invalid", False),
+            ("", False),
+        ]
+        for ip, valid in cases:
+            with self.subTest(ip=ip):
+                self.assertIs(self.detector._is_valid_ip_format(ip), valid)
+
 
 class TestIPDetectorIntegration(unittest.TestCase):
     """IP檢測器整合測試（需要真實網路連線）"""
 
     def setUp(self):
         """測試前準備"""
-        self.test_dir = tempfile.mkdtemp()
+        self.test_dir = make_temp_dir(self.addCleanup)
         self.test_config = {
-            "history_file": os.path.join(self.test_dir, "integration_test_history.json")
+            "history_file": os.path.join(
+                self.test_dir, "integration_test_history.json"
+            ),
+            "ip_history_file": os.path.join(self.test_dir, "ip_history.json"),
         }
         self.detector = IPDetector(self.test_config)
+        self.addCleanup(self.detector.close)
 
-    def tearDown(self):
-        """測試後清理"""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+        # 離線時直接跳過，不必等待每個IP服務的重試逾時
+        if not _network_available(self.detector.config["public_ip_services"][0]):
+            self.skipTest("需要網路連線才能執行此測試")
 
     def test_real_ip_detection(self):
         """真實IP檢測測試（需要網路連線）"""
@@ -290,16 +529,25 @@ def run_manual_test():
 
 
 if __name__ == "__main__":
-    print("選擇測試模式:")
-    print("1. 單元測試")
-    print("2. 整合測試")
-    print("3. 手動測試")
-    print("4. 全部測試")
+    # 可直接以參數指定模式（例如 python tests/test_ip_detector.py 1），不需互動輸入
+    if len(sys.argv) > 1:
+        choice = sys.argv[1].strip()
+    else:
+        print("選擇測試模式:")
+        print("1. 單元測試")
+        print("2. 整合測試")
+        print("3. 手動測試")
+        print("4. 全部測試")
 
-    choice = input("請輸入選項 (1-4): ").strip()
+        choice = input("請輸入選項 (1-4): ").strip()
 
     if choice == "1":
-        unittest.main(argv=[""], defaultTest="TestIPDetector", exit=False, verbosity=2)
+        unittest.main(
+            argv=[""],
+            defaultTest=["TestIPDetector", "TestIPValidation"],
+            exit=False,
+            verbosity=2,
+        )
     elif choice == "2":
         unittest.main(
             argv=[""], defaultTest="TestIPDetectorIntegration", exit=False, verbosity=2
@@ -18,7 +18,8 @@ IP歷史管理系統單元測試 - Discord IP Bot
 import sys
 import os
 import json
-import tempfile
+import shutil
+import threading
 import unittest
 from unittest.mock import patch, mock_open
 from datetime import datetime, timezone, timedelta
@@ -32,7 +33,16 @@ from src.ip_history import (
     IPHistoryError,
     IPHistoryFileError,
     IPHistoryValidationError,
+    RECORDS_FILE_SUFFIX,
 )
+from tests.helpers import make_temp_dir
+
+
+def _open_manager(test_case: unittest.TestCase, *args, **kwargs) -> IPHistoryManager:
+    """建立歷史管理器，測試結束時（刪除臨時目錄前）關閉"""
+    manager = IPHistoryManager(*args, **kwargs)
+    test_case.addCleanup(manager.close)
+    return manager
 
 
 class TestIPHistoryManager(unittest.TestCase):
@@ -40,7 +50,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def setUp(self):
         """測試前準備"""
-        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir = make_temp_dir(self.addCleanup)
         self.history_file = os.path.join(self.temp_dir, "test_ip_history.json")
         self.config = {
             "keep_days": 30,
@@ -49,15 +59,9 @@ class TestIPHistoryManager(unittest.TestCase):
             "backup_on_corruption": True,
         }
 
-    def tearDown(self):
-        """測試後清理"""
-        import shutil
-
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
-
     def test_init_new_history_file(self):
         """測試初始化新的歷史檔案"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 檢查檔案是否被創建
         self.assertTrue(Path(self.history_file).exists())
@@ -69,9 +73,11 @@ class TestIPHistoryManager(unittest.TestCase):
         self.assertIn("metadata", data)
         self.assertIn("current", data)
         self.assertIn("statistics", data)
-        self.assertIn("history", data)
+        self.assertNotIn("history", data)
         self.assertEqual(data["metadata"]["total_checks"], 0)
-        self.assertEqual(len(data["history"]), 0)
+
+        # 事件記錄存放在獨立的 JSON Lines 檔案
+        self.assertEqual(manager.records_file.read_bytes(), b"")
 
     def test_init_existing_history_file(self):
         """測試載入現有的歷史檔案"""
@@ -112,7 +118,7 @@ class TestIPHistoryManager(unittest.TestCase):
             json.dump(existing_data, f)
 
         # 載入現有檔案
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 檢查資料是否正確載入
         self.assertEqual(manager.get_last_public_ip(), "203.0.113.1")
@@ -121,7 +127,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_has_ip_changed_first_run(self):
         """測試首次執行時的IP變化檢測"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 首次執行應該視為有變化
         has_changed = manager.has_ip_changed("203.0.113.1")
@@ -129,7 +135,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_has_ip_changed_same_ip(self):
         """測試相同IP的變化檢測"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 記錄第一個IP
         ip_data = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
@@ -141,7 +147,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_has_ip_changed_different_ip(self):
         """測試不同IP的變化檢測"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 記錄第一個IP
         ip_data = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
@@ -153,7 +159,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_record_ip_check_success(self):
         """測試成功記錄IP檢測事件"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         ip_data = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
 
@@ -171,7 +177,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_record_ip_check_with_change(self):
         """測試記錄IP變化事件"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 記錄第一個IP
         ip_data1 = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
@@ -188,7 +194,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_get_history_stats(self):
         """測試獲取歷史統計資訊"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 記錄一些測試資料
         test_data = [
@@ -221,7 +227,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_cleanup_old_records(self):
         """測試清理舊記錄功能"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 創建一些舊記錄
         old_time = datetime.now(timezone.utc) - timedelta(days=35)
@@ -255,9 +261,162 @@ class TestIPHistoryManager(unittest.TestCase):
         stats = manager.get_history_stats()
         self.assertEqual(stats["total_history_records"], 1)
 
+    def test_flush_only_when_dirty(self):
+        """測試 flush 只在有未保存變更時寫入檔案"""
+        manager = _open_manager(self, self.history_file, self.config)
+
+        with patch.object(manager, "_save_state") as mock_save:
+            self.assertTrue(manager.flush())
+            mock_save.assert_not_called()
+
+            manager._dirty = True
+            manager.flush()
+            mock_save.assert_called_once()
+
+    def test_jsonl_history_path_keeps_separate_records_file(self):
+        """測試狀態檔名稱為 .jsonl 時，記錄檔不會與狀態檔同名"""
+        history_file = os.path.join(self.temp_dir, "ip_history.jsonl")
+        manager = _open_manager(self, history_file, self.config)
+        self.assertNotEqual(manager.records_file, manager.history_file)
+
+        for ip in ["203.0.113.1", "203.0.113.2"]:
+            manager.record_ip_check(
+                {"public_ip": ip, "local_ip": "192.168.1.100"}, "manual", True
+            )
+        manager.close()
+
+        # 狀態檔仍為完整的 JSON，記錄檔每行一筆
+        with open(history_file, "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["current"]["public_ip"], "203.0.113.2")
+        self.assertEqual(len(manager.records_file.read_bytes().splitlines()), 2)
+
+        reloaded = _open_manager(self, history_file, self.config)
+        self.assertEqual(reloaded.get_history_stats()["total_history_records"], 2)
+
+    def test_record_appends_to_records_file(self):
+        """測試記錄檢測事件只附加一行，不重寫事件記錄檔"""
+        manager = _open_manager(self, self.history_file, self.config)
+
+        with patch.object(manager, "save_history") as mock_save:
+            for ip in ["203.0.113.1", "203.0.113.2"]:
+                manager.record_ip_check(
+                    {"public_ip": ip, "local_ip": "192.168.1.100"}, "manual", True
+                )
+            mock_save.assert_not_called()
+        manager.close()
+
+        with open(manager.records_file, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(
+            [r["public_ip"] for r in records], ["203.0.113.1", "203.0.113.2"]
+        )
+
+        # 重新載入後狀態與記錄一致
+        reloaded = _open_manager(self, self.history_file, self.config)
+        self.assertEqual(reloaded.get_last_public_ip(), "203.0.113.2")
+        self.assertEqual(reloaded.get_history_stats()["total_history_records"], 2)
+
+    def test_records_written_in_batches(self):
+        """測試事件累積滿一批才寫入記錄檔"""
+        config = dict(self.config, batch_size=3, flush_interval_s=60.0)
+        manager = _open_manager(self, self.history_file, config)
+        ip_data = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
+
+        try:
+            for _ in range(2):
+                manager.record_ip_check(ip_data, "scheduled", False)
+            self.assertEqual(manager.records_file.read_bytes(), b"")
+            self.assertEqual(manager.get_history_stats()["total_history_records"], 2)
+
+            manager.record_ip_check(ip_data, "scheduled", False)
+            lines = manager.records_file.read_bytes().splitlines()
+            self.assertEqual(len(lines), 3)
+        finally:
+            manager.close()
+
+    def test_pending_records_flushed_by_timer(self):
+        """測試未滿一批的事件由計時器延遲寫入"""
+        config = dict(self.config, batch_size=10, flush_interval_s=0.05)
+        manager = _open_manager(self, self.history_file, config)
+
+        manager.record_ip_check(
+            {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}, "manual", False
+        )
+        timer = manager._flush_timer
+        self.assertIsNotNone(timer)
+        timer.join(2)
+
+        self.assertEqual(len(manager.records_file.read_bytes().splitlines()), 1)
+        self.assertIsNone(manager._flush_timer)
+        manager.close()
+
+    def test_stale_timer_keeps_newer_timer_tracked(self):
+        """測試較舊的計時器觸發時不會讓較新的計時器脫離追蹤"""
+        config = dict(self.config, batch_size=10, flush_interval_s=60.0)
+        manager = _open_manager(self, self.history_file, config)
+
+        manager.record_ip_check(
+            {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}, "manual", False
+        )
+        newer_timer = manager._flush_timer
+
+        # 模擬先前已到期、等待鎖的計時器執行緒
+        stale = threading.Thread(target=manager._flush_from_timer)
+        stale.start()
+        stale.join(2)
+
+        # 寫入時取消仍在追蹤中的較新計時器，不會留下重複的計時器
+        self.assertTrue(newer_timer.finished.is_set())
+        self.assertIsNone(manager._flush_timer)
+        self.assertEqual(len(manager.records_file.read_bytes().splitlines()), 1)
+        manager.close()
+
+    def test_exit_hook_skips_removed_directory(self):
+        """測試歷史目錄已被移除時，結束時寫入只記錄除錯訊息"""
+        history_dir = os.path.join(self.temp_dir, "removed")
+        config = dict(self.config, batch_size=10, flush_interval_s=60.0)
+        manager = IPHistoryManager(os.path.join(history_dir, "history.json"), config)
+        manager.record_ip_check(
+            {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}, "manual", False
+        )
+        manager._cancel_flush_timer()
+        manager._close_records_handle()
+        shutil.rmtree(history_dir)
+
+        with self.assertLogs("src.ip_history", level="DEBUG") as logs:
+            manager._close_at_exit()
+
+        self.assertEqual([r.levelname for r in logs.records], ["DEBUG"])
+        self.assertFalse(os.path.exists(history_dir))
+
+        # 還原目錄後正常關閉，不留下結束時寫入
+        os.makedirs(history_dir)
+        manager.close()
+
+    def test_legacy_single_file_migrated(self):
+        """測試舊版單一 JSON 檔案轉換為狀態檔 + 記錄檔"""
+        legacy = _open_manager(self, self.history_file, self.config)._history_data
+        legacy["history"] = [
+            {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "public_ip": "203.0.113.1",
+                "ip_changed": True,
+            }
+        ]
+        with open(self.history_file, "w", encoding="utf-8") as f:
+            json.dump(legacy, f)
+        os.remove(self.history_file + RECORDS_FILE_SUFFIX)
+
+        manager = _open_manager(self, self.history_file, self.config)
+
+        self.assertEqual(manager.get_history_stats()["total_history_records"], 1)
+        with open(self.history_file, "r", encoding="utf-8") as f:
+            self.assertNotIn("history", json.load(f))
+        self.assertEqual(len(manager.records_file.read_bytes().splitlines()), 1)
+
     def test_export_history(self):
         """測試匯出歷史記錄功能"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 記錄一些測試資料
         ip_data = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
@@ -281,7 +440,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_get_ip_change_timeline(self):
         """測試獲取IP變化時間線"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 記錄IP變化事件
         test_ips = ["203.0.113.1", "203.0.113.2", "203.0.113.3"]
@@ -298,7 +457,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_invalid_history_data_validation(self):
         """測試無效歷史資料的驗證"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 測試缺少必要欄位的資料
         invalid_data = {"metadata": {}}  # 缺少其他必要欄位
@@ -313,7 +472,7 @@ class TestIPHistoryManager(unittest.TestCase):
             f.write("invalid json content {")
 
         # 應該能處理損壞檔案並創建新的
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 檢查是否創建了新的有效檔案
         stats = manager.get_history_stats()
@@ -327,7 +486,7 @@ class TestIPHistoryManager(unittest.TestCase):
 
     def test_edge_case_empty_ip(self):
         """測試空IP地址的邊界情況"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        manager = _open_manager(self, self.history_file, self.config)
 
         # 測試空IP
         has_changed = manager.has_ip_changed("")
@@ -341,7 +500,8 @@ class TestIPHistoryManager(unittest.TestCase):
         """測試最大記錄數限制"""
         config = self.config.copy()
         config["max_records"] = 5
-        manager = IPHistoryManager(self.history_file, config)
+        manager = _open_manager(self, self.history_file, config)
+        history_list = manager._history_data["history"]
 
         # 記錄超過最大數量的記錄
         for i in range(10):
@@ -352,9 +512,140 @@ class TestIPHistoryManager(unittest.TestCase):
         stats = manager.get_history_stats()
         self.assertLessEqual(stats["total_history_records"], 5)
 
+        # 保留最新的記錄，並維持時間先後順序
+        history = manager._history_data["history"]
+        self.assertIs(history, history_list)  # 就地裁剪，不重新配置列表
+        self.assertEqual(
+            [r["public_ip"] for r in history], [f"203.0.113.{i}" for i in range(5, 10)]
+        )
+        self.assertEqual(stats["recent_activity"][0]["public_ip"], "203.0.113.9")
+
+    def test_frequency_percentage_refreshed_after_check(self):
+        """測試執行模式比例在新增檢測後重新計算"""
+        manager = _open_manager(self, self.history_file, self.config)
+        ip_data = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
+
+        manager.record_ip_check(ip_data, "manual", False)
+        self.assertEqual(
+            manager.get_history_stats()["frequency_percentage"]["manual"], 100.0
+        )
+
+        manager.record_ip_check(ip_data, "scheduled", False)
+        percentage = manager.get_history_stats()["frequency_percentage"]
+        self.assertEqual(percentage["manual"], 50.0)
+        self.assertEqual(percentage["scheduled"], 50.0)
+        manager.close()
+
+    def test_event_shares_single_timestamp(self):
+        """測試同一事件的記錄與狀態更新時間使用相同時間戳"""
+        config = dict(self.config, flush_interval_s=0)
+        manager = _open_manager(self, self.history_file, config)
+
+        manager.record_ip_check(
+            {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}, "manual", True
+        )
+
+        record = manager._history_data["history"][-1]
+        with open(self.history_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.assertEqual(state["metadata"]["last_updated"], record["timestamp"])
+        self.assertEqual(state["current"]["last_updated"], record["timestamp"])
+
+    def test_auto_cleanup_only_when_needed(self):
+        """測試自動清理只在有過期或超量記錄時執行"""
+        manager = _open_manager(self, self.history_file, self.config)
+        ip_data = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
+
+        with patch.object(
+            manager, "_cleanup_old_records", wraps=manager._cleanup_old_records
+        ) as mock_cleanup:
+            manager.record_ip_check(ip_data, "scheduled", False)
+            mock_cleanup.assert_not_called()
+
+            old_record = dict(
+                manager._history_data["history"][0],
+                timestamp=(datetime.now(timezone.utc) - timedelta(days=40)).isoformat(),
+            )
+            manager._history_data["history"].insert(0, old_record)
+            manager.record_ip_check(ip_data, "scheduled", False)
+            mock_cleanup.assert_called_once()
+
+        self.assertEqual(manager.get_history_stats()["total_history_records"], 2)
+        manager.close()
+
+    def test_cutoff_cached_within_minute(self):
+        """測試同一分鐘內重複使用截止時間，跨分鐘後重新計算"""
+        manager = _open_manager(self, self.history_file, self.config)
+        base = datetime(2025, 1, 31, 12, 0, 10, tzinfo=timezone.utc)
+
+        first = manager._get_cutoff_iso(30, base)
+        self.assertEqual(first, (base - timedelta(days=30)).isoformat())
+        self.assertIs(manager._get_cutoff_iso(30, base + timedelta(seconds=30)), first)
+
+        later = base + timedelta(minutes=1)
+        self.assertEqual(
+            manager._get_cutoff_iso(30, later), (later - timedelta(days=30)).isoformat()
+        )
+
+    def test_unchanged_ip_skips_change_detection(self):
+        """測試IP無變化時略過變化檢測，但仍記錄檢測事件"""
+        manager = _open_manager(self, self.history_file, self.config)
+        ip_data = {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}
+        manager.record_ip_check(ip_data, "scheduled", True)
+
+        with patch.object(manager, "has_ip_changed") as mock_changed:
+            manager.record_ip_check(ip_data, "scheduled", False)
+            mock_changed.assert_not_called()
+
+        last_record = manager._history_data["history"][-1]
+        self.assertFalse(last_record["ip_changed"])
+        self.assertNotIn("previous_public_ip", last_record)
+        self.assertEqual(manager.get_history_stats()["metadata"]["total_checks"], 2)
+        manager.close()
+
+    def test_file_size_tracked_without_stat(self):
+        """測試檔案大小由寫入量追蹤，與實際檔案大小一致"""
+        config = dict(self.config, flush_interval_s=0)
+        manager = _open_manager(self, self.history_file, config)
+        manager.record_ip_check(
+            {"public_ip": "203.0.113.1", "local_ip": "192.168.1.100"}, "manual", False
+        )
+
+        expected = (
+            Path(self.history_file).stat().st_size + manager.records_file.stat().st_size
+        )
+        with patch.object(Path, "stat", side_effect=AssertionError("不應呼叫 stat")):
+            size = manager.get_history_stats()["history_file_size"]
+        self.assertEqual(
+            size, f"{expected / 1024:.1f} KB" if expected >= 1024 else f"{expected} B"
+        )
+
+        reloaded = _open_manager(self, self.history_file, config)
+        self.assertEqual(reloaded._get_file_size(), size)
+
+    def test_timeline_excludes_old_records(self):
+        """測試IP變化時間線排除查詢範圍外的記錄並由新到舊排列"""
+        manager = _open_manager(self, self.history_file, self.config)
+        now = datetime.now(timezone.utc)
+        manager._history_data["history"] = [
+            {
+                "timestamp": (now - timedelta(days=days)).isoformat(),
+                "public_ip": f"203.0.113.{days}",
+                "ip_changed": days != 2,
+            }
+            for days in (10, 5, 2, 1)
+        ]
+
+        timeline = manager.get_ip_change_timeline(days=7)
+
+        self.assertEqual(
+            [r["public_ip"] for r in timeline], ["203.0.113.1", "203.0.113.5"]
+        )
+
     def test_thread_safety_simulation(self):
-        """測試線程安全的模擬（基本測試）"""
-        manager = IPHistoryManager(self.history_file, self.config)
+        """測試線程安全的模擬（並發記錄合併為同一批寫入）"""
+        config = dict(self.config, batch_size=5, flush_interval_s=60)
+        manager = _open_manager(self, self.history_file, config)
 
         # 模擬並發操作
         import threading
@@ -376,24 +667,27 @@ class TestIPHistoryManager(unittest.TestCase):
         stats = manager.get_history_stats()
         self.assertEqual(stats["metadata"]["total_checks"], 5)
 
+        # 第五筆湊滿一批，五筆記錄一次附加到記錄檔
+        self.assertEqual(manager._pending, [])
+        with open(manager.records_file, "rb") as f:
+            self.assertEqual(len(f.readlines()), 5)
+
+        export_file = os.path.join(self.temp_dir, "export.json")
+        manager.export_history(export_file)
+        manager.close()
+
 
 class TestIPHistoryManagerIntegration(unittest.TestCase):
     """IP歷史管理系統整合測試"""
 
     def setUp(self):
         """測試前準備"""
-        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir = make_temp_dir(self.addCleanup)
         self.history_file = os.path.join(self.temp_dir, "integration_test.json")
 
-    def tearDown(self):
-        """測試後清理"""
-        import shutil
-
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
-
     def test_realistic_usage_scenario(self):
         """測試真實使用場景"""
-        manager = IPHistoryManager(self.history_file)
+        manager = _open_manager(self, self.history_file)
 
         # 模擬一天的使用情況
         scenarios = [
@@ -433,19 +727,18 @@ class TestIPHistoryManagerIntegration(unittest.TestCase):
 
     def test_performance_with_large_history(self):
         """測試大量歷史記錄的性能"""
-        manager = IPHistoryManager(self.history_file)
+        manager = _open_manager(self, self.history_file)
 
         import time
 
-        # 記錄大量歷史資料
-        start_time = time.time()
+        # 記錄大量歷史資料（以單調時鐘計時，不受系統校時影響）
+        start_ns = time.perf_counter_ns()
 
         for i in range(100):
             ip_data = {"public_ip": f"203.0.113.{i % 10}", "local_ip": "192.168.1.100"}
             manager.record_ip_check(ip_data, "test", False, 1.0)
 
-        end_time = time.time()
-        duration = end_time - start_time
+        duration = (time.perf_counter_ns() - start_ns) / 1e9
 
         # 性能檢查：100次操作應該在合理時間內完成
         self.assertLess(duration, 10.0, "大量記錄操作耗時過長")
@@ -0,0 +1,170 @@
+"""
+日誌系統模組測試
+
+測試 LoggerManager 的最近日誌讀取功能
+"""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# 確保可以導入src模組
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import ConfigManager
+from src.logger import LoggerManager, LOG_FILE_NAMES, TAIL_BLOCK_SIZE
+
+TEST_WEBHOOK_URL = "https://discord.com/api/webhooks/123456789/test-webhook-token"
+TEST_LOGGER_NAME = "test_discord_ip_bot"
+
+
+class TestRecentLogs(unittest.TestCase):
+    """LoggerManager.get_recent_logs 測試"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.test_dir = tempfile.mkdtemp()
+        self.env_patcher = patch.dict(
+            os.environ,
+            {"DISCORD_WEBHOOK_URL": TEST_WEBHOOK_URL, "LOGS_DIR": self.test_dir},
+            clear=True,
+        )
+        self.env_patcher.start()
+
+        config = ConfigManager(env_file="nonexistent.env", use_cache=False)
+        self.log_manager = LoggerManager(config, name=TEST_LOGGER_NAME)
+        self.log_file = Path(self.test_dir) / LOG_FILE_NAMES["scheduler"]
+
+    def tearDown(self):
+        """測試後清理"""
+        for name in (TEST_LOGGER_NAME, f"{TEST_LOGGER_NAME}.scheduler"):
+            logger = logging.getLogger(name)
+            for handler in logger.handlers:
+                handler.close()
+            logger.handlers.clear()
+
+        self.env_patcher.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _write_lines(self, lines):
+        with open(self.log_file, "w", encoding="utf-8") as f:
+            f.writelines(f"{line}\n" for line in lines)
+
+    def test_returns_last_lines(self):
+        """測試返回最後幾行"""
+        self._write_lines([f"第 {i} 行" for i in range(10)])
+
+        recent = self.log_manager.get_recent_logs(3, "scheduler")
+        self.assertEqual(recent, ["第 7 行\n", "第 8 行\n", "第 9 行\n"])
+
+    def test_fewer_lines_than_requested(self):
+        """測試檔案行數少於要求時返回全部內容"""
+        self._write_lines(["one", "two"])
+
+        recent = self.log_manager.get_recent_logs(5, "scheduler")
+        self.assertEqual(recent, ["one\n", "two\n"])
+
+    def test_lines_spanning_multiple_blocks(self):
+        """測試跨越多個讀取區塊的日誌"""
+        lines = [f"{i:05d} " + "記錄" * 300 for i in range(100)]
+        self._write_lines(lines)
+        self.assertGreater(self.log_file.stat().st_size, TAIL_BLOCK_SIZE * 4)
+
+        recent = self.log_manager.get_recent_logs(20, "scheduler")
+        self.assertEqual(recent, [f"{line}\n" for line in lines[-20:]])
+
+    def test_missing_file(self):
+        """測試日誌檔案不存在"""
+        self.assertEqual(self.log_manager.get_recent_logs(3, "error"), [])
+
+    def test_cleanup_old_logs_keeps_newest(self):
+        """測試清理輪轉日誌時只保留最新的檔案"""
+        logs_dir = Path(self.test_dir)
+        max_files = self.log_manager.config.get_system_config()["max_log_files"]
+        rotated = [
+            logs_dir / f"discord_ip_bot.log.{i}" for i in range(1, max_files + 3)
+        ]
+        for age, path in enumerate(rotated):
+            path.write_text("old", encoding="utf-8")
+            mtime = 1_000_000 - age * 100
+            os.utime(path, (mtime, mtime))
+
+        self.log_manager.cleanup_old_logs()
+
+        remaining = sorted(p.name for p in logs_dir.glob("*.log.*"))
+        self.assertEqual(remaining, sorted(p.name for p in rotated[:max_files]))
+        self.assertTrue(self.log_file.parent.joinpath(LOG_FILE_NAMES["main"]).exists())
+
+
+class TestGetLogger(unittest.TestCase):
+    """LoggerManager.get_logger 測試"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.test_dir = tempfile.mkdtemp()
+        self.env_patcher = patch.dict(
+            os.environ,
+            {"DISCORD_WEBHOOK_URL": TEST_WEBHOOK_URL, "LOGS_DIR": self.test_dir},
+            clear=True,
+        )
+        self.env_patcher.start()
+
+        config = ConfigManager(env_file="nonexistent.env", use_cache=False)
+        self.log_manager = LoggerManager(config, name=TEST_LOGGER_NAME)
+
+    def tearDown(self):
+        """測試後清理"""
+        for name in (
+            TEST_LOGGER_NAME,
+            f"{TEST_LOGGER_NAME}.scheduler",
+            f"{TEST_LOGGER_NAME}.module",
+        ):
+            logger = logging.getLogger(name)
+            for handler in logger.handlers:
+                handler.close()
+            logger.handlers.clear()
+
+        self.env_patcher.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_child_logger_propagates_without_handlers(self):
+        """測試子日誌器不複製處理器，記錄只透過主要日誌器寫入一次"""
+        logger = self.log_manager.get_logger("module")
+        self.assertEqual(logger.handlers, [])
+
+        logger.warning("子模組訊息")
+        for handler in self.log_manager.logger.handlers:
+            handler.flush()
+
+        log_file = Path(self.test_dir) / LOG_FILE_NAMES["main"]
+        content = log_file.read_text(encoding="utf-8")
+        self.assertEqual(content.count("子模組訊息"), 1)
+
+    def test_error_record_formatted_once(self):
+        """測試 ERROR 記錄寫入主要與錯誤日誌時只格式化一次"""
+        logger = self.log_manager.get_logger("module")
+
+        formatter = self.log_manager.logger.handlers[0].formatter
+
+        with patch.object(
+            formatter, "formatTime", wraps=formatter.formatTime
+        ) as mock_format:
+            logger.error("錯誤訊息")
+        for handler in self.log_manager.logger.handlers:
+            handler.flush()
+
+        self.assertEqual(mock_format.call_count, 1)
+        logs_dir = Path(self.test_dir)
+        main_log = (logs_dir / LOG_FILE_NAMES["main"]).read_text(encoding="utf-8")
+        error_log = (logs_dir / LOG_FILE_NAMES["error"]).read_text(encoding="utf-8")
+        self.assertIn(error_log, main_log)
+        self.assertIn("錯誤訊息", error_log)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)